@@ -1,12 +1,36 @@
 import random
 import sys
-import requests
 import os
 import time
-from openai import OpenAI
+import queue
+import threading
+import asyncio
+import concurrent.futures
+import json
+import re
+from openai import OpenAI, AsyncOpenAI, DEFAULT_MAX_RETRIES
 from typing import Optional
-from mcp.server.fastmcp import FastMCP
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+
+# 共享模块（ghidra_client 等）位于仓库的 脚本/ 目录，打包后由 PyInstaller 一并收集
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "脚本")
+if os.path.isdir(SHARED_DIR) and SHARED_DIR not in sys.path:
+    sys.path.insert(0, SHARED_DIR)
+
+import ghidra_client
+from ghidra_client import safe_get, safe_post, split_function_entry, is_request_error as _is_request_error, is_error_response
+from decompile_cache import DecompileCache, decompile_with_cache, sync_function_names
+from name_dedup import NameCache, NamingDeduplicator
+from rate_limiter import AdaptiveRateLimiter, RateLimitedClient
+from endpoint_pool import Endpoint, EndpointPool, AsyncEndpointPool
+from call_graph import build_call_graph, bottom_up_levels
+from name_registry import NameRegistry
+from function_stream import FunctionStream
+from function_catalog import get_catalog
+from code_compactor import compact_decompiled, estimate_tokens
+from rename_journal import RenameJournal, journal_path, load_journal, RENAMED, FAILED
+from log_buffer import leveled_log, INFO, WARN, ERROR
+import run_metrics
 try:
     from dotenv import load_dotenv
     has_dotenv = True
@@ -18,47 +42,13 @@ except ImportError:
 # Ghidra服务器配置
 DEFAULT_GHIDRA_SERVER = "http://127.0.0.1:8080/"
 ghidra_server_url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_GHIDRA_SERVER
+ghidra_client.configure(base_url=ghidra_server_url)
 
 # 获取脚本所在目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-def safe_get(endpoint: str, params: dict = None) -> list:
-    """
-    Perform a GET request with optional query parameters.
-    """
-    if params is None:
-        params = {}
-
-    url = f"{ghidra_server_url}/{endpoint}"
-
-    try:
-        response = requests.get(url, params=params, timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.splitlines()
-        else:
-            return [f"Error {response.status_code}: {response.text.strip()}"]
-    except Exception as e:
-        return [f"Request failed: {str(e)}"]
-
-def safe_post(endpoint: str, data: dict | str) -> str:
-    try:
-        if isinstance(data, dict):
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data, timeout=5)
-        else:
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data.encode("utf-8"), timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.strip()
-        else:
-            return f"Error {response.status_code}: {response.text.strip()}"
-    except Exception as e:
-        return f"Request failed: {str(e)}"
-
-# 初始化MCP
-mcp = FastMCP("ghidra-mcp")
-
-@mcp.tool()
+# Ghidra 插件接口（本模块只作为客户端调用，不对外提供 MCP 服务；
+# 独立脚本与 GUI 都会导入本模块，导入时不应创建 MCP 服务器实例）
 def search_functions_by_name(query: str, offset: int = 0, limit: int = 100) -> list:
     """
     根据给定的子字符串搜索符合条件的函数名
@@ -67,14 +57,12 @@ def search_functions_by_name(query: str, offset: int = 0, limit: int = 100) -> l
         return ["Error: query string is required"]
     return safe_get("searchFunctions", {"query": query, "offset": offset, "limit": limit})
 
-@mcp.tool()
 def decompile_function(name: str) -> str:
     """
     根据指定的函数名对函数进行反编译，并返回反编译后的C语言代码
     """
     return safe_post("decompile", name)
 
-@mcp.tool()
 def rename_function(old_name: str, new_name: str) -> str:
     """
     将指定的函数从当前名称重命名为新的用户定义名称。
@@ -93,29 +81,58 @@ def print_progress(current: int, total: int, bar_len: int = 40) -> None:
 
 def fetch_all_functions(pattern: str, batch_size: int) -> list:
     """分页获取所有匹配的函数名列表以便统计总量"""
-    all_funcs = []
-    offset = 0
-    while True:
-        batch = search_functions_by_name(pattern, offset=offset, limit=batch_size)
-        if not batch or not isinstance(batch, list) or len(batch) == 0:
-            break
-        all_funcs.extend(batch)
-        offset += batch_size
-        # 略微休眠避免请求过快
-        time.sleep(0.1)
-    return all_funcs
+    return list(FunctionStream(pattern, batch_size))
+
+
+def _known_total(functions) -> int:
+    """需处理的函数量；流式枚举尚未结束时为目前已知的数量"""
+    return functions.known_total() if isinstance(functions, FunctionStream) else len(functions)
+
+
+def _settle(functions, renamed: bool = False) -> None:
+    run_metrics.inc("rename_functions_total", result="renamed" if renamed else "skipped")
+    if isinstance(functions, FunctionStream):
+        functions.settle(renamed)
+
+
+def _no_functions(functions) -> bool:
+    return functions.is_empty() if isinstance(functions, FunctionStream) else not functions
+
+
+def _journal(config: dict, event: str, func_name: str = None, **fields) -> None:
+    """向断点日志追加一条记录（未启用时忽略）"""
+    journal = config.get('journal')
+    if journal is not None:
+        journal.record(event, func_name, **fields)
 
 def get_all_methods_count(timeout: float = 1.5) -> int:
     """获取全部方法数量：methods?offset=0&limit=999999 的行数"""
-    try:
-        url = f"{ghidra_server_url}/methods?offset=0&limit=999999"
-        resp = requests.get(url, timeout=timeout)
-        if not resp.ok:
-            return 0
-        lines = resp.text.splitlines() if resp.text else []
-        return len(lines)
-    except Exception:
+    lines = safe_get("methods", {"offset": 0, "limit": 999999}, timeout=timeout)
+    if is_error_response(lines):
         return 0
+    return len(lines)
+
+SYSTEM_PROMPT = "你是一个代码分析专家。你的任务是分析C语言代码并生成一个恰当的函数名。规则：\n1. 必须使用英文\n2. 必须使用驼峰命名法\n3. 名称必须反映函数的主要功能\n4. 只返回函数名，不要包含任何其他文字\n5. 如果无法分析代码，返回None\n6. 函数名长度不要超过50个字符"
+
+
+def build_rename_messages(decompiled_code: str) -> list:
+    """构造单个函数命名请求的对话消息"""
+    return [
+        ChatCompletionSystemMessageParam(
+            role="system",
+            content=SYSTEM_PROMPT
+        ),
+        ChatCompletionUserMessageParam(
+            role="user",
+            content=f"这是反编译的C代码，请分析并只返回一个合适的函数名：\n\n{decompiled_code}"
+        )
+    ]
+
+
+def is_valid_function_name(new_name: str) -> bool:
+    """验证AI返回的函数名是否符合要求"""
+    return bool(new_name) and len(new_name) <= 50 and ' ' not in new_name and '\n' not in new_name
+
 
 def analyze_function(decompiled_code: str, client, model_name: str) -> Optional[str]:
     """使用AI模型分析反编译代码并生成合适的函数名"""
@@ -127,16 +144,7 @@ def analyze_function(decompiled_code: str, client, model_name: str) -> Optional[
         # 调用OpenAI API
         response = client.chat.completions.create(
             model=model_name,
-            messages=[
-                ChatCompletionSystemMessageParam(
-                    role="system",
-                    content="你是一个代码分析专家。你的任务是分析C语言代码并生成一个恰当的函数名。规则：\n1. 必须使用英文\n2. 必须使用驼峰命名法\n3. 名称必须反映函数的主要功能\n4. 只返回函数名，不要包含任何其他文字\n5. 如果无法分析代码，返回None\n6. 函数名长度不要超过50个字符"
-                ),
-                ChatCompletionUserMessageParam(
-                    role="user",
-                    content=f"这是反编译的C代码，请分析并只返回一个合适的函数名：\n\n{decompiled_code}"
-                )
-            ],
+            messages=build_rename_messages(decompiled_code),
             temperature=0.7,
             max_tokens=50
         )
@@ -144,7 +152,7 @@ def analyze_function(decompiled_code: str, client, model_name: str) -> Optional[
         new_name = response.choices[0].message.content.strip()
         
         # 验证返回的函数名是否符合要求
-        if not new_name or len(new_name) > 50 or ' ' in new_name or '\n' in new_name:
+        if not is_valid_function_name(new_name):
             print(f"警告: AI返回了无效的函数名: {new_name}")
             return None
             
@@ -154,23 +162,96 @@ def analyze_function(decompiled_code: str, client, model_name: str) -> Optional[
         print(f"AI API调用失败: {str(e)}")
         return None
 
-def process_functions(config: dict, client, model_name: str, functions: list, on_log=None, on_progress=None, stop_event=None):
-    """批量处理函数重命名（基于预取的函数列表，带进度/日志回调）"""
-    consecutive_failures = 0  # 初始化连续失败计数器
-    max_consecutive_failures = 10 # 最大连续失败次数
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT.replace("\n4. 只返回函数名，不要包含任何其他文字\n5. 如果无法分析代码，返回None", "") + \
+    "\n4. 每次会给出多个函数，每个函数以“### 函数 编号”开头\n5. 只返回一个JSON对象，键为函数编号（字符串），值为对应的函数名，不要包含任何其他文字\n6. 无法分析的函数不要出现在JSON中"
 
-    total = len(functions)  # 注意：这里的 total 表示“需处理的函数量”
-    processed = 0
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+
+
+def build_batch_messages(decompiled_codes: list) -> list:
+    """构造多函数批量命名请求的对话消息，函数编号从1开始"""
+    parts = [f"### 函数 {i}\n```c\n{code}\n```" for i, code in enumerate(decompiled_codes, 1)]
+    return [
+        ChatCompletionSystemMessageParam(
+            role="system",
+            content=BATCH_SYSTEM_PROMPT
+        ),
+        ChatCompletionUserMessageParam(
+            role="user",
+            content="以下是多个反编译的C函数，请分别分析并按要求返回JSON：\n\n" + "\n\n".join(parts)
+        )
+    ]
+
+
+def _parse_batch_response(content: str, count: int) -> dict:
+    """解析批量命名结果，返回 {下标(从0开始): 函数名}，只保留通过校验的条目"""
+    match = _JSON_OBJECT_RE.search(content or "")
+    if not match:
+        return {}
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    names = {}
+    for key, value in data.items():
+        try:
+            index = int(str(key).strip()) - 1
+        except ValueError:
+            continue
+        if 0 <= index < count and isinstance(value, str) and is_valid_function_name(value.strip()):
+            names[index] = value.strip()
+    return names
+
+
+def analyze_functions_batch(decompiled_codes: list, client, model_name: str) -> dict:
+    """一次请求为多个函数命名，返回 {下标: 函数名}，缺失或无效的条目不包含在内"""
+    try:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=build_batch_messages(decompiled_codes),
+            temperature=0.7,
+            max_tokens=30 * len(decompiled_codes) + 50
+        )
+        return _parse_batch_response(response.choices[0].message.content, len(decompiled_codes))
+    except Exception as e:
+        print(f"AI API批量调用失败: {str(e)}")
+        return {}
+
+
+def analyze_functions_batched(decompiled_codes: list, client, model_name: str) -> tuple[list, int]:
+    """
+    批量命名，批量结果中缺失或未通过校验的函数回退到单函数请求。
+    返回 (与输入一一对应的函数名列表, 回退的数量)。
+    """
+    if len(decompiled_codes) == 1:
+        return [analyze_function(decompiled_codes[0], client, model_name)], 0
+    batch_names = analyze_functions_batch(decompiled_codes, client, model_name)
+    names = []
+    fallbacks = 0
+    for i, code in enumerate(decompiled_codes):
+        name = batch_names.get(i)
+        if name is None:
+            fallbacks += 1
+            name = analyze_function(code, client, model_name)
+        names.append(name)
+    return names, fallbacks
+
+
+def _make_emitters(on_log=None, on_progress=None):
+    """构造日志/进度回调包装，回调异常不应影响主流程"""
+    print_lock = threading.Lock()
+    on_log = leveled_log(on_log)
 
-    # 回调包装
-    def emit_log(text: str):
+    def emit_log(text: str, level: str = INFO):
         try:
             if on_log:
-                on_log(text)
+                on_log(text, level)
             else:
-                print(text)
+                with print_lock:
+                    print(text)
         except Exception:
-            # 回调异常不应影响主流程
             print(text)
 
     def emit_progress(done: int, all_count: int):
@@ -178,40 +259,233 @@ def process_functions(config: dict, client, model_name: str, functions: list, on
             if on_progress:
                 on_progress(done, all_count)
             else:
-                print_progress(done, all_count)
+                with print_lock:
+                    print_progress(done, all_count)
         except Exception:
             print_progress(done, all_count)
 
+    return emit_log, emit_progress
+
+
+def _clean_function_name(func_name: str) -> str:
+    """提取纯函数名（移除@后的地址信息）"""
+    return func_name.split(" @ ")[0] if " @ " in func_name else func_name
+
+
+def _decompile_cached(config: dict, func_name: str, clean_func_name: str) -> str:
+    """通过 config 中的反编译缓存获取反编译代码，未启用缓存时直接请求 Ghidra"""
+    _, address = split_function_entry(func_name)
+    with run_metrics.timer("rename_stage_seconds", stage="decompile"):
+        return decompile_with_cache(config.get('decompile_cache'), config.get('program_id'),
+                                    clean_func_name, address, decompile_function,
+                                    fresh_only=config.get('decompile_fresh_only', False))
+
+
+def _invalidate_cached(config: dict, func_name: str, new_name: str = None) -> None:
+    """函数重命名后其反编译结果已过期，调用它的函数的缓存也随之失效"""
+    cache, program_id = config.get('decompile_cache'), config.get('program_id')
+    name, address = split_function_entry(func_name)
+    if cache is not None and program_id and address:
+        cache.invalidate(program_id, address, name=name, new_name=new_name)
+
+
+def _open_decompile_cache(on_log=None):
+    """打开反编译缓存并计算当前程序标识，失败时返回 (None, None) 以不使用缓存继续"""
+    program_id = ghidra_client.program_fingerprint(refresh=True)
+    if not program_id:
+        return None, None
+    try:
+        cache = DecompileCache()
+        changed = sync_function_names(cache, program_id)
+    except Exception as e:
+        if on_log:
+            on_log(f"警告: 反编译缓存不可用: {str(e)}", WARN)
+        return None, None
+    if changed and on_log:
+        on_log(f"反编译缓存: 上次运行后有 {changed} 个函数在 Ghidra 中被重命名，调用它们的函数将重新反编译")
+    return cache, program_id
+
+
+def _configure_ghidra(ghidra_servers: list, on_log=None) -> None:
+    """
+    第一个地址为主实例（重命名等写操作只发给它），其余为打开同一程序副本的只读实例，
+    反编译请求分给未完成请求最少的实例。程序或函数名与主实例不一致的副本不会被使用。
+    """
+    servers = ghidra_client.parse_server_list(ghidra_servers)
+    client = ghidra_client.configure(base_url=servers[0], replica_urls=servers[1:])
+    dropped = ghidra_client.verify_replicas(client)
+    if on_log:
+        for url in dropped:
+            on_log(f"警告: Ghidra 实例 {url} 无法访问或打开的程序/函数名与主实例 {client.base_url} 不一致，已忽略", WARN)
+
+
+def describe_instances() -> str:
+    client = ghidra_client.get_client()
+    return "，".join([f"{client.base_url}（主）"] + [replica.base_url for replica in client.replicas])
+
+
+def _analyze_deduped(config: dict, decompiled: str, client, model_name: str, prompt_code: str = None) -> tuple[Optional[str], bool]:
+    """
+    经函数体去重后调用 analyze_function，返回 (函数名, 是否复用了相同函数体的结果)。
+    去重按完整的反编译代码进行，发给AI的是 prompt_code（压缩后的代码，默认即完整代码）。
+    """
+    prompt_code = prompt_code or decompiled
+    dedup = config.get('name_dedup')
+    with run_metrics.timer("rename_stage_seconds", stage="ai"):
+        if dedup is None:
+            return analyze_function(prompt_code, client, model_name), False
+        return dedup.resolve(decompiled, lambda _: analyze_function(prompt_code, client, model_name))
+
+
+def _pause(config: dict) -> None:
+    """两次AI请求之间的固定处理延迟（启用自适应限速时为0）"""
+    if config['delay'] > 0:
+        with run_metrics.timer("rename_stage_seconds", stage="delay"):
+            time.sleep(config['delay'])
+
+
+def _compact_for_ai(config: dict, func_name: str, decompiled: str, emit_log) -> str:
+    """按 config['prompt_token_budget'] 压缩发给AI的代码（未设置时原样返回），并输出压缩前后的token估算"""
+    budget = config.get('prompt_token_budget')
+    if not budget:
+        return decompiled
+    compacted = compact_decompiled(decompiled, budget)
+    before, after = estimate_tokens(decompiled), estimate_tokens(compacted)
+    emit_log(f"{func_name}: 约 {before} tokens" + (f"，压缩后约 {after} tokens" if after < before else ""))
+    return compacted
+
+
+def _open_name_dedup(on_log=None):
+    try:
+        return NamingDeduplicator(NameCache())
+    except Exception as e:
+        if on_log:
+            on_log(f"警告: 命名去重缓存不可用: {str(e)}", WARN)
+        return None
+
+
+def _open_name_registry(on_log=None):
+    registry = NameRegistry.load()
+    if registry is None and on_log:
+        on_log("警告: 无法读取函数名列表，将逐个搜索检查名称冲突", WARN)
+    return registry
+
+
+def _start_name_registry(config: dict, on_log=None) -> None:
+    """在后台读取全部函数名，不阻塞开始处理；读取完成后输出总函数量。有本地函数目录时直接使用目录"""
+    catalog = config.get('catalog')
+    if catalog is not None:
+        config['name_registry'] = NameRegistry(catalog.names())
+        if on_log:
+            on_log(f"总函数量: {len(catalog)}")
+        return
+    future = concurrent.futures.Future()
+
+    def load():
+        registry = None
+        try:
+            registry = _open_name_registry(on_log)
+            if on_log:
+                total = len(registry) if registry is not None else get_all_methods_count()
+                on_log(f"总函数量: {total}")
+        finally:
+            future.set_result(registry)
+
+    config['name_registry'] = future
+    threading.Thread(target=load, name="name-registry", daemon=True).start()
+
+
+def _name_registry(config: dict):
+    """取得名称登记表，后台仍在读取时等待其完成"""
+    registry = config.get('name_registry')
+    if isinstance(registry, concurrent.futures.Future):
+        registry = registry.result()
+    return registry
+
+
+def _record_rename(config: dict, func_name: str, clean_func_name: str, new_name: str, registry=None) -> None:
+    """重命名成功后同步更新名称登记表、函数目录、反编译缓存与断点日志"""
+    if registry is not None:
+        registry.commit(clean_func_name, new_name)
+    catalog = config.get('catalog')
+    if catalog is not None:
+        catalog.apply_rename(split_function_entry(func_name)[1], new_name)
+    _invalidate_cached(config, func_name, new_name)
+    _journal(config, RENAMED, func_name, name=new_name)
+
+
+def _apply_rename(config: dict, func_name: str, clean_func_name: str, new_name: str, emit_log) -> bool:
+    """处理名称冲突后执行重命名，成功时同步更新名称登记表等本地状态"""
+    with run_metrics.timer("rename_stage_seconds", stage="rename"):
+        registry = _name_registry(config)
+        if registry is not None:
+            new_name = registry.reserve(new_name, clean_func_name)
+        elif search_functions_by_name(new_name, limit=1):
+            new_name += "_" + str(random.randint(1000, 9999))
+        result = rename_function(clean_func_name, new_name)
+
+    # 插件重命名失败时也返回200（"Rename failed"），按成功时的返回文本判断
+    if ghidra_client._write_succeeded("renameFunction", result):
+        _record_rename(config, func_name, clean_func_name, new_name, registry)
+        emit_log(f"重命名成功: {func_name} -> {new_name}")
+        return True
+    if registry is not None:
+        registry.release(new_name, clean_func_name)
+    _journal(config, FAILED, func_name, stage="rename", reason=result)
+    emit_log(f"重命名失败 {func_name}: {result}", ERROR)
+    return False
+
+
+def process_functions(config: dict, client, model_name: str, functions: list, on_log=None, on_progress=None, stop_event=None) -> bool:
+    """批量处理函数重命名（基于预取的函数列表，带进度/日志回调），因停止信号或连续失败提前结束时返回 False"""
+    aborted = False
+    consecutive_failures = 0  # 初始化连续失败计数器
+    max_consecutive_failures = 10 # 最大连续失败次数
+
+    processed = 0
+
+    emit_log, emit_progress = _make_emitters(on_log, on_progress)
+
+    def advance(renamed: bool = False):
+        nonlocal processed
+        processed += 1
+        _settle(functions, renamed)
+        # 注意：这里的总数表示“需处理的函数量”，流式枚举时随枚举进度增长
+        emit_progress(processed, _known_total(functions))
+
     try:
         for func_name in functions:
+            reused = False
+            renamed = False
             # 检查停止信号
             if stop_event is not None and hasattr(stop_event, 'is_set') and stop_event.is_set():
                 emit_log("\n收到停止信号，提前结束处理。")
+                aborted = True
                 break
 
             if not func_name or not func_name.strip():
-                processed += 1
-                emit_progress(processed, total)
+                advance()
                 continue
 
             # 提取纯函数名（移除@后的地址信息）
-            clean_func_name = func_name.split(" @ ")[0] if " @ " in func_name else func_name
+            clean_func_name = _clean_function_name(func_name)
 
             try:
                 # 获取反编译代码
-                decompiled = decompile_function(clean_func_name)
+                decompiled = _decompile_cached(config, func_name, clean_func_name)
                 if not decompiled:
-                    emit_log(f"\n跳过 {func_name}: 无反编译结果")
-                    processed += 1
-                    emit_progress(processed, total)
+                    emit_log(f"\n跳过 {func_name}: 无反编译结果", WARN)
+                    _journal(config, FAILED, func_name, stage="decompile", reason="无反编译结果")
+                    advance()
                     continue
 
                 # 检查是否是真正的错误（而不是反编译结果）
-                if decompiled.startswith("Error") or decompiled.startswith("Request failed"):
-                    emit_log(f"\n跳过 {func_name}: {decompiled}")
-                    processed += 1
-                    emit_progress(processed, total)
+                if _is_request_error(decompiled):
+                    emit_log(f"\n跳过 {func_name}: {decompiled}", WARN)
+                    _journal(config, FAILED, func_name, stage="decompile", reason=decompiled)
+                    advance()
                     continue
+                _journal(config, "decompiled", func_name)
 
                 emit_log(f"\n正在分析函数: {func_name}")
                 # 只显示函数签名和开头部分
@@ -220,87 +494,655 @@ def process_functions(config: dict, client, model_name: str, functions: list, on
                 emit_log("----------------------------------------")
 
                 # AI分析并重命名
-                new_name = analyze_function(decompiled, client, model_name)
+                prompt_code = _compact_for_ai(config, func_name, decompiled, emit_log)
+                new_name, reused = _analyze_deduped(config, decompiled, client, model_name, prompt_code)
+                if reused:
+                    emit_log(f"复用相同函数体的命名结果: {new_name}")
                 if not new_name:
-                    emit_log(f"跳过 {func_name}: AI分析失败或返回无效函数名")
+                    emit_log(f"跳过 {func_name}: AI分析失败或返回无效函数名", WARN)
+                    _journal(config, FAILED, func_name, stage="ai", reason="AI分析失败或返回无效函数名")
                     consecutive_failures += 1
                     if consecutive_failures >= max_consecutive_failures:
-                        emit_log(f"\n连续 {max_consecutive_failures} 次AI调用失败或返回无效名称。")
-                        emit_log("请检查您的API密钥是否正确或网络连接是否正常。脚本将停止。")
+                        emit_log(f"\n连续 {max_consecutive_failures} 次AI调用失败或返回无效名称。", ERROR)
+                        emit_log("请检查您的API密钥是否正确或网络连接是否正常。脚本将停止。", ERROR)
+                        aborted = True
                         break
                 else:
                     consecutive_failures = 0 # AI调用成功，重置计数器
+                    _journal(config, "named", func_name, name=new_name)
 
-                    # 执行重命名
-                    #使用search_functions_by_name先检查此函数名字是否已经存在 如果存在则加上后缀
-                    if search_functions_by_name(new_name, limit=1):
-                        new_name += "_" + str(random.randint(1000, 9999))
-
-                    result = rename_function(clean_func_name, new_name)
-                    if "Error" not in result:
-                        emit_log(f"重命名成功: {func_name} -> {new_name}")
-                    else:
-                        emit_log(f"重命名失败 {func_name}: {result}")
+                    # 执行重命名（名称已存在时加上后缀）
+                    renamed = _apply_rename(config, func_name, clean_func_name, new_name, emit_log)
 
             except Exception as e:
-                emit_log(f"处理函数 {func_name} 时出错: {str(e)}")
+                emit_log(f"处理函数 {func_name} 时出错: {str(e)}", ERROR)
+                _journal(config, FAILED, func_name, stage="error", reason=str(e))
 
-            # 添加延迟避免API限制
-            time.sleep(config['delay'])
+            # 添加延迟避免API限制（复用结果时没有调用API，无需等待）
+            if not reused:
+                _pause(config)
 
-            processed += 1
-            emit_progress(processed, total)
+            advance(renamed)
 
     except Exception as e:
-        emit_log(f"批处理过程出错: {str(e)}")
+        emit_log(f"批处理过程出错: {str(e)}", ERROR)
+        return False
+    return not aborted
+
+
+def process_functions_pipelined(config: dict, client, model_name: str, functions: list, on_log=None, on_progress=None, stop_event=None) -> bool:
+    """
+    流水线模式的批量重命名：反编译、AI命名、重命名应用三个阶段各自使用独立的工作线程，
+    阶段之间通过有界队列衔接，慢阶段会自然对上游形成背压。
 
+    config 中可选的并发参数：
+    - decompile_workers: 反编译线程数（默认4）
+    - ai_workers: AI命名线程数（默认4）
+    - rename_workers: 重命名线程数（默认1）
+    - queue_size: 阶段间队列容量（默认64）
+    - ai_batch_size: 每次AI请求最多包含的函数数量（默认1，即不合并）
+    - ai_batch_token_budget: 合并请求中反编译代码的估算token上限（默认6000）
 
-def run_rename(api_key: str, api_base: str, model_name: str, function_pattern: str, batch_size: int, delay_seconds: float, on_log=None, on_progress=None, stop_event=None):
+    因停止信号或连续失败提前结束时返回 False。
+    """
+    max_consecutive_failures = 10 # 最大连续失败次数
+    decompile_workers = max(1, int(config.get('decompile_workers', 4)))
+    ai_workers = max(1, int(config.get('ai_workers', 4)))
+    rename_workers = max(1, int(config.get('rename_workers', 1)))
+    queue_size = max(1, int(config.get('queue_size', 64)))
+    ai_batch_size = max(1, int(config.get('ai_batch_size', 1)))
+    ai_batch_token_budget = max(1, int(config.get('ai_batch_token_budget', 6000)))
+
+    emit_log, emit_progress = _make_emitters(on_log, on_progress)
+
+    decompile_q = queue.Queue(maxsize=queue_size)
+    ai_q = queue.Queue(maxsize=queue_size)
+    rename_q = queue.Queue(maxsize=queue_size)
+    done_marker = object()  # 阶段结束标记
+
+    halt = threading.Event()  # 停止信号或连续失败过多时置位
+    state_lock = threading.Lock()
+    state = {'processed': 0, 'consecutive_failures': 0}
+    # 每个阶段剩余的存活线程数，最后一个退出的线程负责向下游发送结束标记
+    alive = {'decompile': decompile_workers, 'ai': ai_workers, 'rename': rename_workers}
+
+    def should_stop() -> bool:
+        if halt.is_set():
+            return True
+        if stop_event is not None and hasattr(stop_event, 'is_set') and stop_event.is_set():
+            with state_lock:
+                first = not halt.is_set()
+                halt.set()
+            if first:
+                emit_log("\n收到停止信号，提前结束处理。")
+            return True
+        return False
+
+    def put(q: queue.Queue, item) -> bool:
+        """带停止检查的阻塞入队，返回是否成功"""
+        while not should_stop():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q: queue.Queue):
+        """带停止检查的阻塞出队，停止时返回结束标记"""
+        while not should_stop():
+            try:
+                return q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        return done_marker
+
+    def mark_done(renamed: bool = False):
+        _settle(functions, renamed)
+        with state_lock:
+            state['processed'] += 1
+            done = state['processed']
+        emit_progress(done, _known_total(functions))
+
+    def finish_stage(stage: str, downstream: queue.Queue | None, downstream_workers: int):
+        with state_lock:
+            alive[stage] -= 1
+            last = alive[stage] == 0
+        if last and downstream is not None:
+            for _ in range(downstream_workers):
+                put(downstream, done_marker)
+
+    def feeder():
+        for func_name in functions:
+            if not put(decompile_q, func_name):
+                return
+        for _ in range(decompile_workers):
+            put(decompile_q, done_marker)
+
+    def decompile_worker():
+        try:
+            while True:
+                func_name = get(decompile_q)
+                if func_name is done_marker:
+                    break
+                if not func_name or not func_name.strip():
+                    mark_done()
+                    continue
+                clean_func_name = _clean_function_name(func_name)
+                try:
+                    decompiled = _decompile_cached(config, func_name, clean_func_name)
+                except Exception as e:
+                    emit_log(f"处理函数 {func_name} 时出错: {str(e)}", ERROR)
+                    _journal(config, FAILED, func_name, stage="error", reason=str(e))
+                    mark_done()
+                    continue
+                if not decompiled:
+                    emit_log(f"\n跳过 {func_name}: 无反编译结果", WARN)
+                    _journal(config, FAILED, func_name, stage="decompile", reason="无反编译结果")
+                    mark_done()
+                    continue
+                if _is_request_error(decompiled):
+                    emit_log(f"\n跳过 {func_name}: {decompiled}", WARN)
+                    _journal(config, FAILED, func_name, stage="decompile", reason=decompiled)
+                    mark_done()
+                    continue
+                _journal(config, "decompiled", func_name)
+                prompt_code = _compact_for_ai(config, func_name, decompiled, emit_log)
+                if not put(ai_q, (func_name, clean_func_name, decompiled, prompt_code)):
+                    break
+        finally:
+            finish_stage('decompile', ai_q, ai_workers)
+
+    def name_batch(batch: list) -> bool:
+        """为一批函数命名并送入重命名队列，返回 False 表示应停止"""
+        for func_name, _, decompiled, _ in batch:
+            first_line = decompiled.split('\n')[0]
+            emit_log(f"\n正在分析函数: {func_name}\n函数签名: {first_line}\n----------------------------------------")
+
+        dedup = config.get('name_dedup')
+        names = [dedup.lookup(decompiled) if dedup is not None else None for _, _, decompiled, _ in batch]
+        reused = [name is not None for name in names]
+        todo = [i for i, name in enumerate(names) if name is None]
+        try:
+            if len(todo) == 1:
+                i = todo[0]
+                names[i], reused[i] = _analyze_deduped(config, batch[i][2], client, model_name, batch[i][3])
+            elif todo:
+                start = time.perf_counter()
+                results, fallbacks = analyze_functions_batched([batch[i][3] for i in todo], client, model_name)
+                # 按函数记录，一次批量请求的耗时均摊到其中每个函数
+                elapsed = (time.perf_counter() - start) / len(todo)
+                for _ in todo:
+                    run_metrics.observe("rename_stage_seconds", elapsed, stage="ai")
+                if fallbacks:
+                    emit_log(f"批量命名: {len(todo)} 个函数中有 {fallbacks} 个结果缺失或无效，已回退为单独请求", WARN)
+                for i, name in zip(todo, results):
+                    names[i] = name
+                    if name and dedup is not None:
+                        dedup.remember(batch[i][2], name)
+        except Exception as e:
+            emit_log(f"处理函数 {', '.join(item[0] for item in batch)} 时出错: {str(e)}", ERROR)
+
+        for (func_name, clean_func_name, _, _), new_name, was_reused in zip(batch, names, reused):
+            if was_reused and new_name:
+                emit_log(f"复用相同函数体的命名结果: {new_name}")
+            if not new_name:
+                emit_log(f"跳过 {func_name}: AI分析失败或返回无效函数名", WARN)
+                _journal(config, FAILED, func_name, stage="ai", reason="AI分析失败或返回无效函数名")
+                with state_lock:
+                    state['consecutive_failures'] += 1
+                    too_many = state['consecutive_failures'] >= max_consecutive_failures
+                mark_done()
+                if too_many and not halt.is_set():
+                    halt.set()
+                    emit_log(f"\n连续 {max_consecutive_failures} 次AI调用失败或返回无效名称。", ERROR)
+                    emit_log("请检查您的API密钥是否正确或网络连接是否正常。脚本将停止。", ERROR)
+                    return False
+            else:
+                with state_lock:
+                    state['consecutive_failures'] = 0
+                _journal(config, "named", func_name, name=new_name)
+                if not put(rename_q, (func_name, clean_func_name, new_name)):
+                    return False
+        # 每个AI线程各自限速，避免触发API限制（全部复用已有结果时没有调用API，无需等待）
+        if not all(reused):
+            _pause(config)
+        return True
+
+    def ai_worker():
+        pending = None  # 超出本批token预算、留到下一批的条目
+        finished = False
+        try:
+            while not finished or pending is not None:
+                if pending is not None:
+                    first, pending = pending, None
+                else:
+                    first = get(ai_q)
+                    if first is done_marker:
+                        break
+                batch = [first]
+                tokens = estimate_tokens(first[3])
+                # 批量模式下尽量从队列中多取几个函数合并为一次请求
+                while len(batch) < ai_batch_size and not finished:
+                    try:
+                        item = ai_q.get(timeout=0.05)
+                    except queue.Empty:
+                        break
+                    if item is done_marker:
+                        finished = True
+                        break
+                    cost = estimate_tokens(item[3])
+                    if tokens + cost > ai_batch_token_budget:
+                        pending = item
+                        break
+                    batch.append(item)
+                    tokens += cost
+                if not name_batch(batch):
+                    break
+        finally:
+            finish_stage('ai', rename_q, rename_workers)
+
+    def rename_worker():
+        try:
+            while True:
+                item = get(rename_q)
+                if item is done_marker:
+                    break
+                func_name, clean_func_name, new_name = item
+                renamed = False
+                try:
+                    renamed = _apply_rename(config, func_name, clean_func_name, new_name, emit_log)
+                except Exception as e:
+                    emit_log(f"处理函数 {func_name} 时出错: {str(e)}", ERROR)
+                    _journal(config, FAILED, func_name, stage="error", reason=str(e))
+                mark_done(renamed)
+        finally:
+            finish_stage('rename', None, 0)
+
+    threads = [threading.Thread(target=feeder, name="rename-feeder", daemon=True)]
+    threads += [threading.Thread(target=decompile_worker, name=f"decompile-{i}", daemon=True) for i in range(decompile_workers)]
+    threads += [threading.Thread(target=ai_worker, name=f"ai-{i}", daemon=True) for i in range(ai_workers)]
+    threads += [threading.Thread(target=rename_worker, name=f"rename-{i}", daemon=True) for i in range(rename_workers)]
+
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    except Exception as e:
+        halt.set()
+        emit_log(f"批处理过程出错: {str(e)}", ERROR)
+    return not halt.is_set()
+
+
+def process_functions_by_call_graph(config: dict, client, model_name: str, functions: list, on_log=None, on_progress=None, stop_event=None) -> bool:
+    """
+    按调用图自底向上分层处理：先重命名叶子函数，再处理调用它们的函数。
+    每一层内部用流水线并行处理，层与层之间等待上一层全部完成。
+    """
+    emit_log, emit_progress = _make_emitters(on_log, on_progress)
+    # 建图需要完整的函数列表
+    functions = list(functions)
+    total = len(functions)
+
+    emit_log("正在通过交叉引用建立调用图…")
+    callees = build_call_graph(functions, workers=config.get('decompile_workers', 4), stop_event=stop_event, on_log=emit_log)
+    if stop_event is not None and stop_event.is_set():
+        emit_log("\n收到停止信号，提前结束处理。")
+        return False
+    levels = bottom_up_levels(functions, callees)
+    emit_log(f"调用图: {sum(len(c) for c in callees.values())} 条调用关系，共 {len(levels)} 层")
+
+    # 调用者必须看到被调用者的新名称：被调用者重命名时已记入反编译缓存，调用它的函数的旧结果不会被复用
+    offset = 0
+    for depth, level in enumerate(levels):
+        emit_log(f"\n开始处理第 {depth + 1}/{len(levels)} 层，共 {len(level)} 个函数")
+        completed = process_functions_pipelined(
+            config, client, model_name, level, on_log=on_log,
+            on_progress=lambda done, _, base=offset: emit_progress(base + done, total),
+            stop_event=stop_event,
+        )
+        offset += len(level)
+        if not completed:
+            return False
+    return True
+
+
+def _make_rate_limiter(delay_seconds: float, requests_per_minute: float = None, tokens_per_minute: float = None,
+                       max_requests_per_minute: float = 600, on_log=None) -> AdaptiveRateLimiter:
+    """创建自适应限速器，未指定初始速率时按原来的处理延迟换算（延迟1秒 = 60请求/分钟）"""
+    if not requests_per_minute:
+        requests_per_minute = 60.0 / delay_seconds if delay_seconds > 0 else max_requests_per_minute
+    return AdaptiveRateLimiter(
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        max_requests_per_minute=max_requests_per_minute,
+        on_log=on_log,
+    )
+
+
+def _make_endpoint_pool(ai_endpoints: list, adaptive_rate: bool, delay_seconds: float, requests_per_minute: float = None,
+                        tokens_per_minute: float = None, max_requests_per_minute: float = 600, stop_event=None,
+                        on_log=None, use_async: bool = False) -> EndpointPool:
+    """
+    为每个配置（含 name、api_key、api_base、model_name）创建客户端与各自的限速器，组成端点池。
+    初始速率与单个配置时相同，之后每个端点按自己的成功与429情况调整。
+    """
+    client_class = AsyncOpenAI if use_async else OpenAI
+    endpoints = []
+    for profile in ai_endpoints:
+        name = profile.get('name') or profile.get('api_base', '')
+        limiter = None
+        if adaptive_rate:
+            def endpoint_log(text, level=INFO, name=name):
+                on_log(f"[{name}] {text}", level)
+            limiter = _make_rate_limiter(delay_seconds, requests_per_minute, tokens_per_minute, max_requests_per_minute,
+                                         endpoint_log if on_log else None)
+        # 失败时由端点池换端点重试，不使用 SDK 自带的重试
+        client = client_class(api_key=profile.get('api_key', ''), base_url=profile.get('api_base') or None, max_retries=0)
+        endpoints.append(Endpoint(name, client, profile.get('model_name', ''), limiter))
+    pool_class = AsyncEndpointPool if use_async else EndpointPool
+    return pool_class(endpoints, estimate_tokens=estimate_tokens, stop_event=stop_event, on_log=on_log)
+
+
+def _initial_rate(config: dict) -> float:
+    """自适应限速的初始速率（使用端点池时为每个端点各自的速率）"""
+    pool = config.get('endpoint_pool')
+    if pool is not None:
+        return pool.endpoints[0].limiter.requests_per_minute
+    return config['rate_limiter'].requests_per_minute
+
+
+def describe_endpoints(pool: EndpointPool) -> str:
+    return "，".join(f"{endpoint.name}（{endpoint.model_name}）" for endpoint in pool.endpoints)
+
+
+def _close_run_resources(config: dict, on_log=None) -> None:
+    """关闭本次运行打开的缓存，并输出统计信息"""
+    limiter = config.get('rate_limiter')
+    if limiter is not None and on_log:
+        on_log(limiter.describe())
+    pool = config.get('endpoint_pool')
+    if pool is not None:
+        if on_log:
+            for line in pool.describe():
+                on_log(line)
+        # 异步端点池的 close 是协程，由 run_rename_async 在结束时关闭
+        if not isinstance(pool, AsyncEndpointPool):
+            pool.close()
+    cache = config.get('decompile_cache')
+    if cache is not None:
+        if on_log:
+            on_log(f"反编译缓存: 命中 {cache.hits} / 未命中 {cache.misses}")
+        cache.close()
+    dedup = config.get('name_dedup')
+    if dedup is not None:
+        if on_log:
+            on_log(f"命名去重: 节省了 {dedup.saved} 次AI调用")
+        dedup.close()
+    journal = config.get('journal')
+    if journal is not None:
+        journal.close()
+    if 'metrics_baseline' in config and on_log:
+        stages = run_metrics.since(run_metrics.stage_totals(), config['metrics_baseline'])
+        if stages:
+            on_log(f"阶段耗时: {run_metrics.describe_stages(stages)}")
+    if 'instance_baseline' in config:
+        # 异步模式由调用方在关闭客户端前填入 mirror_failures
+        failures = config.get('mirror_failures')
+        if failures is None:
+            failures = ghidra_client.get_client().flush_mirrors()
+        if on_log:
+            requests = run_metrics.since(run_metrics.REGISTRY.counter_totals("ghidra_requests_total", "instance"),
+                                         config['instance_baseline'])
+            on_log("Ghidra 实例请求数: " + "，".join(f"{url} {int(count)}" for url, count in sorted(requests.items())))
+            if failures:
+                on_log(f"警告: {failures} 次写操作未能同步到副本实例，副本的反编译结果可能使用旧名称", WARN)
+    catalog = config.get('catalog')
+    if catalog is not None:
+        try:
+            catalog.save()
+        except OSError as e:
+            if on_log:
+                on_log(f"警告: 保存函数目录失败: {str(e)}", WARN)
+
+
+def _open_catalog(config: dict, on_log=None):
+    """取得本地函数目录，快照过期时先同步一次；无法同步时返回 None"""
+    program_id = config.get('program_id') or ghidra_client.program_fingerprint()
+    if not program_id:
+        return None
+    catalog = get_catalog(program_id)
+    if not catalog.is_fresh() and not catalog.sync():
+        if on_log:
+            on_log("警告: 无法同步函数目录，将分页枚举函数", WARN)
+        return None
+    return catalog
+
+
+def _plan_functions(config: dict, journal: bool = True, resume: bool = False, use_catalog: bool = True, on_log=None) -> list | None:
+    """
+    确定需处理的函数：续传时来自断点日志，否则来自本地函数目录（与 searchFunctions 结果一致）。
+    两者都不可用时返回 None，由调用方流式枚举。
+    """
+    if use_catalog:
+        config['catalog'] = _open_catalog(config, on_log)
+    functions = _prepare_journal(config, config['function_pattern'], resume, on_log) if journal else None
+    catalog = config.get('catalog')
+    if functions is None and catalog is not None:
+        functions = catalog.search(config['function_pattern'])
+        if config.get('journal') is not None:
+            config['journal'].record_many("queued", functions)
+            config['journal'].record("enumerated", total=len(functions))
+        if on_log:
+            on_log(f"函数目录: 共 {len(catalog)} 个函数，匹配 {len(functions)} 个（{int(time.time() - catalog.synced_at)} 秒前同步）")
+    return functions
+
+
+def _prepare_journal(config: dict, function_pattern: str, resume: bool = False, on_log=None) -> list | None:
+    """
+    打开断点日志。resume=True 且上次的日志完整记录了需处理的函数时，
+    返回尚未重命名成功的函数列表（无需重新向 Ghidra 枚举）；
+    否则返回 None，由调用方重新枚举（续传时仍追加到原日志，新任务则覆盖）。
+    """
+    program_id = config.get('program_id') or ghidra_client.program_fingerprint()
+    if not program_id:
+        if on_log:
+            on_log("警告: 无法获取程序标识，断点日志不可用", WARN)
+        return None
+    path = journal_path(program_id)
+    try:
+        replay = load_journal(path) if resume else None
+        if resume and (replay is None or replay.pattern != function_pattern):
+            if on_log:
+                if replay is None:
+                    on_log("未找到上次的断点日志，将重新开始")
+                else:
+                    on_log(f"上次任务的函数名模式为 {replay.pattern}，与当前不一致，将重新开始", WARN)
+            replay = None
+        if replay is None:
+            config['journal'] = RenameJournal(path)
+            config['journal'].record("start", pattern=function_pattern, program=program_id)
+            return None
+
+        config['journal'] = RenameJournal(path, resume=True)
+        config['journal'].record("resume")
+        pending = replay.pending()
+        if on_log:
+            failed = replay.count(FAILED)
+            on_log(f"断点续传: 已重命名 {replay.count(RENAMED)}，失败待重试 {failed}，未完成 {len(pending) - failed}")
+        if replay.enumerated:
+            return pending
+        # 上次没有枚举完，已重命名的函数不再匹配，重新枚举即可得到失败与剩余的函数
+        if on_log:
+            on_log("上次任务未完成函数枚举，将继续枚举剩余函数")
+    except OSError as e:
+        config['journal'] = None
+        if on_log:
+            on_log(f"警告: 断点日志不可用: {str(e)}", WARN)
+    return None
+
+
+def run_rename(api_key: str, api_base: str, model_name: str, function_pattern: str, batch_size: int, delay_seconds: float, on_log=None, on_progress=None, stop_event=None,
+               pipeline: bool = False, decompile_workers: int = 4, ai_workers: int = 4, rename_workers: int = 1, queue_size: int = 64,
+               use_async: bool = False, concurrency: int = 100, use_decompile_cache: bool = True, dedup_names: bool = True,
+               ai_batch_size: int = 1, ai_batch_token_budget: int = 6000,
+               adaptive_rate: bool = True, requests_per_minute: float = None, tokens_per_minute: float = None,
+               max_requests_per_minute: float = 600, call_graph_order: bool = False,
+               journal: bool = True, resume: bool = False, prompt_token_budget: int = 4000, use_catalog: bool = True,
+               ghidra_servers: list = None, ai_endpoints: list = None):
     """
     供GUI调用的入口：执行预取与批量处理，并通过回调输出日志与进度。
     进度分母 = 需处理的函数量（即匹配关键词的数量）。
+    pipeline=True 时使用流水线模式，各阶段并发数由 *_workers 参数控制。
+    use_async=True 时转交 ai_rename_async.run_rename_async 执行，最多 concurrency 个函数同时在途。
+    use_decompile_cache=True 时反编译结果写入本地缓存，重复运行时直接复用。
+    dedup_names=True 时归一化后函数体相同的函数共用一次AI命名结果（跨运行保存）。
+    ai_batch_size>1 时把多个函数合并为一次AI请求（需要流水线模式，会自动启用）。
+    adaptive_rate=True 时以自适应限速器（所有线程共享）代替固定的处理延迟：
+    初始速率为 requests_per_minute（默认由 delay_seconds 换算），成功时逐步提速，遇到429时减半。
+    call_graph_order=True 时按调用图自底向上分层重命名（层内使用流水线并行）。
+    journal=True 时把每个函数的处理结果追加到断点日志；resume=True 时从上次的日志继续，
+    跳过已重命名的函数、重试失败的函数，且不重新枚举。
+    prompt_token_budget>0 时发给AI的代码先去掉 Ghidra 样板、折叠重复代码，并截断到约该token数以内。
+    use_catalog=True 时从本地函数目录（与GUI共用）取得需处理函数与全部函数名，不再分页枚举。
+    ghidra_servers 为 Ghidra 地址列表（None 表示沿用当前连接）：第一个为主实例，重命名只发给它；
+    其余为打开同一程序副本的实例，反编译请求分给未完成请求最少的实例。
+    ai_endpoints 为多个配置（含 name、api_key、api_base、model_name）时使用AI端点池（见 endpoint_pool），
+    此时忽略 api_key/api_base/model_name：请求按各端点的实际吞吐量分配，失败的端点被暂时剔除并转给其他端点。
+    on_log 可接受 (text, level) 两个参数，level 为 log_buffer 中的 INFO/WARN/ERROR。
     """
-    # 配置OpenAI客户端
-    client = OpenAI(
+    on_log = leveled_log(on_log)
+    if ghidra_servers:
+        _configure_ghidra(ghidra_servers, on_log)
+    if use_async:
+        from ai_rename_async import run_rename_async
+        return asyncio.run(run_rename_async(
+            api_key=api_key, api_base=api_base, model_name=model_name,
+            function_pattern=function_pattern, batch_size=batch_size, delay_seconds=delay_seconds,
+            on_log=on_log, on_progress=on_progress, stop_event=stop_event, concurrency=concurrency,
+            use_decompile_cache=use_decompile_cache, dedup_names=dedup_names,
+            adaptive_rate=adaptive_rate, requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute, max_requests_per_minute=max_requests_per_minute,
+            journal=journal, resume=resume, prompt_token_budget=prompt_token_budget, use_catalog=use_catalog,
+            ai_endpoints=ai_endpoints,
+        ))
+
+    # 合并请求与分层调度都由流水线完成
+    if ai_batch_size > 1 or call_graph_order:
+        pipeline = True
+
+    # 连接池大小与访问 Ghidra 的并发线程数保持一致
+    if pipeline:
+        ghidra_client.configure(pool_size=decompile_workers + rename_workers + 1)
+
+    # 配置OpenAI客户端（使用端点池时按各配置分别创建）
+    client = None if ai_endpoints else OpenAI(
         api_key=api_key,
-        base_url=api_base
+        base_url=api_base,
+        # 429 由限速器处理（降速、按 Retry-After 等待后重试），SDK 自带的重试会让限速器晚一步降速
+        max_retries=0 if adaptive_rate else DEFAULT_MAX_RETRIES
     )
 
     config = {
         'function_pattern': function_pattern,
         'batch_size': batch_size,
         'delay': delay_seconds,
+        'decompile_workers': decompile_workers,
+        'ai_workers': ai_workers,
+        'rename_workers': rename_workers,
+        'queue_size': queue_size,
+        'ai_batch_size': ai_batch_size,
+        'ai_batch_token_budget': ai_batch_token_budget,
+        'prompt_token_budget': prompt_token_budget,
+        'metrics_baseline': run_metrics.stage_totals(),
     }
+    if ghidra_client.get_client().replicas:
+        config['instance_baseline'] = run_metrics.REGISTRY.counter_totals("ghidra_requests_total", "instance")
+    if ai_endpoints:
+        client = _make_endpoint_pool(ai_endpoints, adaptive_rate, delay_seconds, requests_per_minute, tokens_per_minute,
+                                     max_requests_per_minute, stop_event, on_log)
+        config['endpoint_pool'] = client
+        if adaptive_rate:
+            config['delay'] = 0
+    elif adaptive_rate:
+        limiter = _make_rate_limiter(delay_seconds, requests_per_minute, tokens_per_minute, max_requests_per_minute, on_log)
+        client = RateLimitedClient(client, limiter, estimate_tokens, stop_event=stop_event)
+        config['rate_limiter'] = limiter
+        # 节奏完全由限速器控制
+        config['delay'] = 0
+    if use_decompile_cache:
+        config['decompile_cache'], config['program_id'] = _open_decompile_cache(on_log)
+    if dedup_names:
+        config['name_dedup'] = _open_name_dedup(on_log)
 
-    # 预取所有函数（需处理的函数量）
-    functions = fetch_all_functions(config['function_pattern'], config['batch_size'])
-    need_total = len(functions)
+    # 流式枚举需处理的函数，读取第一页后即开始处理，总数在枚举结束后才确定
+    def on_enumerated(total: int):
+        if functions.error:
+            if on_log:
+                on_log(f"警告: 函数枚举中断: {functions.error}", WARN)
+        else:
+            _journal(config, "enumerated", total=total)
+        if on_log:
+            on_log(f"函数枚举完成: 需处理函数量 {total}")
 
-    # 同时统计总函数量
-    all_methods_total = get_all_methods_count()
+    functions = _plan_functions(config, journal, resume, use_catalog, on_log)
+    if functions is None:
+        functions = FunctionStream(config['function_pattern'], config['batch_size'],
+                                   on_entry=lambda entry: _journal(config, "queued", entry),
+                                   on_exhausted=on_enumerated)
 
     if on_log:
         on_log("开始批量处理函数重命名...")
         on_log(f"配置信息:")
-        on_log(f"- 总函数量: {all_methods_total}")
-        on_log(f"- 需处理函数量: {need_total}")
         on_log(f"- 函数名模式: {config['function_pattern']}")
         on_log(f"- 批处理大小: {config['batch_size']}")
-        on_log(f"- 处理延迟: {config['delay']}秒")
+        if adaptive_rate:
+            on_log(f"- 自适应限速: 初始 {_initial_rate(config):.1f} 请求/分钟，上限 {max_requests_per_minute} 请求/分钟")
+        else:
+            on_log(f"- 处理延迟: {config['delay']}秒")
+        if config.get('endpoint_pool') is not None:
+            on_log(f"- AI端点池: {describe_endpoints(config['endpoint_pool'])}")
+        if pipeline:
+            on_log(f"- 流水线模式: 反编译 {decompile_workers} / AI {ai_workers} / 重命名 {rename_workers} 线程")
+        if ai_batch_size > 1:
+            on_log(f"- 批量命名: 每次请求最多 {ai_batch_size} 个函数 / 约 {ai_batch_token_budget} tokens")
+        if call_graph_order:
+            on_log("- 调度顺序: 按调用图自底向上")
+        if 'instance_baseline' in config:
+            on_log(f"- Ghidra 实例: {describe_instances()}")
+        if prompt_token_budget:
+            on_log(f"- 代码压缩: 每个函数约 {prompt_token_budget} tokens 以内")
+        if config.get('decompile_cache') is not None:
+            on_log(f"- 反编译缓存: 已启用 (程序标识 {config['program_id']})")
+        if config.get('name_dedup') is not None:
+            on_log("- 命名去重: 已启用")
         on_log("-" * 50)
 
-    if need_total == 0:
+    if _no_functions(functions):
         if on_log:
             on_log("无可处理函数，退出。")
+        _close_run_resources(config)
         if on_progress:
             on_progress(0, 0)
         return
 
+    # 全部函数名在后台读取，用于重命名时的冲突检查
+    _start_name_registry(config, on_log)
+
     # 初始进度（运行前应为0）
     if on_progress:
-        on_progress(0, need_total)
+        on_progress(0, _known_total(functions))
 
-    process_functions(config, client, model_name, functions, on_log=on_log, on_progress=on_progress, stop_event=stop_event)
+    try:
+        if call_graph_order:
+            process_functions_by_call_graph(config, client, model_name, functions, on_log=on_log, on_progress=on_progress, stop_event=stop_event)
+        elif pipeline:
+            process_functions_pipelined(config, client, model_name, functions, on_log=on_log, on_progress=on_progress, stop_event=stop_event)
+        else:
+            process_functions(config, client, model_name, functions, on_log=on_log, on_progress=on_progress, stop_event=stop_event)
+    finally:
+        _close_run_resources(config, on_log)
 
     if on_log:
         on_log("处理完成")
\ No newline at end of file
@@ -0,0 +1,357 @@
+import asyncio
+import concurrent.futures
+import random
+from typing import Optional
+
+from openai import AsyncOpenAI, DEFAULT_MAX_RETRIES
+
+import ai_rename
+from ai_rename import (
+    build_rename_messages,
+    is_valid_function_name,
+    _make_emitters,
+    _clean_function_name,
+    _is_request_error,
+    _invalidate_cached,
+    _open_decompile_cache,
+    _open_name_dedup,
+    _start_name_registry,
+    _known_total,
+    _settle,
+    _journal,
+    _plan_functions,
+    _record_rename,
+    _compact_for_ai,
+    _close_run_resources,
+    _make_rate_limiter,
+    _make_endpoint_pool,
+    _initial_rate,
+    describe_endpoints,
+    estimate_tokens,
+)
+from rate_limiter import AsyncRateLimitedClient
+import ghidra_client
+from ghidra_client import split_function_entry, is_error_response, AsyncGhidraClient as BaseAsyncGhidraClient
+from decompile_cache import decompile_with_cache_async
+from function_stream import FunctionStream
+from rename_journal import RENAMED, FAILED
+from log_buffer import leveled_log, WARN, ERROR
+import run_metrics
+
+
+class AsyncGhidraClient(BaseAsyncGhidraClient):
+    """Ghidra 插件异步客户端，附带重命名流程用到的接口（各端点超时见 ghidra_client.ENDPOINT_TIMEOUTS）"""
+
+    async def search_functions_by_name(self, query: str, offset: int = 0, limit: int = 100) -> list:
+        if not query:
+            return ["Error: query string is required"]
+        return await self.get("searchFunctions", {"query": query, "offset": offset, "limit": limit})
+
+    async def decompile_function(self, name: str) -> str:
+        return await self.post("decompile", name)
+
+    async def rename_function(self, old_name: str, new_name: str) -> str:
+        return await self.post("renameFunction", {"oldName": old_name, "newName": new_name})
+
+    async def get_all_methods_count(self) -> int:
+        lines = await self.get("methods", {"offset": 0, "limit": 999999})
+        if is_error_response(lines):
+            return 0
+        return len(lines)
+
+
+async def _journal_async(config: dict, event: str, func_name: str = None, **fields) -> None:
+    """_journal 的协程版本：断点日志的写入（含 fsync）在线程池中进行，不阻塞事件循环"""
+    if config.get('journal') is not None:
+        await asyncio.to_thread(_journal, config, event, func_name, **fields)
+
+
+def stream_functions_async(ghidra: AsyncGhidraClient, pattern: str, batch_size: int, on_entry=None, on_exhausted=None) -> FunctionStream:
+    """流式枚举匹配的函数（异步迭代）"""
+    return FunctionStream(
+        pattern, batch_size, on_entry=on_entry, on_exhausted=on_exhausted,
+        afetch=lambda offset, limit: ghidra.search_functions_by_name(pattern, offset=offset, limit=limit),
+    )
+
+
+async def fetch_all_functions_async(ghidra: AsyncGhidraClient, pattern: str, batch_size: int) -> list:
+    """分页获取所有匹配的函数名列表（异步版本）"""
+    return [func_name async for func_name in stream_functions_async(ghidra, pattern, batch_size)]
+
+
+async def analyze_function_async(decompiled_code: str, client: AsyncOpenAI, model_name: str) -> Optional[str]:
+    """analyze_function 的异步版本"""
+    if not decompiled_code or len(decompiled_code.strip()) == 0:
+        print("警告: 收到空的反编译代码")
+        return None
+
+    try:
+        response = await client.chat.completions.create(
+            model=model_name,
+            messages=build_rename_messages(decompiled_code),
+            temperature=0.7,
+            max_tokens=50
+        )
+
+        new_name = response.choices[0].message.content.strip()
+
+        if not is_valid_function_name(new_name):
+            print(f"警告: AI返回了无效的函数名: {new_name}")
+            return None
+
+        return new_name
+
+    except Exception as e:
+        print(f"AI API调用失败: {str(e)}")
+        return None
+
+
+async def _pause(config: dict) -> None:
+    if config['delay'] > 0:
+        with run_metrics.timer("rename_stage_seconds", stage="delay"):
+            await asyncio.sleep(config['delay'])
+
+
+async def process_functions_async(config: dict, client: AsyncOpenAI, model_name: str, functions: list, ghidra: AsyncGhidraClient,
+                                  on_log=None, on_progress=None, stop_event=None):
+    """
+    异步批量重命名：每个函数一个协程，所有协程共享同一个信号量，
+    同时在途的函数数量由 config['concurrency'] 控制。
+    """
+    max_consecutive_failures = 10 # 最大连续失败次数
+    concurrency = max(1, int(config.get('concurrency', 100)))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    emit_log, emit_progress = _make_emitters(on_log, on_progress)
+    state = {'processed': 0, 'consecutive_failures': 0, 'halted': False}
+
+    def should_stop() -> bool:
+        if state['halted']:
+            return True
+        if stop_event is not None and hasattr(stop_event, 'is_set') and stop_event.is_set():
+            state['halted'] = True
+            emit_log("\n收到停止信号，提前结束处理。")
+            return True
+        return False
+
+    def mark_done(renamed: bool = False):
+        _settle(functions, renamed)
+        state['processed'] += 1
+        emit_progress(state['processed'], _known_total(functions))
+
+    async def entries():
+        if isinstance(functions, FunctionStream):
+            async for func_name in functions:
+                yield func_name
+        else:
+            for func_name in functions:
+                yield func_name
+
+    async def handle(func_name: str):
+        renamed = False
+        try:
+            if not func_name or not func_name.strip():
+                return
+            clean_func_name = _clean_function_name(func_name)
+
+            _, address = split_function_entry(func_name)
+            with run_metrics.timer("rename_stage_seconds", stage="decompile"):
+                decompiled = await decompile_with_cache_async(config.get('decompile_cache'), config.get('program_id'),
+                                                              clean_func_name, address, ghidra.decompile_function,
+                                                              fresh_only=config.get('decompile_fresh_only', False))
+            if not decompiled:
+                emit_log(f"\n跳过 {func_name}: 无反编译结果", WARN)
+                await _journal_async(config, FAILED, func_name, stage="decompile", reason="无反编译结果")
+                return
+            if _is_request_error(decompiled):
+                emit_log(f"\n跳过 {func_name}: {decompiled}", WARN)
+                await _journal_async(config, FAILED, func_name, stage="decompile", reason=decompiled)
+                return
+            await _journal_async(config, "decompiled", func_name)
+
+            first_line = decompiled.split('\n')[0]
+            emit_log(f"\n正在分析函数: {func_name}\n函数签名: {first_line}\n----------------------------------------")
+
+            prompt_code = _compact_for_ai(config, func_name, decompiled, emit_log)
+            dedup = config.get('name_dedup')
+            with run_metrics.timer("rename_stage_seconds", stage="ai"):
+                if dedup is not None:
+                    new_name, reused = await dedup.resolve_async(
+                        decompiled, lambda _: analyze_function_async(prompt_code, client, model_name))
+                else:
+                    new_name, reused = await analyze_function_async(prompt_code, client, model_name), False
+            if reused:
+                emit_log(f"复用相同函数体的命名结果: {new_name}")
+            if not new_name:
+                emit_log(f"跳过 {func_name}: AI分析失败或返回无效函数名", WARN)
+                await _journal_async(config, FAILED, func_name, stage="ai", reason="AI分析失败或返回无效函数名")
+                state['consecutive_failures'] += 1
+                if state['consecutive_failures'] >= max_consecutive_failures and not state['halted']:
+                    state['halted'] = True
+                    emit_log(f"\n连续 {max_consecutive_failures} 次AI调用失败或返回无效名称。", ERROR)
+                    emit_log("请检查您的API密钥是否正确或网络连接是否正常。脚本将停止。", ERROR)
+                # 每个在途槽位各自限速，避免触发API限制
+                if not reused:
+                    await _pause(config)
+                return
+            state['consecutive_failures'] = 0
+            await _journal_async(config, "named", func_name, name=new_name)
+
+            # 名称已存在时加上后缀
+            with run_metrics.timer("rename_stage_seconds", stage="rename"):
+                registry = config.get('name_registry')
+                if isinstance(registry, concurrent.futures.Future):
+                    registry = await asyncio.wrap_future(registry)
+                if registry is not None:
+                    new_name = registry.reserve(new_name, clean_func_name)
+                elif await ghidra.search_functions_by_name(new_name, limit=1):
+                    new_name += "_" + str(random.randint(1000, 9999))
+                result = await ghidra.rename_function(clean_func_name, new_name)
+            if ghidra_client._write_succeeded("renameFunction", result):
+                renamed = True
+                await asyncio.to_thread(_record_rename, config, func_name, clean_func_name, new_name, registry)
+                emit_log(f"重命名成功: {func_name} -> {new_name}")
+            else:
+                if registry is not None:
+                    registry.release(new_name, clean_func_name)
+                await _journal_async(config, FAILED, func_name, stage="rename", reason=result)
+                emit_log(f"重命名失败 {func_name}: {result}", ERROR)
+            if not reused:
+                await _pause(config)
+        except Exception as e:
+            emit_log(f"处理函数 {func_name} 时出错: {str(e)}", ERROR)
+            await _journal_async(config, FAILED, func_name, stage="error", reason=str(e))
+        finally:
+            mark_done(renamed)
+            semaphore.release()
+
+    tasks = set()
+    try:
+        async for func_name in entries():
+            await semaphore.acquire()
+            if should_stop():
+                semaphore.release()
+                break
+            task = asyncio.create_task(handle(func_name))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    except Exception as e:
+        emit_log(f"批处理过程出错: {str(e)}", ERROR)
+
+
+async def run_rename_async(api_key: str, api_base: str, model_name: str, function_pattern: str, batch_size: int, delay_seconds: float,
+                           on_log=None, on_progress=None, stop_event=None, concurrency: int = 100, use_decompile_cache: bool = True,
+                           dedup_names: bool = True, adaptive_rate: bool = True, requests_per_minute: float = None,
+                           tokens_per_minute: float = None, max_requests_per_minute: float = 600,
+                           journal: bool = True, resume: bool = False, prompt_token_budget: int = 4000,
+                           use_catalog: bool = True, ai_endpoints: list = None):
+    """
+    run_rename 的异步版本：使用 AsyncOpenAI 与异步 Ghidra 客户端，
+    最多 concurrency 个函数同时处于反编译/AI命名/重命名过程中。
+    """
+    on_log = leveled_log(on_log)
+    config = {
+        'function_pattern': function_pattern,
+        'batch_size': batch_size,
+        'delay': delay_seconds,
+        'concurrency': concurrency,
+        'prompt_token_budget': prompt_token_budget,
+        'metrics_baseline': run_metrics.stage_totals(),
+    }
+    shared = ghidra_client.get_client()
+    if shared.replicas:
+        config['instance_baseline'] = run_metrics.REGISTRY.counter_totals("ghidra_requests_total", "instance")
+    if ai_endpoints:
+        client = _make_endpoint_pool(ai_endpoints, adaptive_rate, delay_seconds, requests_per_minute, tokens_per_minute,
+                                     max_requests_per_minute, stop_event, on_log, use_async=True)
+        config['endpoint_pool'] = client
+        if adaptive_rate:
+            config['delay'] = 0
+    else:
+        client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=api_base,
+            # 429 由限速器处理（降速、按 Retry-After 等待后重试），SDK 自带的重试会让限速器晚一步降速
+            max_retries=0 if adaptive_rate else DEFAULT_MAX_RETRIES
+        )
+    if adaptive_rate and not ai_endpoints:
+        limiter = _make_rate_limiter(delay_seconds, requests_per_minute, tokens_per_minute, max_requests_per_minute, on_log)
+        client = AsyncRateLimitedClient(client, limiter, estimate_tokens, stop_event=stop_event)
+        config['rate_limiter'] = limiter
+        config['delay'] = 0
+    if use_decompile_cache:
+        config['decompile_cache'], config['program_id'] = await asyncio.to_thread(_open_decompile_cache, on_log)
+    if dedup_names:
+        config['name_dedup'] = await asyncio.to_thread(_open_name_dedup, on_log)
+
+    try:
+        # 与同步模式使用同一组（已由 run_rename 校验过的）Ghidra 实例
+        async with AsyncGhidraClient(shared.base_url, max_connections=concurrency,
+                                     replica_urls=[replica.base_url for replica in shared.replicas]) as ghidra:
+            # 流式枚举需处理的函数，读取第一页后即开始处理
+            def on_enumerated(total: int):
+                if functions.error:
+                    if on_log:
+                        on_log(f"警告: 函数枚举中断: {functions.error}", WARN)
+                else:
+                    _journal(config, "enumerated", total=total)
+                if on_log:
+                    on_log(f"函数枚举完成: 需处理函数量 {total}")
+
+            functions = await asyncio.to_thread(_plan_functions, config, journal, resume, use_catalog, on_log)
+            if functions is None:
+                functions = stream_functions_async(ghidra, config['function_pattern'], config['batch_size'],
+                                                   on_entry=lambda entry: _journal(config, "queued", entry),
+                                                   on_exhausted=on_enumerated)
+
+            if on_log:
+                on_log("开始批量处理函数重命名...")
+                on_log(f"配置信息:")
+                on_log(f"- 函数名模式: {config['function_pattern']}")
+                on_log(f"- 批处理大小: {config['batch_size']}")
+                if adaptive_rate:
+                    on_log(f"- 自适应限速: 初始 {_initial_rate(config):.1f} 请求/分钟，上限 {max_requests_per_minute} 请求/分钟")
+                else:
+                    on_log(f"- 处理延迟: {config['delay']}秒")
+                if ai_endpoints:
+                    on_log(f"- AI端点池: {describe_endpoints(client)}")
+                on_log(f"- 异步模式: 最大并发 {concurrency}")
+                if ghidra.replicas:
+                    on_log(f"- Ghidra 实例: {ai_rename.describe_instances()}")
+                if prompt_token_budget:
+                    on_log(f"- 代码压缩: 每个函数约 {prompt_token_budget} tokens 以内")
+                if config.get('decompile_cache') is not None:
+                    on_log(f"- 反编译缓存: 已启用 (程序标识 {config['program_id']})")
+                if config.get('name_dedup') is not None:
+                    on_log("- 命名去重: 已启用")
+                on_log("-" * 50)
+
+            if (await functions.is_empty_async()) if isinstance(functions, FunctionStream) else not functions:
+                if on_log:
+                    on_log("无可处理函数，退出。")
+                await asyncio.to_thread(_close_run_resources, config)
+                if on_progress:
+                    on_progress(0, 0)
+                return
+
+            # 全部函数名在后台读取，用于重命名时的冲突检查
+            _start_name_registry(config, on_log)
+
+            # 初始进度（运行前应为0）
+            if on_progress:
+                on_progress(0, _known_total(functions))
+
+            try:
+                await process_functions_async(config, client, model_name, functions, ghidra,
+                                              on_log=on_log, on_progress=on_progress, stop_event=stop_event)
+            finally:
+                if ghidra.replicas:
+                    config['mirror_failures'] = await ghidra.flush_mirrors()
+                await asyncio.to_thread(_close_run_resources, config, on_log)
+    finally:
+        await client.close()
+
+    if on_log:
+        on_log("处理完成")
@@ -61,7 +61,16 @@ if (Test-Path $specPath) {
 } else {
     & $pyi --noconfirm --noconsole --name "Ghidra-AI-Rename-GUI" `
         --icon "res\logo.ico" `
+        --paths "..\脚本" `
         --add-data "ai_rename.py;." `
+        --add-data "ai_rename_async.py;." `
+        --add-data "call_graph.py;." `
+        --add-data "code_compactor.py;." `
+        --add-data "endpoint_pool.py;." `
+        --add-data "log_buffer.py;." `
+        --add-data "name_dedup.py;." `
+        --add-data "rate_limiter.py;." `
+        --add-data "rename_journal.py;." `
         --add-data "startup_checker.py;." `
         --add-data "res\logo.ico;res" `
         --collect-all "PyQt6" `
@@ -70,7 +79,7 @@ if (Test-Path $specPath) {
         --collect-submodules "requests" `
         --collect-submodules "mcp.server.fastmcp" `
         --hidden-import PyQt6 --hidden-import PyQt6.QtCore --hidden-import PyQt6.QtGui --hidden-import PyQt6.QtWidgets `
-        --hidden-import openai --hidden-import requests --hidden-import mcp.server.fastmcp --hidden-import dotenv `
+        --hidden-import openai --hidden-import httpx --hidden-import requests --hidden-import mcp.server.fastmcp --hidden-import dotenv `
         "ghidra_ai_gui.py"
 }
 
@@ -0,0 +1,142 @@
+"""
+基于调用图的自底向上重命名调度。
+
+被调用函数先完成重命名后，AI 在分析调用者时能看到有意义的名称，命名质量更高。
+这里通过插件的 function_xrefs 接口一次性建立待处理函数之间的调用关系，
+把强连通分量（互相递归的函数）合并为一个节点后按层拓扑排序：
+第0层是不调用其他待处理函数的叶子，第k层只依赖更低层。同一层内的函数可以完全并行处理。
+"""
+import concurrent.futures
+import re
+
+from ghidra_client import safe_get, split_function_entry, is_error_response
+
+# function_xrefs 的返回格式: "From 00401234 in FUN_00401000 [UNCONDITIONAL_CALL]"
+_XREF_RE = re.compile(r"^From\s+(\S+)\s+in\s+(.+?)\s+\[(\w+)\]\s*$")
+
+
+def fetch_callers(func_name: str, page_size: int = 500) -> set:
+    """分页读取指向该函数的调用引用，返回调用者函数名集合（忽略数据引用）"""
+    callers = set()
+    offset = 0
+    while True:
+        lines = safe_get("function_xrefs", {"name": func_name, "offset": offset, "limit": page_size})
+        if not lines or is_error_response(lines):
+            break
+        for line in lines:
+            match = _XREF_RE.match(line.strip())
+            if match and "CALL" in match.group(3):
+                callers.add(match.group(2))
+        if len(lines) < page_size:
+            break
+        offset += page_size
+    return callers
+
+
+def build_call_graph(functions: list, workers: int = 8, stop_event=None, on_log=None) -> dict:
+    """
+    建立待处理函数之间的调用关系，返回 {函数条目: 它调用的函数条目集合}。
+    函数条目即 searchFunctions 返回的 "name @ address" 字符串，集合之外的函数被忽略。
+    """
+    by_name = {}
+    for entry in functions:
+        name, _ = split_function_entry(entry)
+        by_name.setdefault(name, []).append(entry)
+    callees = {entry: set() for entry in functions}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(fetch_callers, split_function_entry(entry)[0]): entry for entry in functions}
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            if stop_event is not None and stop_event.is_set():
+                for pending in futures:
+                    pending.cancel()
+                break
+            callee = futures[future]
+            try:
+                callers = future.result()
+            except Exception:
+                continue
+            for caller_name in callers:
+                for caller in by_name.get(caller_name, ()):
+                    if caller != callee:
+                        callees[caller].add(callee)
+            if on_log and done % 500 == 0:
+                on_log(f"调用图: 已分析 {done}/{len(functions)} 个函数")
+    return callees
+
+
+def strongly_connected_components(callees: dict) -> list:
+    """Tarjan 算法（迭代实现，避免深调用链触发递归上限），返回分量列表"""
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in callees:
+        if root in index:
+            continue
+        work = [(root, iter(callees[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, successors = work[-1]
+            advanced = False
+            for succ in successors:
+                if succ not in index:
+                    index[succ] = lowlink[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(callees[succ])))
+                    advanced = True
+                    break
+                if succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def bottom_up_levels(functions: list, callees: dict) -> list:
+    """
+    按叶子优先的拓扑层级分组，返回 [[第0层函数...], [第1层函数...], ...]。
+    同一强连通分量内的函数位于同一层，层内保持原始顺序。
+    """
+    components = strongly_connected_components(callees)
+    component_of = {}
+    for i, component in enumerate(components):
+        for member in component:
+            component_of[member] = i
+
+    # Tarjan 输出的分量顺序本身就是逆拓扑序（被调用者先出现），依次计算层级即可
+    level_of_component = []
+    for i, component in enumerate(components):
+        level = 0
+        for member in component:
+            for callee in callees[member]:
+                j = component_of[callee]
+                if j != i:
+                    level = max(level, level_of_component[j] + 1)
+        level_of_component.append(level)
+
+    levels = [[] for _ in range(max(level_of_component, default=-1) + 1)]
+    for entry in functions:
+        levels[level_of_component[component_of[entry]]].append(entry)
+    return levels
@@ -0,0 +1,123 @@
+"""
+提交给AI之前压缩反编译代码。
+
+大型函数（尤其是包含大量 switch 分支的函数）的反编译结果动辄上万 token，请求慢、费用高，
+还可能超出模型上下文。这里依次：
+1. 去掉 Ghidra 生成的 WARNING 注释并合并多余空行；
+2. 把只有数字常量不同的重复代码块（例如 switch 的各个 case）折叠为前两组加一行说明；
+3. 仍超出 token 预算时截断函数体：保留函数签名、函数调用与字符串字面量，
+   剩余预算按原顺序填充其他语句，被省略的连续行用一行注释代替。
+"""
+import re
+
+# Ghidra 插入的警告注释，例如 /* WARNING: Removing unreachable block (ram,0x00401234) */
+_WARNING_RE = re.compile(r"/\*\s*WARNING[^*]*\*+(?:[^/*][^*]*\*+)*/|//\s*WARNING:[^\n]*")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n(\s*\n)+")
+_NUMBER_RE = re.compile(r"\b0x[0-9a-fA-F]+\b|\b\d+\b")
+_CALL_RE = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+_NOT_CALLS = {"if", "while", "for", "switch", "return", "sizeof", "do"}
+
+# 重复代码块的最大行数，以及至少重复多少组才折叠
+MAX_BLOCK_LINES = 8
+MIN_REPEATS = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（代码大约每4个字符一个token）"""
+    return len(text) // 4 + 1
+
+
+def strip_boilerplate(code: str) -> str:
+    code = _WARNING_RE.sub("", code)
+    lines = [line.rstrip() for line in code.splitlines()]
+    # 去掉注释后只剩空白的行，再把连续空行合并为一行
+    code = "\n".join(lines)
+    return _BLANK_LINES_RE.sub("\n\n", code).strip()
+
+
+def _shape(line: str) -> str | None:
+    """用于比较重复代码的行形状：数字常量视为相同；含字符串或没有实际内容的行不参与折叠"""
+    stripped = line.strip()
+    if not stripped or '"' in stripped or not re.search(r"\w", stripped):
+        return None
+    return _NUMBER_RE.sub("N", stripped)
+
+
+def collapse_repetition(code: str) -> str:
+    lines = code.splitlines()
+    shapes = [_shape(line) for line in lines]
+    out = []
+    i = 0
+    while i < len(lines):
+        best = None
+        for size in range(1, MAX_BLOCK_LINES + 1):
+            block = shapes[i:i + size]
+            if len(block) < size or None in block:
+                break
+            repeats = 1
+            while shapes[i + repeats * size:i + (repeats + 1) * size] == block:
+                repeats += 1
+            if repeats >= MIN_REPEATS and (repeats - 2) * size >= 2 and (best is None or repeats * size > best[0] * best[1]):
+                best = (size, repeats)
+        if best is None:
+            out.append(lines[i])
+            i += 1
+            continue
+        size, repeats = best
+        out.extend(lines[i:i + 2 * size])
+        indent = lines[i][:len(lines[i]) - len(lines[i].lstrip())]
+        out.append(f"{indent}/* ... 省略 {(repeats - 2) * size} 行相似代码（共 {repeats} 组） */")
+        i += repeats * size
+    return "\n".join(out)
+
+
+def _is_essential(line: str) -> bool:
+    """函数调用与字符串字面量最能体现函数用途，截断时优先保留"""
+    if '"' in line:
+        return True
+    return any(name not in _NOT_CALLS for name in _CALL_RE.findall(line))
+
+
+def truncate_to_budget(code: str, max_tokens: int) -> str:
+    if estimate_tokens(code) <= max_tokens:
+        return code
+    lines = code.splitlines()
+    # 函数签名：直到第一个 "{"（签名跨多行时一并保留）
+    head_end = next((i for i, line in enumerate(lines[:8]) if "{" in line), 0) + 1
+    tail_start = len(lines) - 1 if len(lines) > head_end and lines[-1].strip() == "}" else len(lines)
+    body = list(range(head_end, tail_start))
+    fixed = lines[:head_end] + lines[tail_start:]
+    marker_cost = estimate_tokens("  /* ... 省略 0000 行 */")
+    remaining = max_tokens - sum(estimate_tokens(line) for line in fixed) - marker_cost
+
+    keep = set()
+    essential = {i for i in body if _is_essential(lines[i])}
+    ordered = [i for i in body if i in essential] + [i for i in body if i not in essential]
+    for i in ordered:
+        # 前一行未保留时，这一行前面还需要一条省略说明
+        cost = estimate_tokens(lines[i]) + (marker_cost if i - 1 not in keep else 0)
+        if cost > remaining:
+            continue
+        keep.add(i)
+        remaining -= cost
+
+    out = lines[:head_end]
+    skipped = 0
+    for i in body:
+        if i in keep:
+            if skipped:
+                out.append(f"  /* ... 省略 {skipped} 行 */")
+                skipped = 0
+            out.append(lines[i])
+        else:
+            skipped += 1
+    if skipped:
+        out.append(f"  /* ... 省略 {skipped} 行 */")
+    out.extend(lines[tail_start:])
+    return "\n".join(out)
+
+
+def compact_decompiled(code: str, max_tokens: int) -> str:
+    """依次去除样板、折叠重复代码、按 token 预算截断"""
+    code = collapse_repetition(strip_boilerplate(code))
+    return truncate_to_budget(code, max_tokens)
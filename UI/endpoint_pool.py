@@ -0,0 +1,262 @@
+"""
+AI端点池：一次运行同时使用多个配置（各自的 API地址、密钥与模型）。
+
+请求在未被剔除的端点之间按平滑加权轮询分配，权重为最近的成功率除以最近的平均耗时（含限速等待），
+即各端点分到的请求数与其实际吞吐量成正比。
+每个端点有独立的自适应限速器，当前没有额度的端点会被跳过，请求转给其他端点。
+请求失败时换一个端点重试；连续失败 eject_after 次的端点被暂时剔除，
+剔除时间从 eject_seconds 开始每次翻倍（最多 max_eject_seconds），到期后重新试用，成功即恢复。
+所有端点都被剔除时，请求等待最早到期的端点恢复试用（收到停止信号时取消）。
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from log_buffer import leveled_log, INFO, WARN
+from rate_limiter import is_rate_limit_error, retry_after_seconds, _request_tokens
+import run_metrics
+
+# 最近成功率与耗时的平滑系数
+EWMA_ALPHA = 0.2
+# 成功率的下限，避免权重为0的端点永远得不到请求
+MIN_SUCCESS_RATE = 0.05
+# 尚无耗时样本的端点按其他端点的平均值（都没有时按此值）估计
+DEFAULT_LATENCY = 1.0
+
+
+class Endpoint:
+    """池中的一个端点及其统计信息"""
+
+    def __init__(self, name: str, client, model_name: str, limiter=None):
+        self.name = name
+        self.client = client
+        self.model_name = model_name
+        self.limiter = limiter
+        self.current = 0.0           # 平滑加权轮询的当前值
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.latency = None          # 最近成功请求的平均耗时（秒）
+        self.total_latency = 0.0
+        self.success_rate = 1.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.eject_seconds = 0.0
+
+    def weight(self, default_latency: float) -> float:
+        return max(MIN_SUCCESS_RATE, self.success_rate) / max(0.001, self.latency or default_latency)
+
+    def ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+    def describe(self, share: float, now: float) -> str:
+        average = f"{self.total_latency / self.successes * 1000:.0f} ms" if self.successes else "-"
+        text = (f"AI端点 {self.name}（{self.model_name}）: 请求 {self.requests}，成功 {self.successes}，失败 {self.failures}，"
+                f"429 {self.rate_limited}，平均 {average}，占比 {share:.0%}")
+        if self.limiter is not None:
+            text += f"，限速 {self.limiter.requests_per_minute:.1f} 请求/分钟"
+        if self.ejected(now):
+            text += f"，已剔除（{self.ejected_until - now:.0f} 秒后重试）"
+        return text
+
+
+class EndpointPool:
+    """
+    与 OpenAI 客户端接口相同（chat.completions.create），请求中的 model 替换为所选端点的模型名。
+    endpoints 为 Endpoint 列表；所有工作线程共享同一个实例。
+    """
+
+    def __init__(self, endpoints: list, eject_after: int = 3, eject_seconds: float = 30, max_eject_seconds: float = 300,
+                 max_retries: int = 5, estimate_tokens=None, stop_event=None, on_log=None, report_interval: float = 60):
+        if not endpoints:
+            raise ValueError("端点池至少需要一个端点")
+        self.endpoints = endpoints
+        self.eject_after = eject_after
+        self.base_eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        # 每次调用最多尝试 端点数 + max_retries 次（前若干次各换一个端点）
+        self.max_attempts = len(endpoints) + max_retries
+        self._estimate_tokens = estimate_tokens or (lambda text: len(text) // 3)
+        self._stop_event = stop_event
+        self._lock = threading.Lock()
+        self.on_log = leveled_log(on_log)
+        self.report_interval = report_interval
+        self._last_report = time.monotonic()
+        self._waiting = False        # 是否已输出“所有端点均已被剔除”的警告
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _candidates(self, exclude: set) -> tuple[list, float]:
+        """
+        平滑加权轮询：各可用端点的当前值加上自己的权重，按当前值从大到小返回 (端点列表, 权重之和)，
+        实际使用的端点由 _choose 减去权重之和。优先使用本次调用尚未尝试过的端点。
+        全部被剔除时返回 ([], 距最早到期还需等待的秒数)。
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [endpoint for endpoint in self.endpoints if not endpoint.ejected(now)]
+            if not healthy:
+                return [], min(endpoint.ejected_until for endpoint in self.endpoints) - now
+            known = [endpoint.latency for endpoint in self.endpoints if endpoint.latency]
+            default_latency = sum(known) / len(known) if known else DEFAULT_LATENCY
+            pool = [endpoint for endpoint in healthy if endpoint not in exclude] or healthy
+            total = 0.0
+            for endpoint in pool:
+                weight = endpoint.weight(default_latency)
+                endpoint.current += weight
+                total += weight
+            return sorted(pool, key=lambda endpoint: endpoint.current, reverse=True), total
+
+    def _stopped(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def _all_ejected(self, wait: float) -> float:
+        """所有端点都被剔除：检查停止信号并（每段等待只一次）输出警告，返回本轮应休眠的秒数"""
+        if self._stopped():
+            raise RuntimeError("收到停止信号，取消AI请求")
+        with self._lock:
+            warn, self._waiting = not self._waiting, True
+        if warn and self.on_log:
+            self.on_log(f"警告: 所有AI端点均已被剔除，等待 {wait:.1f} 秒后重新试用", WARN)
+        return min(max(wait, 0.0), 0.5)
+
+    def _acquire_endpoint(self, tried: set, tokens: int):
+        """选出本次尝试使用的端点，所有端点都被剔除时等待"""
+        while True:
+            candidates, total = self._candidates(tried)
+            if candidates:
+                self._waiting = False
+                return self._choose(candidates, total, tokens)
+            time.sleep(self._all_ejected(total))
+
+    def _choose(self, candidates: list, total: float, tokens: int):
+        """选择第一个当前有限速额度的端点；都没有时返回 (排在最前的端点, False)，由调用方等待其额度"""
+        chosen, reserved = candidates[0], False
+        for endpoint in candidates:
+            if endpoint.limiter is None or endpoint.limiter.try_acquire(tokens):
+                chosen, reserved = endpoint, True
+                break
+        with self._lock:
+            chosen.current -= total
+            chosen.requests += 1
+        return chosen, reserved
+
+    def _finish(self, endpoint: Endpoint, start: float, error: Exception = None) -> None:
+        elapsed = time.monotonic() - start
+        message = None
+        with self._lock:
+            if error is None:
+                endpoint.successes += 1
+                endpoint.total_latency += elapsed
+                endpoint.latency = elapsed if endpoint.latency is None else \
+                    endpoint.latency + EWMA_ALPHA * (elapsed - endpoint.latency)
+                endpoint.success_rate += EWMA_ALPHA * (1.0 - endpoint.success_rate)
+                if endpoint.consecutive_failures >= self.eject_after:
+                    message = (f"AI端点 {endpoint.name} 已恢复", INFO)
+                endpoint.consecutive_failures = 0
+                endpoint.eject_seconds = 0.0
+            else:
+                endpoint.failures += 1
+                endpoint.success_rate -= EWMA_ALPHA * endpoint.success_rate
+                if is_rate_limit_error(error):
+                    # 429 由端点自己的限速器降速/暂停，不计入剔除
+                    endpoint.rate_limited += 1
+                else:
+                    endpoint.consecutive_failures += 1
+                    # 剔除前已发出的请求随后失败时不再延长剔除时间
+                    if endpoint.consecutive_failures >= self.eject_after and not endpoint.ejected(time.monotonic()):
+                        endpoint.eject_seconds = min(self.max_eject_seconds, endpoint.eject_seconds * 2 or self.base_eject_seconds)
+                        endpoint.ejected_until = time.monotonic() + endpoint.eject_seconds
+                        endpoint.current = 0.0
+                        endpoint.ejections += 1
+                        message = (f"警告: AI端点 {endpoint.name} 连续失败 {endpoint.consecutive_failures} 次，"
+                                   f"暂停使用 {endpoint.eject_seconds:.0f} 秒: {str(error)[:200]}", WARN)
+        result = "ok" if error is None else ("rate_limited" if is_rate_limit_error(error) else "error")
+        run_metrics.inc("ai_requests_total", endpoint=endpoint.name, result=result)
+        if error is None:
+            run_metrics.observe("ai_request_seconds", elapsed, endpoint=endpoint.name)
+        if endpoint.limiter is not None:
+            if error is None:
+                endpoint.limiter.on_success()
+            elif is_rate_limit_error(error):
+                endpoint.limiter.on_rate_limited(retry_after_seconds(error))
+        if message and self.on_log:
+            self.on_log(*message)
+        self._maybe_report()
+
+    def _create(self, **kwargs):
+        tokens = _request_tokens(kwargs, self._estimate_tokens)
+        tried = set()
+        for attempt in range(self.max_attempts):
+            endpoint, reserved = self._acquire_endpoint(tried, tokens)
+            tried.add(endpoint)
+            start = time.monotonic()
+            if not reserved and not endpoint.limiter.acquire(tokens, self._stop_event):
+                raise RuntimeError("收到停止信号，取消AI请求")
+            try:
+                response = endpoint.client.chat.completions.create(**{**kwargs, "model": endpoint.model_name})
+            except Exception as e:
+                self._finish(endpoint, start, e)
+                if attempt == self.max_attempts - 1 or self._stopped():
+                    raise
+                continue
+            self._finish(endpoint, start)
+            return response
+
+    def describe(self) -> list:
+        """每个端点一行统计信息"""
+        now = time.monotonic()
+        with self._lock:
+            total = sum(endpoint.successes for endpoint in self.endpoints)
+            return [endpoint.describe(endpoint.successes / total if total else 0.0, now) for endpoint in self.endpoints]
+
+    def _maybe_report(self) -> None:
+        if not self.on_log:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.report_interval:
+                return
+            self._last_report = now
+        for line in self.describe():
+            self.on_log(line)
+
+    def close(self) -> None:
+        for endpoint in self.endpoints:
+            endpoint.client.close()
+
+
+class AsyncEndpointPool(EndpointPool):
+    """EndpointPool 的 AsyncOpenAI 版本"""
+
+    async def _acquire_endpoint(self, tried: set, tokens: int):
+        while True:
+            candidates, total = self._candidates(tried)
+            if candidates:
+                self._waiting = False
+                return self._choose(candidates, total, tokens)
+            await asyncio.sleep(self._all_ejected(total))
+
+    async def _create(self, **kwargs):
+        tokens = _request_tokens(kwargs, self._estimate_tokens)
+        tried = set()
+        for attempt in range(self.max_attempts):
+            endpoint, reserved = await self._acquire_endpoint(tried, tokens)
+            tried.add(endpoint)
+            start = time.monotonic()
+            if not reserved and not await endpoint.limiter.acquire_async(tokens, self._stop_event):
+                raise RuntimeError("收到停止信号，取消AI请求")
+            try:
+                response = await endpoint.client.chat.completions.create(**{**kwargs, "model": endpoint.model_name})
+            except Exception as e:
+                self._finish(endpoint, start, e)
+                if attempt == self.max_attempts - 1 or self._stopped():
+                    raise
+                continue
+            self._finish(endpoint, start)
+            return response
+
+    async def close(self) -> None:
+        await asyncio.gather(*(endpoint.client.close() for endpoint in self.endpoints), return_exceptions=True)
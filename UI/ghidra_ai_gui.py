@@ -16,18 +16,23 @@ from PyQt6.QtWidgets import (
     QVBoxLayout,
     QHBoxLayout,
     QPushButton,
-    QTextEdit,
+    QPlainTextEdit,
     QComboBox,
     QInputDialog,
     QMessageBox,
     QDialog,
     QListWidget,
+    QListWidgetItem,
     QDialogButtonBox,
 )
 import threading
 import os
+import time
 
-from startup_checker import check_connection_and_count
+from startup_checker import check_connection_and_count, count_pattern
+import ghidra_client
+from log_buffer import LogBuffer, INFO, WARN, ERROR
+import run_metrics
 try:
     from ai_rename import run_rename
 except Exception:
@@ -43,6 +48,14 @@ APP_NAME = "GhidraAiRename"
 APP_DATA_DIR = os.path.join(os.environ['LOCALAPPDATA'], APP_NAME)
 os.makedirs(APP_DATA_DIR, exist_ok=True) # 确保目录存在
 CONFIG_FILE = os.path.join(APP_DATA_DIR, "api_config.json")
+# 每次任务的完整日志（界面只保留最近 LOG_MAX_LINES 行）
+LOG_FILE = os.path.join(APP_DATA_DIR, "rename.log")
+LOG_MAX_LINES = 5000
+LOG_FLUSH_MS = 100
+LOG_COLORS = {INFO: "#28A745", WARN: "#FFC107", ERROR: "#DC3545"}
+# 每次任务结束后写出的运行指标（JSON，另有同名 .prom 为 Prometheus 格式），以及界面上吞吐量的刷新间隔
+METRICS_FILE = os.path.join(APP_DATA_DIR, "metrics.json")
+METRICS_REFRESH_MS = 1000
 
 
 class ConfigManager:
@@ -68,7 +81,8 @@ class ConfigManager:
                     "api_base": "https://api.siliconflow.cn/",
                     "model_name": "Qwen/Qwen2.5-72B-Instruct",
                     "batch_size": 50,
-                    "delay_ms": 1000
+                    "delay_ms": 1000,
+                    "ghidra_servers": ""
                 }
             }
         }
@@ -88,7 +102,8 @@ class ConfigManager:
         config = self.load_config()
         return config.get("profiles", {}).get(name)
 
-    def save_profile(self, name: str, api_key: str, api_base: str, model_name: str, batch_size: int, delay_ms: int) -> None:
+    def save_profile(self, name: str, api_key: str, api_base: str, model_name: str, batch_size: int, delay_ms: int,
+                     ghidra_servers: str = "") -> None:
         if not name or not name.strip():
             return
         config = self.load_config()
@@ -99,7 +114,8 @@ class ConfigManager:
             "api_base": api_base,
             "model_name": model_name,
             "batch_size": batch_size,
-            "delay_ms": delay_ms
+            "delay_ms": delay_ms,
+            "ghidra_servers": ghidra_servers
         }
         self.save_config(config)
 
@@ -123,6 +139,17 @@ class ConfigManager:
             config["last_selected_profile"] = name
             self.save_config(config)
 
+    def get_pool_profiles(self) -> list[str]:
+        """与当前配置一起组成AI端点池的其他配置（已删除的配置自动忽略）"""
+        config = self.load_config()
+        profiles = config.get("profiles", {})
+        return [name for name in config.get("pool_profiles", []) if name in profiles]
+
+    def set_pool_profiles(self, names: list[str]) -> None:
+        config = self.load_config()
+        config["pool_profiles"] = [name for name in names if name in config.get("profiles", {})]
+        self.save_config(config)
+
 
 class ProfileSelectorDialog(QDialog):
     """一个用于选择和管理配置的弹窗"""
@@ -167,6 +194,46 @@ class ProfileSelectorDialog(QDialog):
         return None
 
 
+class PoolSelectorDialog(QDialog):
+    """勾选与当前配置一起使用的其他配置（AI端点池）"""
+    def __init__(self, profiles: list[str], selected: list[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("AI端点池")
+        self.setMinimumWidth(350)
+        self.resize(350, 260)
+
+        layout = QVBoxLayout(self)
+        hint = QLabel("勾选的配置与当前配置一起使用：请求按各端点的实际速度分配，\n连续失败的端点会暂停使用一段时间。")
+        hint.setWordWrap(True)
+        layout.addWidget(hint)
+
+        self.list_widget = QListWidget()
+        for name in profiles:
+            item = QListWidgetItem(name)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if name in selected else Qt.CheckState.Unchecked)
+            self.list_widget.addItem(item)
+        layout.addWidget(self.list_widget)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        button_box.button(QDialogButtonBox.StandardButton.Ok).setText("确定")
+        button_box.button(QDialogButtonBox.StandardButton.Cancel).setText("取消")
+        layout.addWidget(button_box)
+
+    def checked_profiles(self) -> list[str]:
+        items = (self.list_widget.item(i) for i in range(self.list_widget.count()))
+        return [item.text() for item in items if item.checkState() == Qt.CheckState.Checked]
+
+    @staticmethod
+    def get_profiles(profiles: list[str], selected: list[str], parent=None) -> list[str] | None:
+        dialog = PoolSelectorDialog(profiles, selected, parent)
+        if dialog.exec():
+            return dialog.checked_profiles()
+        return None
+
+
 class AboutDialog(QDialog):
     """关于对话框，显示赞赏码和感谢信息"""
     def __init__(self, parent=None):
@@ -281,14 +348,13 @@ class AppleStyle:
             QProgressBar::chunk { background-color: #0A84FF; border-radius: 8px; }
             QPushButton { background: #FFFFFF; border: 1px solid #E5E5EA; border-radius: 8px; padding: 6px 12px; }
             QPushButton:hover { border: 1px solid #007AFF; }
-            QTextEdit { background: #FFFFFF; border: 1px solid #E5E5EA; border-radius: 8px; padding: 8px; }
+            QPlainTextEdit { background: #FFFFFF; border: 1px solid #E5E5EA; border-radius: 8px; padding: 8px; }
             """
         )
 
 
 class MainWindow(QMainWindow):
     checkCompleted = pyqtSignal(dict)
-    logAppended = pyqtSignal(str)
     progressUpdated = pyqtSignal(int, int)
 
     BUTTON_STYLES = {
@@ -323,8 +389,9 @@ class MainWindow(QMainWindow):
 
         log_group = QGroupBox("日志", self)
         log_v = QVBoxLayout()
-        self.log_view = QTextEdit()
+        self.log_view = QPlainTextEdit()
         self.log_view.setReadOnly(True)
+        self.log_view.setMaximumBlockCount(LOG_MAX_LINES)
         self.log_view.setPlaceholderText("脚本输出将显示在此处…")
         self.log_view.setMinimumHeight(200)
         log_v.addWidget(self.log_view)
@@ -346,8 +413,12 @@ class MainWindow(QMainWindow):
         self.btn_select_profile = QPushButton("选择配置")
         self.btn_select_profile.setStyleSheet(self.BUTTON_STYLES['blue'])
         self.btn_select_profile.clicked.connect(self._open_profile_selector)
+        self.btn_pool = QPushButton("端点池")
+        self.btn_pool.setStyleSheet(self.BUTTON_STYLES['blue'])
+        self.btn_pool.clicked.connect(self._open_pool_selector)
         profile_row_layout.addWidget(self.current_profile_display, 1)
         profile_row_layout.addWidget(self.btn_select_profile)
+        profile_row_layout.addWidget(self.btn_pool)
         api_form.addRow(QLabel("当前配置:"), profile_row_layout)
 
         self.input_apikey = QLineEdit()
@@ -359,6 +430,11 @@ class MainWindow(QMainWindow):
         api_form.addRow(QLabel("API密钥"), self.input_apikey)
         api_form.addRow(QLabel("API网址"), self.input_apibase)
         api_form.addRow(QLabel("模型名称"), self.input_model)
+        # 多个打开同一程序副本的 Ghidra 实例可分担反编译，重命名只发给第一个（主实例）
+        self.input_ghidra = QLineEdit()
+        self.input_ghidra.setPlaceholderText(f"默认 {ghidra_client.DEFAULT_GHIDRA_SERVER}，多个实例用逗号分隔，第一个为主实例")
+        self.input_ghidra.editingFinished.connect(self._apply_ghidra_servers)
+        api_form.addRow(QLabel("Ghidra地址"), self.input_ghidra)
 
         profile_actions_layout = QHBoxLayout()
         profile_actions_layout.addStretch()
@@ -440,7 +516,7 @@ class MainWindow(QMainWindow):
         self.btn_refresh = QPushButton("刷新")
         self.btn_refresh.setStyleSheet(self.BUTTON_STYLES['blue'])
         self.btn_refresh.setMinimumWidth(60)
-        self.btn_refresh.clicked.connect(self._start_async_check)
+        self.btn_refresh.clicked.connect(lambda: self._start_async_check(refresh=True))
         row_status.addWidget(self.btn_refresh)
         row_status.addStretch(1)
         row_ctrl = QHBoxLayout()
@@ -448,13 +524,19 @@ class MainWindow(QMainWindow):
         self.btn_start = QPushButton("开始重命名")
         self.btn_start.setStyleSheet(self.BUTTON_STYLES['blue'])
         self.btn_start.setMinimumWidth(80)
+        self.btn_resume = QPushButton("继续上次")
+        self.btn_resume.setStyleSheet(self.BUTTON_STYLES['blue'])
+        self.btn_resume.setMinimumWidth(80)
+        self.btn_resume.setToolTip("从断点日志继续上次中断的任务：跳过已重命名的函数，重试失败的函数")
         self.btn_stop = QPushButton("停止")
         self.btn_stop.setStyleSheet(self.BUTTON_STYLES['yellow'])
         self.btn_stop.setMinimumWidth(60)
         self.btn_stop.setEnabled(False)
-        self.btn_start.clicked.connect(self._start_rename)
+        self.btn_start.clicked.connect(lambda: self._start_rename())
+        self.btn_resume.clicked.connect(lambda: self._start_rename(resume=True))
         self.btn_stop.clicked.connect(self._stop_rename)
         row_ctrl.addWidget(self.btn_start)
+        row_ctrl.addWidget(self.btn_resume)
         row_ctrl.addWidget(self.btn_stop)
         row_ctrl.addStretch(1)
         self.btn_about = QPushButton("关于")
@@ -469,10 +551,16 @@ class MainWindow(QMainWindow):
         self.label_progress_detail = QLabel("0/0")
         self.label_progress_detail.setAlignment(Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignVCenter)
         self.label_progress_detail.setMinimumHeight(16)
+        # 进度条右侧显示本次任务的吞吐量与各阶段平均耗时
+        self.label_metrics = QLabel("")
+        self.label_metrics.setStyleSheet("color: #6E6E73;")
+        row_progress = QHBoxLayout()
+        row_progress.addWidget(self.progress, 1)
+        row_progress.addWidget(self.label_metrics)
         progress_layout.addLayout(row_top)
         progress_layout.addLayout(row_status)
         progress_layout.addLayout(row_ctrl)
-        progress_layout.addWidget(self.progress)
+        progress_layout.addLayout(row_progress)
         progress_layout.addWidget(self.label_progress_detail)
         progress_group.setLayout(progress_layout)
 
@@ -487,12 +575,18 @@ class MainWindow(QMainWindow):
         AppleStyle.apply(self)
 
         self.checkCompleted.connect(self._apply_check_result)
-        self.logAppended.connect(self._append_log)
+        self._log_buffer = LogBuffer(LOG_MAX_LINES)
+        self._log_timer = QTimer(self)
+        self._log_timer.timeout.connect(self._flush_log)
+        self._log_timer.start(LOG_FLUSH_MS)
         self.progressUpdated.connect(self._apply_progress)
+        self._metrics_timer = QTimer(self)
+        self._metrics_timer.timeout.connect(self._update_metrics)
+        self._metrics_baseline = None
 
         self._mode_timer = QTimer(self)
         self._mode_timer.setSingleShot(True)
-        self._mode_timer.timeout.connect(self._start_async_check)
+        self._mode_timer.timeout.connect(self._update_pattern_count)
         self.input_mode.textChanged.connect(lambda _: self._mode_timer.start(300))
         
         QTimer.singleShot(0, self._load_initial_profile)
@@ -521,8 +615,21 @@ class MainWindow(QMainWindow):
             self.input_model.setText(profile.get("model_name", ""))
             self.input_batch.setText(str(profile.get("batch_size", 50)))
             self.input_delay_ms.setText(str(profile.get("delay_ms", 1000)))
+            self.input_ghidra.setText(profile.get("ghidra_servers", ""))
             self.config_manager.set_last_selected_profile(name)
-            self.logAppended.emit(f"已加载配置: {name}")
+            self._log(f"已加载配置: {name}")
+            self._apply_ghidra_servers()
+
+    def _ghidra_servers(self) -> list:
+        return ghidra_client.parse_server_list(self.input_ghidra.text()) or [ghidra_client.DEFAULT_GHIDRA_SERVER]
+
+    def _apply_ghidra_servers(self) -> None:
+        """主实例地址变化时切换连接并重新检查；副本在开始任务时才连接与校验"""
+        primary = self._ghidra_servers()[0]
+        if self._is_running or primary == ghidra_client.get_client().base_url:
+            return
+        ghidra_client.configure(base_url=primary)
+        self._start_async_check(refresh=True)
 
     def _open_profile_selector(self):
         profiles = self.config_manager.get_profile_names()
@@ -532,6 +639,30 @@ class MainWindow(QMainWindow):
             self.current_profile_display.setText(selected)
             self._load_profile_data(selected)
 
+    def _open_pool_selector(self):
+        current = self.current_profile_display.text()
+        others = [name for name in self.config_manager.get_profile_names() if name != current]
+        if not others:
+            self._log("只有一个配置，请先保存其他API配置后再组成端点池")
+            return
+        selected = PoolSelectorDialog.get_profiles(others, self.config_manager.get_pool_profiles(), self)
+        if selected is not None:
+            self.config_manager.set_pool_profiles(selected)
+            self._log(f"AI端点池: {'，'.join([current] + selected)}" if selected else "已关闭AI端点池")
+
+    def _ai_endpoints(self, api_key: str, api_base: str, model_name: str) -> list | None:
+        """当前配置（使用界面上的值）加上端点池中的其他配置；未启用端点池时返回 None"""
+        current = self.current_profile_display.text()
+        others = [name for name in self.config_manager.get_pool_profiles() if name != current]
+        if not others:
+            return None
+        endpoints = [{"name": current or "当前", "api_key": api_key, "api_base": api_base, "model_name": model_name}]
+        for name in others:
+            profile = self.config_manager.get_profile(name) or {}
+            endpoints.append({"name": name, "api_key": profile.get("api_key", ""),
+                              "api_base": profile.get("api_base", ""), "model_name": profile.get("model_name", "")})
+        return endpoints
+
     def _save_profile(self):
         current_name = self.current_profile_display.text()
         
@@ -551,9 +682,10 @@ class MainWindow(QMainWindow):
             model_name = self.input_model.text().strip()
             batch_size = int(self.input_batch.text() or 50)
             delay_ms = int(self.input_delay_ms.text() or 1000)
+            ghidra_servers = self.input_ghidra.text().strip()
             
-            self.config_manager.save_profile(text, api_key, api_base, model_name, batch_size, delay_ms)
-            self.logAppended.emit(f"配置已保存: {text}")
+            self.config_manager.save_profile(text, api_key, api_base, model_name, batch_size, delay_ms, ghidra_servers)
+            self._log(f"配置已保存: {text}")
             self.current_profile_display.setText(text)
             self.config_manager.set_last_selected_profile(text)
 
@@ -573,26 +705,31 @@ class MainWindow(QMainWindow):
 
         if reply == QMessageBox.StandardButton.Yes:
             if self.config_manager.delete_profile(name):
-                self.logAppended.emit(f"配置已删除: {name}")
+                self._log(f"配置已删除: {name}")
                 self._load_initial_profile()
             else:
                 QMessageBox.warning(self, "无法删除", "不能删除最后一个配置。")
 
-    def _classify_log_level(self, text: str) -> str:
-        t = text.strip().lower()
-        error_keys = ["error", "失败", "异常", "请求超时", "未连接", "请检查", "critical"]
-        warn_keys = ["警告", "warning", "跳过", "超时", "失败或返回无效"]
-        info_keys = ["成功", "开始", "处理完成", "启动重命名任务", "已加载", "已保存", "已删除"]
-        if any(k in t for k in error_keys): return "error"
-        if any(k in t for k in warn_keys): return "warn"
-        if any(k in t for k in info_keys): return "info"
-        return "info"
-
-    def _append_log(self, text: str) -> None:
-        level = self._classify_log_level(text)
-        color = {"info": "#28A745", "warn": "#FFC107", "error": "#DC3545"}.get(level, "#28A745")
-        safe = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-        self.log_view.append(f"<span style='color:{color};'>{safe}</span>")
+    def _log(self, text: str, level: str = INFO) -> None:
+        # 可在任意线程调用，由 _flush_log 定时批量显示
+        self._log_buffer.push(text, level)
+
+    def _flush_log(self) -> None:
+        items, dropped = self._log_buffer.drain()
+        if not items:
+            return
+        # 一次最多显示能保留的行数，更早的直接丢弃
+        if len(items) > LOG_MAX_LINES:
+            dropped += len(items) - LOG_MAX_LINES
+            items = items[-LOG_MAX_LINES:]
+        self.log_view.setUpdatesEnabled(False)
+        if dropped:
+            self.log_view.appendHtml(f"<span style='color:{LOG_COLORS[WARN]};'>... 省略 {dropped} 行日志 ...</span>")
+        for level, text in items:
+            color = LOG_COLORS.get(level, LOG_COLORS[INFO])
+            safe = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\n", "<br>")
+            self.log_view.appendHtml(f"<span style='color:{color};'>{safe}</span>")
+        self.log_view.setUpdatesEnabled(True)
 
     def _apply_progress(self, processed: int, need_total: int) -> None:
         self._processed = max(0, processed)
@@ -606,22 +743,49 @@ class MainWindow(QMainWindow):
         self.label_progress_detail.setText(f"{self._processed}/{self._need_total}")
         self.label_matched.setText(str(self._need_total))
 
-    def _start_async_check(self) -> None:
+    def _update_metrics(self) -> None:
+        """按本次任务开始以来的指标刷新吞吐量与各阶段平均耗时，任务结束后停止刷新"""
+        if self._metrics_baseline is None:
+            return
+        started, stage_baseline, count_baseline = self._metrics_baseline
+        elapsed = time.monotonic() - started
+        finished = sum(run_metrics.since(run_metrics.REGISTRY.counter_totals("rename_functions_total", "result"), count_baseline).values())
+        stages = run_metrics.since(run_metrics.stage_totals(), stage_baseline)
+        parts = [f"{finished / elapsed * 60:.1f} 函数/分钟" if elapsed > 0 else "0 函数/分钟"]
+        parts += [f"{run_metrics.STAGE_NAMES.get(stage, stage)} {total / count * 1000:.0f}ms"
+                  for stage, (count, total) in stages.items()]
+        self.label_metrics.setText(" | ".join(parts))
+        if not self._is_running:
+            self._metrics_timer.stop()
+
+    def _start_async_check(self, refresh: bool = False) -> None:
         if self._is_running: return
         def worker():
-            result = check_connection_and_count(self.input_mode.text().strip())
+            result = check_connection_and_count(self.input_mode.text().strip(), refresh=refresh)
             self.checkCompleted.emit(result)
         threading.Thread(target=worker, daemon=True).start()
 
+    def _update_pattern_count(self) -> None:
+        # 输入模式变化时只在本地函数目录中统计，尚无目录时才请求插件
+        if self._is_running: return
+        result = count_pattern(self.input_mode.text().strip())
+        if result is None:
+            self._start_async_check()
+            return
+        self._apply_counts(result)
+
+    def _apply_counts(self, result: dict) -> None:
+        total, need = int(result.get("total", 0)), int(result.get("matched", 0))
+        self.label_total.setText(str(total))
+        self.label_matched.setText(str(need))
+        self._need_total = need
+        self._processed = 0
+        self.progress.setValue(0)
+        self.label_progress_detail.setText(f"0/{self._need_total}")
+
     def _apply_check_result(self, result: dict) -> None:
         if not self._is_running:
-            total, need = int(result.get("total", 0)), int(result.get("matched", 0))
-            self.label_total.setText(str(total))
-            self.label_matched.setText(str(need))
-            self._need_total = need
-            self._processed = 0
-            self.progress.setValue(0)
-            self.label_progress_detail.setText(f"0/{self._need_total}")
+            self._apply_counts(result)
         if bool(result.get("connected", False)):
             self.label_status.setText("🟢 🟢 (已连接) ✅ 🚦")
             self.label_status.setStyleSheet("color: #28A745; font-weight: 600;")
@@ -629,15 +793,16 @@ class MainWindow(QMainWindow):
             self.label_status.setText("🔴 🔴 (未连接) ⛔ 🛑")
             self.label_status.setStyleSheet("color: #DC3545; font-weight: 600;")
 
-    def _start_rename(self) -> None:
+    def _start_rename(self, resume: bool = False) -> None:
         # 双重检查状态，确保不会重复启动
         if self._is_running: 
-            self.logAppended.emit("任务已在运行中…")
+            self._log("任务已在运行中…")
             return
         if run_rename is None:
-            self.logAppended.emit("未找到重命名入口(run_rename)。请确认脚本可导入。")
+            self._log("未找到重命名入口(run_rename)。请确认脚本可导入。", ERROR)
             # 重置按钮状态
             self.btn_start.setEnabled(True)
+            self.btn_resume.setEnabled(True)
             self.btn_stop.setEnabled(False)
             self._is_running = False
             return
@@ -648,18 +813,30 @@ class MainWindow(QMainWindow):
         pattern = self.input_mode.text().strip()
         batch_size = int(self.input_batch.text() or 50)
         delay_seconds = (int(self.input_delay_ms.text() or 1000)) / 1000.0
+        ghidra_servers = self._ghidra_servers()
+        ai_endpoints = self._ai_endpoints(api_key, api_base, model_name)
 
         self._is_running = True
         self._stop_event = threading.Event()
         self.btn_start.setEnabled(False)
+        self.btn_resume.setEnabled(False)
         self.btn_stop.setEnabled(True)
         self._processed = 0
         self.progress.setValue(0)
         self.label_progress_detail.setText("0/0")
         self.log_view.clear()
-        self.logAppended.emit("启动重命名任务…")
-
-        def on_log(msg: str): self.logAppended.emit(msg)
+        self._log_buffer.drain()
+        try:
+            self._log_buffer.open_file(LOG_FILE)
+        except OSError as e:
+            self._log(f"警告: 无法写入日志文件: {e}", WARN)
+        self._log("继续上次的重命名任务…" if resume else "启动重命名任务…")
+        self._metrics_baseline = (time.monotonic(), run_metrics.stage_totals(),
+                                  run_metrics.REGISTRY.counter_totals("rename_functions_total", "result"))
+        self.label_metrics.setText("")
+        self._metrics_timer.start(METRICS_REFRESH_MS)
+
+        def on_log(msg: str, level: str = INFO): self._log(msg, level)
         def on_progress(done: int, total_need: int): self.progressUpdated.emit(done, total_need)
 
         def worker():
@@ -668,21 +845,30 @@ class MainWindow(QMainWindow):
                     api_key=api_key, api_base=api_base, model_name=model_name,
                     function_pattern=pattern, batch_size=batch_size, delay_seconds=delay_seconds,
                     on_log=on_log, on_progress=on_progress, stop_event=self._stop_event,
+                    resume=resume, ghidra_servers=ghidra_servers, ai_endpoints=ai_endpoints,
                 )
             except Exception as e:
-                self.logAppended.emit(f"任务异常: {e}")
+                self._log(f"任务异常: {e}", ERROR)
             finally:
+                try:
+                    run_metrics.REGISTRY.dump(METRICS_FILE)
+                    self._log(f"运行指标已保存到: {METRICS_FILE}")
+                except OSError as e:
+                    self._log(f"警告: 无法保存运行指标: {e}", WARN)
+                self._log_buffer.close_file()
                 self._is_running = False
                 self.btn_start.setEnabled(True)
+                self.btn_resume.setEnabled(True)
                 self.btn_stop.setEnabled(False)
         threading.Thread(target=worker, daemon=True).start()
 
     def _stop_rename(self) -> None:
         if not self._is_running or self._stop_event is None: return
         self._stop_event.set()
-        self.logAppended.emit("已请求停止当前任务…")
+        self._log("已请求停止当前任务…")
         # 立即更新按钮状态，给用户视觉反馈
         self.btn_start.setEnabled(True)
+        self.btn_resume.setEnabled(True)
         self.btn_stop.setEnabled(False)
         # 确保状态标志也被正确设置
         self._is_running = False
@@ -10,7 +10,7 @@ certifi_datas = collect_data_files('certifi')
 
 a = Analysis(
     ['ghidra_ai_gui.py'],
-    pathex=['.'],
+    pathex=['.', '../脚本'],  # 共享模块 ghidra_client 等位于 脚本/ 目录
     binaries=[],
     datas=[('res/logo.ico', 'res'), ('res/pay.JPG', 'res')] + certifi_datas,
     hiddenimports=[
@@ -0,0 +1,82 @@
+"""
+日志级别与批量日志缓冲。
+
+重命名任务每个函数会输出多行日志，逐条通过信号追加到界面会让长时间运行的任务越来越卡。
+工作线程只把 (级别, 文本) 放入 LogBuffer，界面用定时器批量取出并显示；
+未显示的日志有上限，界面跟不上时丢弃最早的部分，完整内容可同时写入日志文件。
+"""
+import inspect
+import os
+import threading
+import time
+from collections import deque
+
+INFO = "info"
+WARN = "warn"
+ERROR = "error"
+
+
+def leveled_log(on_log):
+    """
+    把日志回调包装为 log(text, level=INFO)。
+    回调接受两个参数时同时传入级别，只接受文本的旧回调（如 print、list.append）照常使用。
+    """
+    if on_log is None or getattr(on_log, "_leveled", False):
+        return on_log
+    try:
+        params = inspect.signature(on_log).parameters.values()
+        takes_level = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)) >= 2
+    except (TypeError, ValueError):
+        takes_level = False
+
+    def log(text: str, level: str = INFO):
+        if takes_level:
+            on_log(text, level)
+        else:
+            on_log(text)
+
+    log._leveled = True
+    return log
+
+
+class LogBuffer:
+    """线程安全的待显示日志队列（环形缓冲），可选写入日志文件"""
+
+    def __init__(self, max_pending: int = 5000):
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=max_pending)
+        self._dropped = 0
+        self._file = None
+
+    def push(self, text: str, level: str = INFO) -> None:
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append((level, text))
+            if self._file is not None:
+                stamp = time.strftime("%H:%M:%S")
+                self._file.write(f"{stamp} [{level}] {text}\n")
+
+    def drain(self) -> tuple[list, int]:
+        """取出全部待显示日志，同时返回因界面来不及显示而丢弃的条数"""
+        with self._lock:
+            items = list(self._pending)
+            dropped = self._dropped
+            self._pending.clear()
+            self._dropped = 0
+            if self._file is not None:
+                self._file.flush()
+        return items, dropped
+
+    def open_file(self, path: str) -> None:
+        """之后的日志同时写入 path（覆盖原有内容）"""
+        self.close_file()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            self._file = open(path, "w", encoding="utf-8")
+
+    def close_file(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
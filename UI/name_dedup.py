@@ -0,0 +1,158 @@
+"""
+按函数体内容去重AI命名请求。
+
+静态链接的程序里大量函数（thunk、模板实例、内联的CRT副本）在去掉 FUN_xxxx/DAT_xxxx 等
+地址相关标记后完全相同。这里对反编译代码做归一化并计算哈希，相同哈希的函数共用一次AI命名结果，
+结果持久化保存，下次运行仍然有效。
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from decompile_cache import CACHE_DIR
+
+DEFAULT_NAME_CACHE_PATH = os.path.join(CACHE_DIR, "name_cache.sqlite3")
+
+# Ghidra 自动生成的带地址标签，例如 FUN_00401000、DAT_0040a000、LAB_00401234、switchD_00401000
+_AUTO_LABEL_RE = re.compile(r"\b(FUN|DAT|LAB|PTR|UNK|SUB|EXT|switchD|caseD|thunk_FUN)_[0-9a-fA-F]+\b")
+# 字符串标签，例如 s_Hello_world_00405000
+_STRING_LABEL_RE = re.compile(r"\b(s|u)_(\w*?)_[0-9a-fA-F]{6,16}\b")
+# 看起来像地址的十六进制常量（较短的常量通常是有意义的数值，保留）
+_ADDRESS_RE = re.compile(r"\b0x[0-9a-fA-F]{6,16}\b")
+_COMMENT_RE = re.compile(r"/\*.*?\*/|//[^\n]*", re.S)
+_SIGNATURE_NAME_RE = re.compile(r"([A-Za-z_]\w*)\s*\(")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_decompiled(code: str) -> str:
+    """去掉注释、自动标签中的地址以及函数自身的名称，得到与加载地址无关的函数体"""
+    code = _COMMENT_RE.sub(" ", code)
+    lines = code.strip().splitlines()
+    if lines:
+        match = _SIGNATURE_NAME_RE.search(lines[0])
+        if match:
+            code = re.sub(rf"\b{re.escape(match.group(1))}\b", "SELF", code)
+    code = _AUTO_LABEL_RE.sub(r"\1", code)
+    code = _STRING_LABEL_RE.sub(r"\1_\2", code)
+    code = _ADDRESS_RE.sub("ADDR", code)
+    return _WHITESPACE_RE.sub(" ", code).strip()
+
+
+def body_hash(code: str) -> str:
+    return hashlib.sha256(normalize_decompiled(code).encode("utf-8")).hexdigest()
+
+
+class NameCache:
+    """函数体哈希 -> AI命名结果 的持久化存储"""
+
+    def __init__(self, path: str = DEFAULT_NAME_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS names (body_hash TEXT PRIMARY KEY, name TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT name FROM names WHERE body_hash = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, name: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO names (body_hash, name, created_at) VALUES (?, ?, ?)", (key, name, time.time())
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NamingDeduplicator:
+    """
+    在 analyze_function 之前查询命名缓存。多个线程同时遇到相同函数体时，
+    只有第一个线程调用AI，其余线程等待并复用其结果。
+    """
+
+    def __init__(self, cache: NameCache):
+        self.cache = cache
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._inflight_async = {}
+
+    def lookup(self, decompiled: str) -> str | None:
+        """只查缓存，命中时计入节省次数"""
+        name = self.cache.get(body_hash(decompiled))
+        if name:
+            with self._lock:
+                self.saved += 1
+        return name
+
+    def remember(self, decompiled: str, name: str) -> None:
+        self.cache.put(body_hash(decompiled), name)
+
+    def resolve(self, decompiled: str, analyze) -> tuple[str | None, bool]:
+        """返回 (函数名, 是否复用了已有结果)；analyze(decompiled) 仅在缓存未命中时调用"""
+        key = body_hash(decompiled)
+        while True:
+            name = self.cache.get(key)
+            if name:
+                with self._lock:
+                    self.saved += 1
+                return name, True
+            with self._lock:
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self._inflight[key] = threading.Event()
+                    break
+            # 其他线程正在为相同的函数体调用AI，等待后重新查缓存
+            waiter.wait()
+            if self.cache.get(key) is None:
+                # 对方失败了，由本线程自行调用（结果可能依旧失败）
+                return analyze(decompiled), False
+        try:
+            name = analyze(decompiled)
+            if name:
+                self.cache.put(key, name)
+            return name, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    async def resolve_async(self, decompiled: str, analyze) -> tuple[str | None, bool]:
+        """resolve 的协程版本，analyze 为返回函数名的协程函数；SQLite 读写在线程池中进行"""
+        key = body_hash(decompiled)
+        name = await asyncio.to_thread(self.cache.get, key)
+        if name:
+            self.saved += 1
+            return name, True
+        pending = self._inflight_async.get(key)
+        if pending is not None:
+            name = await asyncio.shield(pending)
+            if name:
+                self.saved += 1
+                return name, True
+            return await analyze(decompiled), False
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        name = None
+        try:
+            name = await analyze(decompiled)
+            if name:
+                await asyncio.to_thread(self.cache.put, key, name)
+            return name, False
+        finally:
+            self._inflight_async.pop(key, None)
+            future.set_result(name)
+
+    def close(self) -> None:
+        self.cache.close()
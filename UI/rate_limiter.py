@@ -0,0 +1,211 @@
+"""
+自适应限速器：按 请求数/分钟 与 token数/分钟 两个令牌桶限流，
+调用成功时线性提高速率，遇到 429 或 Retry-After 时按比例降低速率（AIMD）。
+所有工作线程/协程共享同一个限速器实例。
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from log_buffer import leveled_log, WARN
+
+
+class _Bucket:
+    """令牌桶，容量为两秒的额度（至少1），允许余额短暂为负以放行超大请求"""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, self.per_minute / 30.0)
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60.0)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """余额达到 min(cost, capacity) 还需等待的秒数"""
+        need = min(cost, self.capacity) - self.level
+        return 0.0 if need <= 0 else need * 60.0 / self.per_minute
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = None,
+                 min_requests_per_minute: float = 1, max_requests_per_minute: float = 600,
+                 increase_per_success: float = 1, decrease_factor: float = 0.5,
+                 on_log=None, report_interval: float = 60):
+        self.min_rpm = min_requests_per_minute
+        self.max_rpm = max_requests_per_minute
+        self.increase_per_success = increase_per_success
+        self.decrease_factor = decrease_factor
+        self._lock = threading.Lock()
+        self._requests = _Bucket(max(self.min_rpm, min(self.max_rpm, requests_per_minute)))
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        # token速率与请求速率同比例调整
+        self._tokens_per_request = (tokens_per_minute / self._requests.per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self.rate_limited = 0
+        self.on_log = leveled_log(on_log)
+        self.report_interval = report_interval
+        self._last_report = time.monotonic()
+
+    @property
+    def requests_per_minute(self) -> float:
+        return self._requests.per_minute
+
+    def describe(self) -> str:
+        text = f"限速器: 当前 {self._requests.per_minute:.1f} 请求/分钟"
+        if self._tokens is not None:
+            text += f"，{self._tokens.per_minute:.0f} tokens/分钟"
+        return text + f"，累计触发429 {self.rate_limited} 次"
+
+    def _reserve(self, tokens: int) -> float:
+        """尝试扣减额度，成功返回0，否则返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._requests.refill(now)
+            wait = self._requests.wait_time(1)
+            if self._tokens is not None:
+                self._tokens.refill(now)
+                wait = max(wait, self._tokens.wait_time(tokens))
+            if wait > 0:
+                return wait
+            self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= tokens
+            return 0.0
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """不等待：当前有额度时扣减并返回 True，否则返回 False"""
+        return self._reserve(tokens) <= 0
+
+    def acquire(self, tokens: int = 0, stop_event=None) -> bool:
+        """阻塞直到获得一次请求的额度；收到停止信号时返回 False"""
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return True
+            time.sleep(min(wait, 0.5))
+
+    async def acquire_async(self, tokens: int = 0, stop_event=None) -> bool:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return True
+            await asyncio.sleep(min(wait, 0.5))
+
+    def on_success(self) -> None:
+        with self._lock:
+            rpm = min(self.max_rpm, self._requests.per_minute + self.increase_per_success)
+            self._set_rate(rpm)
+        self._maybe_report()
+
+    def on_rate_limited(self, retry_after: float = None) -> None:
+        with self._lock:
+            self.rate_limited += 1
+            self._set_rate(max(self.min_rpm, self._requests.per_minute * self.decrease_factor))
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            # 丢弃已积累的额度，避免降速后立即突发
+            self._requests.level = min(self._requests.level, 0.0)
+        if self.on_log:
+            pause = f"，暂停 {retry_after:.1f} 秒" if retry_after else ""
+            self.on_log(f"警告: 触发API限流(429){pause}。{self.describe()}", WARN)
+
+    def _set_rate(self, rpm: float) -> None:
+        self._requests.per_minute = rpm
+        if self._tokens is not None:
+            self._tokens.per_minute = rpm * self._tokens_per_request
+
+    def _maybe_report(self) -> None:
+        if not self.on_log:
+            return
+        now = time.monotonic()
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            self.on_log(self.describe())
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """从 429 响应头中读取 Retry-After（秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _request_tokens(kwargs: dict, estimate_tokens) -> int:
+    text = "".join(str(message.get("content", "")) for message in kwargs.get("messages", []))
+    return estimate_tokens(text) + int(kwargs.get("max_tokens") or 0)
+
+
+class RateLimitedClient:
+    """
+    包装 OpenAI 客户端：每次 chat.completions.create 前向限速器申请额度，
+    遇到 429 时降速、等待 Retry-After 后重试，不计入调用方的失败次数。
+    """
+
+    def __init__(self, client, limiter: AdaptiveRateLimiter, estimate_tokens, max_retries: int = 5, stop_event=None):
+        self._client = client
+        self.limiter = limiter
+        self._estimate_tokens = estimate_tokens
+        self._max_retries = max_retries
+        self._stop_event = stop_event
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def _create(self, **kwargs):
+        tokens = _request_tokens(kwargs, self._estimate_tokens)
+        for attempt in range(self._max_retries + 1):
+            if not self.limiter.acquire(tokens, self._stop_event):
+                raise RuntimeError("收到停止信号，取消AI请求")
+            try:
+                response = self._client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < self._max_retries:
+                    self.limiter.on_rate_limited(retry_after_seconds(e))
+                    continue
+                raise
+            self.limiter.on_success()
+            return response
+
+
+class AsyncRateLimitedClient(RateLimitedClient):
+    """RateLimitedClient 的 AsyncOpenAI 版本"""
+
+    async def _create(self, **kwargs):
+        tokens = _request_tokens(kwargs, self._estimate_tokens)
+        for attempt in range(self._max_retries + 1):
+            if not await self.limiter.acquire_async(tokens, self._stop_event):
+                raise RuntimeError("收到停止信号，取消AI请求")
+            try:
+                response = await self._client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if is_rate_limit_error(e) and attempt < self._max_retries:
+                    self.limiter.on_rate_limited(retry_after_seconds(e))
+                    continue
+                raise
+            self.limiter.on_success()
+            return response
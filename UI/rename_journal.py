@@ -0,0 +1,119 @@
+"""
+重命名任务的断点日志（追加写入的 JSON Lines）。
+
+每个函数的进展（已入队/已反编译/已命名/已重命名/失败及原因）逐行追加到
+与 GUI 配置文件相同目录下的 rename_journal_<程序标识>.jsonl。
+程序崩溃、关闭窗口或 API 额度用尽后，续传模式只读取该文件即可得到待处理列表，
+不需要重新向 Ghidra 枚举函数：已重命名的函数被跳过，失败与未完成的函数重新处理。
+"""
+import json
+import os
+import threading
+import time
+
+from decompile_cache import CACHE_DIR
+
+# 每写入多少条记录强制落盘一次（每条记录都会 flush 到操作系统）
+FSYNC_EVERY = 50
+
+# 函数的终态事件
+RENAMED = "renamed"
+FAILED = "failed"
+
+
+def journal_path(program_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"rename_journal_{program_id}.jsonl")
+
+
+class RenameJournal:
+    """线程安全的追加写入日志"""
+
+    def __init__(self, path: str, resume: bool = False):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        # 新任务覆盖上一次的日志，续传时在末尾追加
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def record(self, event: str, func: str = None, **fields) -> None:
+        entry = {"event": event, "time": round(time.time(), 3)}
+        if func is not None:
+            entry["func"] = func
+        entry.update(fields)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= FSYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    def record_many(self, event: str, funcs: list) -> None:
+        """为多个函数写入同一事件（一次写入）"""
+        now = round(time.time(), 3)
+        text = "".join(json.dumps({"event": event, "time": now, "func": func}, ensure_ascii=False) + "\n" for func in funcs)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(text)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+class JournalReplay:
+    """读取日志得到的任务状态"""
+
+    def __init__(self):
+        self.pattern = None
+        self.enumerated = False     # 上次是否已完整枚举需处理的函数
+        self.entries = []           # 按入队顺序排列的函数条目
+        self.status = {}            # 函数条目 -> 最后一条事件
+        self.reasons = {}           # 失败函数 -> 失败原因
+
+    def count(self, event: str) -> int:
+        return sum(1 for status in self.status.values() if status == event)
+
+    def pending(self) -> list:
+        """尚未重命名成功的函数（失败的在前，其余保持入队顺序）"""
+        failed = [entry for entry in self.entries if self.status[entry] == FAILED]
+        unfinished = [entry for entry in self.entries if self.status[entry] not in (FAILED, RENAMED)]
+        return failed + unfinished
+
+
+def load_journal(path: str) -> JournalReplay | None:
+    """解析日志，文件不存在时返回 None；末尾被截断的行直接忽略"""
+    if not os.path.exists(path):
+        return None
+    replay = JournalReplay()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            event = entry.get("event")
+            func = entry.get("func")
+            if event == "start":
+                replay.pattern = entry.get("pattern")
+            elif event == "enumerated":
+                replay.enumerated = True
+            elif func is not None:
+                if func not in replay.status:
+                    replay.entries.append(func)
+                replay.status[func] = event
+                if event == FAILED:
+                    replay.reasons[func] = entry.get("reason", "")
+    return replay
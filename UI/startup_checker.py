@@ -1,14 +1,33 @@
+import os
 import re
-import requests
+import sys
 from typing import Dict
 
-DEFAULT_ENDPOINT = "http://127.0.0.1:8080/methods?offset=0&limit=999999"
-TIMEOUT_SECONDS = 1.5
+# 与 ai_rename 相同，从 脚本 目录导入共享模块
+SHARED_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "脚本")
+if os.path.isdir(SHARED_DIR) and SHARED_DIR not in sys.path:
+    sys.path.insert(0, SHARED_DIR)
 
+from ghidra_client import program_fingerprint
+from function_catalog import get_catalog
 
-def check_connection_and_count(pattern: str, endpoint: str = DEFAULT_ENDPOINT) -> Dict[str, object]:
+# 最近一次检查得到的函数目录，输入模式变化时只在本地统计
+_current_catalog = None
+
+
+def _count(catalog, pattern: str, result: Dict[str, object]) -> Dict[str, object]:
+    result["total"] = len(catalog)
+    try:
+        result["matched"] = catalog.count_matching(pattern)
+    except re.error as e:
+        result["error"] = f"正则错误: {e}"
+    return result
+
+
+def check_connection_and_count(pattern: str, refresh: bool = False) -> Dict[str, object]:
     """
-    在 1500ms 超时内请求 Ghidra 插件，统计总函数数量与正则匹配数量。
+    连接 Ghidra 插件并确定当前程序，统计总函数数量与正则匹配数量。
+    函数列表来自本地函数目录，快照过期或 refresh=True 时才重新同步。
 
     返回字典：
     {
@@ -18,38 +37,34 @@ def check_connection_and_count(pattern: str, endpoint: str = DEFAULT_ENDPOINT) -
         "error": str | None
     }
     """
+    global _current_catalog
     result = {"connected": False, "total": 0, "matched": 0, "error": None}
 
     try:
-        response = requests.get(endpoint, timeout=TIMEOUT_SECONDS)
-        if not response.ok:
-            result["error"] = f"HTTP {response.status_code}"
+        program_id = program_fingerprint(refresh=True)
+        if not program_id:
+            result["error"] = "无法连接 Ghidra 插件"
             return result
-
-        lines = response.text.splitlines() if response.text else []
         result["connected"] = True
-        result["total"] = len(lines)
 
-        try:
-            regex = re.compile(pattern) if pattern else re.compile("")
-        except re.error as e:
-            result["error"] = f"正则错误: {e}"
+        catalog = get_catalog(program_id)
+        if (refresh or not catalog.is_fresh()) and not catalog.sync():
+            result["error"] = "同步函数目录失败"
             return result
+        _current_catalog = catalog
+        return _count(catalog, pattern, result)
 
-        matched = 0
-        for line in lines:
-            if regex.search(line):
-                matched += 1
-        result["matched"] = matched
-        return result
-
-    except requests.Timeout:
-        result["error"] = "请求超时"
-        return result
     except Exception as e:
         result["error"] = str(e)
-        return result 
+        return result
+
+
+def count_pattern(pattern: str) -> Dict[str, object] | None:
+    """只在本地函数目录中统计匹配数量；尚未同步过目录时返回 None"""
+    if _current_catalog is None:
+        return None
+    return _count(_current_catalog, pattern, {"connected": True, "total": 0, "matched": 0, "error": None})
 
 
 if __name__ == "__main__":
-    print(check_connection_and_count("FUN_"))
\ No newline at end of file
+    print(check_connection_and_count("FUN_"))
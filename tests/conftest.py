@@ -0,0 +1,9 @@
+"""单元测试：模块分布在 UI/ 与 脚本/ 两个目录中，与程序运行时一样把它们加入 sys.path"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("脚本", "UI"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
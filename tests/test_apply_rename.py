@@ -0,0 +1,66 @@
+import importlib
+import sys
+
+import pytest
+
+from function_catalog import FunctionCatalog
+from name_registry import NameRegistry
+from rename_journal import FAILED, RENAMED, RenameJournal, load_journal
+
+pytest.importorskip("openai")
+
+
+@pytest.fixture
+def ai_rename(monkeypatch):
+    # 导入时按 sys.argv[1] 配置 Ghidra 地址
+    monkeypatch.setattr(sys, "argv", ["ai_rename"])
+    return importlib.import_module("ai_rename")
+
+
+@pytest.fixture
+def config(tmp_path):
+    journal = RenameJournal(str(tmp_path / "journal.jsonl"))
+    config = {
+        'name_registry': NameRegistry(["FUN_00401000", "parse"]),
+        'catalog': FunctionCatalog("prog", {"00401000": "FUN_00401000"}),
+        'journal': journal,
+    }
+    yield config
+    journal.close()
+
+
+def rename(ai_rename, monkeypatch, config, result):
+    posted = []
+
+    def rename_function(old_name, new_name):
+        posted.append((old_name, new_name))
+        return result
+
+    monkeypatch.setattr(ai_rename, "rename_function", rename_function)
+    logs = []
+    renamed = ai_rename._apply_rename(config, "FUN_00401000 @ 00401000", "FUN_00401000", "parse",
+                                      lambda text, level="info": logs.append((text, level)))
+    config['journal'].close()
+    return renamed, posted, load_journal(config['journal'].path)
+
+
+def test_successful_rename_is_recorded(ai_rename, monkeypatch, config):
+    renamed, posted, replay = rename(ai_rename, monkeypatch, config, "Renamed successfully")
+    assert renamed
+    # parse 已存在，加上后缀
+    assert posted == [("FUN_00401000", "parse_2")]
+    assert replay.status == {"FUN_00401000 @ 00401000": RENAMED}
+    assert config['catalog'].names() == ["parse_2"]
+    assert "parse_2" in config['name_registry'] and "FUN_00401000" not in config['name_registry']
+
+
+def test_plugin_rename_failed_is_not_recorded_as_renamed(ai_rename, monkeypatch, config):
+    # 插件重命名失败时返回 200 与 "Rename failed"
+    renamed, posted, replay = rename(ai_rename, monkeypatch, config, "Rename failed")
+    assert not renamed
+    assert replay.status == {"FUN_00401000 @ 00401000": FAILED}
+    assert replay.reasons == {"FUN_00401000 @ 00401000": "Rename failed"}
+    assert replay.pending() == ["FUN_00401000 @ 00401000"]
+    assert config['catalog'].names() == ["FUN_00401000"]
+    # 预留的名称被释放，原名仍在登记表中
+    assert "parse_2" not in config['name_registry'] and "FUN_00401000" in config['name_registry']
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+import bridge_mcp_ghidra as bridge
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    """模拟插件的 renameFunction：新名称已存在或原函数不存在时返回 200 与 "Rename failed\""""
+    names = {"FUN_a", "FUN_b", "FUN_c", "main"}
+    posts, changes = [], []
+
+    async def ghidra_post(endpoint, data):
+        assert endpoint == "renameFunction"
+        posts.append((data["oldName"], data["newName"]))
+        await asyncio.sleep(0)
+        if data["oldName"] not in names or data["newName"] in names:
+            return "Rename failed"
+        names.remove(data["oldName"])
+        names.add(data["newName"])
+        return "Renamed successfully"
+
+    async def record_decompile_change(**change):
+        changes.append(change)
+
+    monkeypatch.setattr(bridge, "ghidra_post", ghidra_post)
+    monkeypatch.setattr(bridge, "record_decompile_change", record_decompile_change)
+    monkeypatch.setattr(bridge, "response_cache", ResponseCache())
+    return names, posts, changes
+
+
+def test_independent_renames(plugin):
+    names, _, _ = plugin
+    outcome = asyncio.run(bridge.apply_renames({"FUN_a": "parse", "FUN_b": "emit"}))
+    assert outcome == {"results": {"FUN_a": "parse", "FUN_b": "emit"}, "errors": {}}
+    assert names == {"parse", "emit", "FUN_c", "main"}
+
+
+def test_plugin_rename_failed_is_an_error(plugin):
+    _, _, changes = plugin
+    outcome = asyncio.run(bridge.apply_renames({"FUN_a": "main"}))
+    assert outcome == {"results": {}, "errors": {"FUN_a": "Rename failed"}}
+    # 失败时不记录新名称
+    assert changes == [{"new_name": None, "name": "FUN_a"}]
+
+
+def test_chained_renames_run_in_dependency_order(plugin):
+    names, posts, _ = plugin
+    outcome = asyncio.run(bridge.apply_renames({"FUN_a": "FUN_b", "FUN_b": "FUN_c", "FUN_c": "parse"}))
+    assert outcome["errors"] == {}
+    assert posts == [("FUN_c", "parse"), ("FUN_b", "FUN_c"), ("FUN_a", "FUN_b")]
+    assert names == {"FUN_b", "FUN_c", "parse", "main"}
+
+
+def test_swaps_are_rejected(plugin):
+    names, posts, _ = plugin
+    outcome = asyncio.run(bridge.apply_renames({"FUN_a": "FUN_b", "FUN_b": "FUN_a", "FUN_c": "parse"}))
+    assert outcome["results"] == {"FUN_c": "parse"}
+    assert set(outcome["errors"]) == {"FUN_a", "FUN_b"}
+    assert posts == [("FUN_c", "parse")]
+    assert names == {"FUN_a", "FUN_b", "parse", "main"}
+
+
+def test_rename_order():
+    assert bridge._rename_order({"a": "b", "b": "c"}) == (["b", "a"], [])
+    assert bridge._rename_order({"a": "a", "b": "x"}) == (["a", "b"], [])
+    assert bridge._rename_order({"a": "b", "b": "a", "c": "a"}) == ([], ["a", "b", "c"])
+
+
+def test_recording_post_keeps_old_name_when_rename_failed(plugin):
+    _, _, changes = plugin
+    assert asyncio.run(bridge.rename_function("FUN_a", "main")) == "Rename failed"
+    assert asyncio.run(bridge.rename_function("FUN_a", "parse")) == "Renamed successfully"
+    assert [change["new_name"] for change in changes] == [None, "parse"]
@@ -0,0 +1,68 @@
+import importlib
+import json
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("openai")
+
+
+@pytest.fixture
+def ai_rename(monkeypatch):
+    # 导入时按 sys.argv[1] 配置 Ghidra 地址
+    monkeypatch.setattr(sys, "argv", ["ai_rename"])
+    return importlib.import_module("ai_rename")
+
+
+class FakeClient:
+    """按顺序返回预设回复的 chat.completions.create，记录每次请求的消息"""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+def test_batch_messages_number_functions_from_one(ai_rename):
+    messages = ai_rename.build_batch_messages(["int a(void);", "int b(void);"])
+    assert "### 函数 1\n```c\nint a(void);\n```" in messages[1]["content"]
+    assert "### 函数 2" in messages[1]["content"]
+    assert "JSON" in messages[0]["content"]
+
+
+def test_parse_batch_response_keeps_valid_entries(ai_rename):
+    content = '好的：\n```json\n{"1": "parseHeader", "2": "bad name", "3": "x" , "7": "outOfRange", "a": "ignored"}\n```'
+    assert ai_rename._parse_batch_response(content, 3) == {0: "parseHeader", 2: "x"}
+    assert ai_rename._parse_batch_response("no json here", 3) == {}
+    assert ai_rename._parse_batch_response("{not json}", 3) == {}
+    assert ai_rename._parse_batch_response("[1, 2]", 3) == {}
+
+
+def test_missing_batch_entries_fall_back_to_single_requests(ai_rename):
+    client = FakeClient([json.dumps({"1": "parseHeader", "3": "emitRecord"}), "checksumBlock"])
+    names, fallbacks = ai_rename.analyze_functions_batched(["code1", "code2", "code3"], client, "model")
+    assert names == ["parseHeader", "checksumBlock", "emitRecord"]
+    assert fallbacks == 1
+    assert len(client.requests) == 2
+    assert "code2" in client.requests[1]["messages"][1]["content"]
+
+
+def test_failed_batch_request_names_each_function_alone(ai_rename):
+    client = FakeClient([RuntimeError("timeout"), "first", "second"])
+    names, fallbacks = ai_rename.analyze_functions_batched(["code1", "code2"], client, "model")
+    assert names == ["first", "second"]
+    assert fallbacks == 2
+
+
+def test_single_function_skips_batch_prompt(ai_rename):
+    client = FakeClient(["onlyName"])
+    assert ai_rename.analyze_functions_batched(["code1"], client, "model") == (["onlyName"], 0)
+    assert client.requests[0]["messages"][0]["content"] == ai_rename.SYSTEM_PROMPT
@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp.server.fastmcp")
+import bridge_mcp_ghidra as bridge
+from response_cache import ResponseCache
+
+
+class FakeAsyncClient:
+    """记录每个端点同时进行的最大请求数"""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.active = {}
+        self.peak = {}
+        self.calls = []
+
+    async def _request(self, endpoint, value):
+        self.calls.append(endpoint)
+        self.active[endpoint] = self.active.get(endpoint, 0) + 1
+        self.peak[endpoint] = max(self.peak.get(endpoint, 0), self.active[endpoint])
+        try:
+            await asyncio.sleep(self.delay)
+            return value
+        finally:
+            self.active[endpoint] -= 1
+
+    async def get(self, endpoint, params=None):
+        return await self._request(endpoint, [f"{endpoint} {params}"])
+
+    async def post(self, endpoint, data):
+        if data == "missing":
+            return await self._request(endpoint, "Error 404: Function not found")
+        return await self._request(endpoint, f"void {data}(void) {{}}")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeAsyncClient()
+    monkeypatch.setattr(bridge, "_client", lambda: client)
+    # 信号量绑定在创建它的事件循环上，每个测试重新创建
+    monkeypatch.setattr(bridge, "_endpoint_slots", {})
+    monkeypatch.setattr(bridge, "response_cache", ResponseCache())
+    monkeypatch.setitem(bridge.ENDPOINT_CONCURRENCY, "decompile", 2)
+    return client
+
+
+def test_endpoint_concurrency_limits_slow_endpoints_only(client):
+    async def main():
+        await asyncio.gather(*(bridge.ghidra_post("decompile", f"f{i}") for i in range(6)),
+                             *(bridge.ghidra_get("get_current_address") for _ in range(6)))
+
+    asyncio.run(main())
+    assert client.peak["decompile"] == 2
+    assert client.peak["get_current_address"] == 6
+
+
+def test_decompile_many_reports_results_and_errors(client):
+    outcome = asyncio.run(bridge.decompile_many(["f1", "missing", "f2", "f1"]))
+    assert outcome["results"] == {"f1": "void f1(void) {}", "f2": "void f2(void) {}"}
+    assert outcome["errors"] == {"missing": "Error 404: Function not found"}
+    # 重复的目标只请求一次
+    assert client.calls.count("decompile") == 3
+
+
+def test_concurrent_identical_tool_calls_share_one_request(client):
+    async def main():
+        return await asyncio.gather(*(bridge.list_methods(0, 100) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert client.calls == ["methods"]
+    assert all(result == results[0] for result in results)
+
+
+def test_parse_overrides():
+    parser = argparse.ArgumentParser()
+    assert bridge._parse_overrides(parser, ["decompile=2", " strings = 1"], int) == {"decompile": 2, "strings": 1}
+    assert bridge._parse_overrides(parser, None, int) == {}
+    with pytest.raises(SystemExit):
+        bridge._parse_overrides(parser, ["decompile"], int)
+    with pytest.raises(SystemExit):
+        bridge._parse_overrides(parser, ["decompile=fast"], float)
@@ -0,0 +1,63 @@
+import call_graph
+from call_graph import build_call_graph, bottom_up_levels, strongly_connected_components
+
+
+def test_scc_merges_mutual_recursion():
+    callees = {"a": {"b"}, "b": {"a"}, "c": {"a"}, "d": set()}
+    components = [sorted(component) for component in strongly_connected_components(callees)]
+    assert sorted(components) == [["a", "b"], ["c"], ["d"]]
+
+
+def test_scc_emits_callees_before_callers():
+    callees = {"main": {"parse"}, "parse": {"read"}, "read": set()}
+    order = [component[0] for component in strongly_connected_components(callees)]
+    assert order == ["read", "parse", "main"]
+
+
+def test_scc_handles_deep_chains_without_recursion_limit():
+    depth = 5000
+    callees = {i: {i + 1} for i in range(depth)}
+    callees[depth] = set()
+    assert len(strongly_connected_components(callees)) == depth + 1
+
+
+def test_levels_put_leaves_first_and_keep_input_order():
+    functions = ["main", "helper2", "parse", "helper1"]
+    callees = {"main": {"parse"}, "parse": {"helper1", "helper2"}, "helper1": set(), "helper2": set()}
+    assert bottom_up_levels(functions, callees) == [["helper2", "helper1"], ["parse"], ["main"]]
+
+
+def test_recursive_functions_share_a_level():
+    functions = ["a", "b", "caller", "leaf"]
+    callees = {"a": {"b", "leaf"}, "b": {"a"}, "caller": {"a"}, "leaf": set()}
+    assert bottom_up_levels(functions, callees) == [["leaf"], ["a", "b"], ["caller"]]
+
+
+def test_no_functions_gives_no_levels():
+    assert bottom_up_levels([], {}) == []
+
+
+def test_build_call_graph_ignores_functions_outside_the_set(monkeypatch):
+    callers = {"FUN_1": {"FUN_2", "printf_wrapper"}, "FUN_2": set(), "FUN_3": {"FUN_3"}}
+    monkeypatch.setattr(call_graph, "fetch_callers", lambda name: callers[name])
+    functions = ["FUN_1 @ 1000", "FUN_2 @ 2000", "FUN_3 @ 3000"]
+    assert build_call_graph(functions, workers=2) == {
+        "FUN_1 @ 1000": set(),
+        "FUN_2 @ 2000": {"FUN_1 @ 1000"},
+        "FUN_3 @ 3000": set(),
+    }
+
+
+def test_fetch_callers_keeps_only_call_references(monkeypatch):
+    lines = [
+        "From 00401234 in main [UNCONDITIONAL_CALL]",
+        "From 00401300 in init [DATA]",
+        "From 00401400 in FUN_00402000 [COMPUTED_CALL]",
+    ]
+    monkeypatch.setattr(call_graph, "safe_get", lambda endpoint, params: lines)
+    assert call_graph.fetch_callers("target", page_size=500) == {"main", "FUN_00402000"}
+
+
+def test_fetch_callers_stops_on_request_error(monkeypatch):
+    monkeypatch.setattr(call_graph, "safe_get", lambda endpoint, params: ["Request failed: connection refused"])
+    assert call_graph.fetch_callers("target") == set()
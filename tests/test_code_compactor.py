@@ -0,0 +1,55 @@
+from code_compactor import (
+    collapse_repetition,
+    compact_decompiled,
+    estimate_tokens,
+    strip_boilerplate,
+    truncate_to_budget,
+)
+
+
+def test_strip_boilerplate_removes_warnings_and_extra_blank_lines():
+    code = ("void f(void)\n{\n  /* WARNING: Removing unreachable block (ram,0x00401234) */\n\n\n\n"
+            "  g();   \n  // WARNING: Subroutine does not return\n}\n")
+    assert strip_boilerplate(code) == "void f(void)\n{\n\n  g();\n\n}"
+
+
+def test_collapse_repetition_keeps_two_groups_and_a_note():
+    cases = "\n".join(f"  case {i}:\n    x = {i * 4};\n    break;" for i in range(10))
+    collapsed = collapse_repetition(cases)
+    lines = collapsed.splitlines()
+    assert lines[:6] == cases.splitlines()[:6]
+    assert lines[6] == "  /* ... 省略 24 行相似代码（共 10 组） */"
+    assert len(lines) == 7
+
+
+def test_collapse_repetition_leaves_string_lines_alone():
+    code = "\n".join(f'  puts("item {i}");' for i in range(6))
+    assert collapse_repetition(code) == code
+
+
+def test_short_code_is_not_truncated():
+    code = "int f(void)\n{\n  return 1;\n}"
+    assert truncate_to_budget(code, 100) == code
+
+
+def test_truncation_keeps_signature_calls_and_strings():
+    body = [f"  local_{i} = local_{i} + {i};" for i in range(200)]
+    body[50] = '  log_error("bad header");'
+    body[120] = "  process_packet(local_3);"
+    code = "int handle_packet(int param_1)\n{\n" + "\n".join(body) + "\n}"
+    budget = 120
+    result = truncate_to_budget(code, budget)
+    assert result.startswith("int handle_packet(int param_1)\n{")
+    assert result.endswith("\n}")
+    assert 'log_error("bad header");' in result
+    assert "process_packet(local_3);" in result
+    assert "省略" in result
+    assert estimate_tokens(result) <= budget
+
+
+def test_compact_decompiled_applies_all_steps():
+    cases = "\n".join(f"  case {i}:\n    x = {i};\n    break;" for i in range(50))
+    code = "void f(int x)\n{\n  /* WARNING: bad */\n  switch(x) {\n" + cases + "\n  }\n}"
+    result = compact_decompiled(code, 4000)
+    assert "WARNING" not in result
+    assert "共 50 组" in result
@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import pytest
+
+from decompile_cache import DecompileCache, decompile_with_cache, decompile_with_cache_async, sync_function_names
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DecompileCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def tick():
+    # 缓存与变更按 time.time() 比较先后
+    time.sleep(0.01)
+
+
+def test_hit_requires_same_name(cache):
+    cache.put("prog", "1000", "FUN_1000", "void FUN_1000(void) {}")
+    assert cache.get("prog", "1000", "FUN_1000") == "void FUN_1000(void) {}"
+    assert cache.get("prog", "1000", "parse") is None
+    assert cache.get("other", "1000", "FUN_1000") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_rename_invalidates_function_and_its_callers(cache):
+    cache.put("prog", "1000", "main", "int main(void)\n{\n  FUN_2000(1);\n  return 0;\n}")
+    cache.put("prog", "2000", "FUN_2000", "void FUN_2000(int x) {}")
+    cache.put("prog", "3000", "unrelated", 'void unrelated(void)\n{\n  puts("x");\n}')
+    tick()
+    cache.invalidate("prog", "2000", name="FUN_2000", new_name="init_device")
+    assert cache.get("prog", "2000") is None
+    assert cache.get("prog", "1000", "main") is None
+    assert cache.get("prog", "3000", "unrelated") is not None
+    # 重新反编译后的调用方不再受之前的变更影响
+    cache.put("prog", "1000", "main", "int main(void)\n{\n  init_device(1);\n  return 0;\n}")
+    assert cache.get("prog", "1000", "main") is not None
+
+
+def test_changes_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = DecompileCache(path)
+    first.put("prog", "1000", "main", "int main(void) { helper(); }")
+    tick()
+    first.invalidate("prog", name="helper")
+    first.close()
+    second = DecompileCache(path)
+    try:
+        assert second.get("prog", "1000", "main") is None
+    finally:
+        second.close()
+
+
+def test_local_change_does_not_affect_callers(cache):
+    cache.put("prog", "1000", "main", "int main(void) { helper(); }")
+    cache.put("prog", "2000", "helper", "void helper(void) { int local_8; }")
+    tick()
+    cache.invalidate("prog", name="helper", affects_callers=False)
+    assert cache.get("prog", "2000", "helper") is None
+    assert cache.get("prog", "1000", "main") is not None
+
+
+def test_fresh_only_rejects_entries_older_than_any_change(cache):
+    cache.put("prog", "1000", "main", "int main(void) { return 0; }")
+    tick()
+    cache.invalidate("prog", "9999", name="elsewhere")
+    assert cache.get("prog", "1000", "main") is not None
+    assert cache.get("prog", "1000", "main", fresh_only=True) is None
+
+
+def test_sync_names_detects_renames_made_outside_the_tool(cache):
+    assert cache.sync_names("prog", {"1000": "main", "2000": "FUN_2000"}) == 0
+    cache.put("prog", "1000", "main", "int main(void) { FUN_2000(); }")
+    tick()
+    assert cache.sync_names("prog", {"1000": "main", "2000": "read_config"}) == 1
+    assert cache.get("prog", "1000", "main") is None
+    assert cache.sync_names("prog", {"1000": "main", "2000": "read_config"}) == 0
+
+
+def test_own_renames_update_the_name_snapshot(cache):
+    cache.sync_names("prog", {"2000": "FUN_2000"})
+    cache.invalidate("prog", "2000", name="FUN_2000", new_name="read_config")
+    assert cache.sync_names("prog", {"2000": "read_config"}) == 0
+
+
+def test_sync_function_names_reads_list_functions(cache):
+    class Client:
+        def __init__(self, lines):
+            self.lines = lines
+
+        def get(self, endpoint):
+            assert endpoint == "list_functions"
+            return self.lines
+
+    assert sync_function_names(cache, "prog", Client(["main at 1000", "FUN_2000 at 2000"])) == 0
+    assert sync_function_names(cache, "prog", Client(["main at 1000", "parse at 2000"])) == 1
+    assert sync_function_names(cache, "prog", Client(["Request failed: timeout"])) == 0
+    # 以 Error 开头的函数名是数据，不是请求失败
+    assert sync_function_names(cache, "prog", Client(["ErrorHandler at 1000", "parse at 2000"])) == 1
+    assert sync_function_names(cache, "prog", Client(["ErrorHandler at 1000", "emit at 2000"])) == 1
+
+
+def test_eviction_keeps_total_under_limit(tmp_path):
+    cache = DecompileCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+    try:
+        for i in range(20):
+            cache.put("prog", f"{i:04x}", f"f{i}", "x" * 100)
+        assert cache._total_bytes <= 1000
+        assert cache.get("prog", "0013", "f19") is not None
+        assert cache.get("prog", "0000", "f0") is None
+    finally:
+        cache.close()
+
+
+def test_decompile_with_cache_skips_errors_and_missing_keys(cache):
+    calls = []
+
+    def decompile(name):
+        calls.append(name)
+        return "Error: no function" if name == "bad" else f"void {name}(void) {{}}"
+
+    assert decompile_with_cache(cache, "prog", "good", "1000", decompile) == "void good(void) {}"
+    assert decompile_with_cache(cache, "prog", "good", "1000", decompile) == "void good(void) {}"
+    decompile_with_cache(cache, "prog", "bad", "2000", decompile)
+    decompile_with_cache(cache, "prog", "bad", "2000", decompile)
+    decompile_with_cache(cache, "prog", "noaddr", None, decompile)
+    assert calls == ["good", "bad", "bad", "noaddr"]
+
+
+def test_decompile_with_cache_async(cache):
+    calls = []
+
+    async def decompile(name):
+        calls.append(name)
+        return f"void {name}(void) {{}}"
+
+    async def main():
+        first = await decompile_with_cache_async(cache, "prog", "f", "1000", decompile)
+        second = await decompile_with_cache_async(cache, "prog", "f", "1000", decompile)
+        third = await decompile_with_cache_async(None, "prog", "f", "1000", decompile)
+        return first, second, third
+
+    assert asyncio.run(main()) == ("void f(void) {}",) * 3
+    assert calls == ["f", "f"]
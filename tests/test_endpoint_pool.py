@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from endpoint_pool import Endpoint, EndpointPool, AsyncEndpointPool
+
+
+class FakeClient:
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} down")
+        return f"{self.name}:{kwargs['model']}"
+
+    def close(self):
+        self.closed = True
+
+
+class AsyncFakeClient(FakeClient):
+    async def create(self, **kwargs):
+        return FakeClient.create(self, **kwargs)
+
+    async def close(self):
+        self.closed = True
+
+
+def make_pool(*clients, cls=EndpointPool, **kwargs):
+    return cls([Endpoint(client.name, client, f"model-{client.name}") for client in clients], **kwargs)
+
+
+def test_smooth_weighted_round_robin_follows_weights():
+    pool = make_pool(FakeClient("a"), FakeClient("b"))
+    a, b = pool.endpoints
+    a.latency, b.latency = 0.25, 1.0        # 权重 4:1
+    chosen = [pool._choose(*pool._candidates(set()), 0)[0].name for _ in range(10)]
+    assert Counter(chosen) == {"a": 8, "b": 2}
+    # 平滑：不会连续把 b 选两次，也不会让 a 连续超过 4 次
+    assert "bb" not in "".join(chosen)
+    assert "aaaaa" not in "".join(chosen)
+
+
+def test_request_uses_endpoint_model():
+    pool = make_pool(FakeClient("a"))
+    assert pool.chat.completions.create(model="ignored", messages=[]) == "a:model-a"
+
+
+def test_failed_request_retries_on_another_endpoint():
+    bad, good = FakeClient("bad", fail=True), FakeClient("good")
+    pool = make_pool(bad, good)
+    for endpoint in pool.endpoints:
+        endpoint.latency = 1.0
+    pool.endpoints[0].current = 10.0        # 先选到 bad
+    assert pool.chat.completions.create(messages=[]) == "good:model-good"
+    assert (bad.calls, good.calls) == (1, 1)
+
+
+def test_consecutive_failures_eject_with_doubling_backoff():
+    bad, good = FakeClient("bad", fail=True), FakeClient("good")
+    pool = make_pool(bad, good, eject_after=2, eject_seconds=10, max_eject_seconds=15)
+    endpoint = pool.endpoints[0]
+    for _ in range(2):
+        pool._finish(endpoint, time.monotonic(), ConnectionError("down"))
+    assert endpoint.ejected(time.monotonic())
+    assert endpoint.eject_seconds == 10
+    # 剔除期间不会被选中
+    assert [e.name for e in pool._candidates(set())[0]] == ["good"]
+    endpoint.ejected_until = 0.0
+    pool._finish(endpoint, time.monotonic(), ConnectionError("down"))
+    assert endpoint.eject_seconds == 15
+    pool._finish(endpoint, time.monotonic())
+    assert endpoint.consecutive_failures == 0 and endpoint.eject_seconds == 0
+
+
+def test_rate_limit_errors_do_not_eject():
+    class RateLimitError(Exception):
+        status_code = 429
+
+    pool = make_pool(FakeClient("a"), eject_after=1)
+    endpoint = pool.endpoints[0]
+    pool._finish(endpoint, time.monotonic(), RateLimitError())
+    assert not endpoint.ejected(time.monotonic())
+    assert endpoint.rate_limited == 1
+
+
+def test_all_ejected_waits_for_earliest_recovery():
+    # 回归：全部端点被剔除时曾直接把请求发给仍在剔除期内的端点，很快耗尽重试次数
+    flaky = FakeClient("flaky", fail=True)
+    logs = []
+    pool = make_pool(flaky, eject_after=1, eject_seconds=0.3, max_retries=1, on_log=lambda message, level=None: logs.append(message))
+    pool._finish(pool.endpoints[0], time.monotonic(), ConnectionError("down"))
+    flaky.fail = False
+    start = time.monotonic()
+    assert pool.chat.completions.create(messages=[]) == "flaky:model-flaky"
+    assert time.monotonic() - start >= 0.25
+    assert flaky.calls == 1
+    assert sum("所有AI端点均已被剔除" in message for message in logs) == 1
+
+
+def test_all_ejected_wait_stops_on_stop_event():
+    stop = threading.Event()
+    pool = make_pool(FakeClient("a"), eject_after=1, eject_seconds=60, stop_event=stop)
+    pool._finish(pool.endpoints[0], time.monotonic(), ConnectionError("down"))
+    threading.Timer(0.2, stop.set).start()
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        pool.chat.completions.create(messages=[])
+    assert time.monotonic() - start < 5
+
+
+def test_async_pool_waits_and_closes():
+    clients = [AsyncFakeClient("a"), AsyncFakeClient("b")]
+    pool = make_pool(*clients, cls=AsyncEndpointPool, eject_after=1, eject_seconds=0.2)
+    for endpoint in pool.endpoints:
+        pool._finish(endpoint, time.monotonic(), ConnectionError("down"))
+
+    async def main():
+        result = await pool.chat.completions.create(messages=[])
+        await pool.close()
+        return result
+
+    assert asyncio.run(main()) in ("a:model-a", "b:model-b")
+    assert all(client.closed for client in clients)
+
+
+def test_describe_reports_share():
+    pool = make_pool(FakeClient("a"), FakeClient("b"))
+    for _ in range(3):
+        pool.chat.completions.create(messages=[])
+    lines = pool.describe()
+    assert len(lines) == 2
+    assert all("AI端点" in line and "占比" in line for line in lines)
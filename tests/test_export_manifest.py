@@ -0,0 +1,56 @@
+import os
+
+from export_manifest import ExportManifest, find_previous_manifest, content_hash, NEW, RENAMED, SAME_NAME
+
+
+def test_save_and_load_round_trip(tmp_path):
+    manifest = ExportManifest(str(tmp_path), "prog1", "files")
+    manifest.record("00401000", "parse_header", content_hash("code"), "parse_header.txt")
+    manifest.save()
+
+    loaded = ExportManifest.load(str(tmp_path))
+    assert loaded.program_id == "prog1"
+    assert loaded.mode == "files"
+    assert loaded.get("00401000") == {"name": "parse_header", "hash": content_hash("code"), "file": "parse_header.txt"}
+    assert loaded.file_path("00401000") == os.path.join(str(tmp_path), "parse_header.txt")
+
+
+def test_load_rejects_missing_or_unknown_version(tmp_path):
+    assert ExportManifest.load(str(tmp_path)) is None
+    (tmp_path / "manifest.json").write_text('{"version": 99}', encoding="utf-8")
+    assert ExportManifest.load(str(tmp_path)) is None
+
+
+def test_classify_against_current_function_list():
+    manifest = ExportManifest("unused", "prog1", functions={
+        "00401000": {"name": "main", "hash": "h1", "file": "main.txt"},
+        "00402000": {"name": "FUN_00402000", "hash": "h2", "file": "FUN_00402000.txt"},
+    })
+    status = manifest.classify({"main": "00401000", "parse": "00402000", "init": "00403000"})
+    assert status == {"00401000": SAME_NAME, "00402000": RENAMED, "00403000": NEW}
+
+
+def test_referenced_file_uses_absolute_path(tmp_path):
+    manifest = ExportManifest(str(tmp_path))
+    manifest.record("00401000", "main", "h", os.path.abspath("/elsewhere/main.txt"))
+    assert manifest.file_path("00401000") == os.path.abspath("/elsewhere/main.txt")
+    manifest.record("00402000", "packed", "h")
+    assert manifest.file_path("00402000") is None
+
+
+def test_find_previous_manifest_picks_latest_export_of_same_program(tmp_path):
+    def export(name, program_id, created):
+        directory = tmp_path / name
+        directory.mkdir()
+        ExportManifest(str(directory), program_id, created=created).save()
+        return str(directory)
+
+    export("项目_20250101_1000", "prog1", "2025-01-01T10:00:00")
+    latest = export("项目_20250102_1000", "prog1", "2025-01-02T10:00:00")
+    export("项目_20250103_1000", "prog2", "2025-01-03T10:00:00")
+    current = export("项目_20250104_1000", "prog1", "2025-01-04T10:00:00")
+    export("other_20250105", "prog1", "2025-01-05T10:00:00")
+
+    previous = find_previous_manifest(str(tmp_path), "prog1", exclude=current)
+    assert previous.directory == latest
+    assert find_previous_manifest(str(tmp_path), "prog3") is None
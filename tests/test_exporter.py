@@ -0,0 +1,126 @@
+import importlib.util
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+EXPORTER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "脚本", "ai_再运行文件保存.py")
+
+
+def test_unknown_output_mode_prints_usage(tmp_path):
+    result = subprocess.run([sys.executable, EXPORTER, "http://127.0.0.1:9/", "1", "bogus"],
+                            cwd=tmp_path, capture_output=True, text=True, encoding="utf-8", timeout=60)
+    assert result.returncode == 2
+    assert "files|pack|incremental" in result.stdout
+    # 参数错误时不创建输出目录
+    assert not list(tmp_path.iterdir())
+
+
+def load_exporter(tmp_path, monkeypatch, *args):
+    """在临时目录中导入导出脚本（导入时按 sys.argv 配置并创建输出目录）"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, "argv", [EXPORTER, *args])
+    spec = importlib.util.spec_from_file_location("exporter_under_test", EXPORTER)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, "safe_print", lambda *args, **kwargs: None)
+    return module
+
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    return load_exporter(tmp_path, monkeypatch)
+
+
+def test_decompile_cache_is_opt_in(tmp_path, monkeypatch):
+    exporter = load_exporter(tmp_path, monkeypatch, "http://127.0.0.1:9/", "3", "incremental")
+    assert not exporter.USE_DECOMPILE_CACHE
+    assert exporter.OUTPUT_MODE == "incremental"
+    opened = []
+    monkeypatch.setattr(exporter, "DecompileCache", lambda: opened.append(True))
+    monkeypatch.setattr(exporter, "program_id", "prog")
+    exporter.init_decompile_cache()
+    # 默认每次重新反编译，不打开缓存
+    assert exporter.decompile_cache is None and not opened
+
+
+def test_cache_flag_is_not_a_positional_argument(tmp_path, monkeypatch):
+    exporter = load_exporter(tmp_path, monkeypatch, "http://127.0.0.1:9/", "--cache", "3", "pack", "200")
+    assert exporter.USE_DECOMPILE_CACHE
+    assert exporter.ARGS == ["http://127.0.0.1:9/", "3", "pack", "200"]
+    assert exporter.OUTPUT_MODE == "pack"
+
+
+def fake_methods(total: int, pages: list):
+    def list_methods(offset=0, limit=100):
+        pages.append(offset)
+        return [f"FUN_{index:08x}" for index in range(offset, min(offset + limit, total))]
+    return list_methods
+
+
+def test_fetch_pages_reads_until_short_page(exporter, monkeypatch):
+    pages = []
+    monkeypatch.setattr(exporter, "list_methods", fake_methods(25, pages))
+    out = queue.Queue()
+    exporter.fetch_pages(10, out, 3, threading.Event())
+    items = [out.get_nowait() for _ in range(out.qsize())]
+    assert pages == [0, 10, 20]
+    assert items[:25] == [f"FUN_{index:08x}" for index in range(25)]
+    # 每个工作线程一个结束标记
+    assert items[25:] == [None, None, None]
+
+
+def test_fetch_pages_stops_on_request_error(exporter, monkeypatch):
+    monkeypatch.setattr(exporter, "list_methods", lambda offset=0, limit=100: ["Request failed: connection refused"])
+    out = queue.Queue()
+    exporter.fetch_pages(10, out, 2, threading.Event())
+    assert [out.get_nowait() for _ in range(out.qsize())] == [None, None]
+
+
+def test_fetch_pages_keeps_names_starting_with_error(exporter, monkeypatch):
+    names = ["ErrorHandler", "main"]
+    monkeypatch.setattr(exporter, "list_methods", lambda offset=0, limit=100: names[offset:offset + limit])
+    out = queue.Queue()
+    exporter.fetch_pages(10, out, 1, threading.Event())
+    assert [out.get_nowait() for _ in range(out.qsize())] == ["ErrorHandler", "main", None]
+
+
+def test_fetch_pages_waits_for_consumers(exporter, monkeypatch):
+    pages = []
+    monkeypatch.setattr(exporter, "list_methods", fake_methods(100, pages))
+    out = queue.Queue(maxsize=15)
+    stop_event = threading.Event()
+    producer = threading.Thread(target=exporter.fetch_pages, args=(10, out, 1, stop_event), daemon=True)
+    producer.start()
+    deadline = time.monotonic() + 5
+    while not out.full() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    # 队列满时不再提前读取后面的分页
+    assert pages == [0, 10]
+    stop_event.set()
+    while producer.is_alive():
+        try:
+            out.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    assert len(pages) <= 3
+
+
+def test_save_functions_exports_each_function_once(exporter, monkeypatch):
+    pages = []
+    processed = []
+    lock = threading.Lock()
+
+    def process(func_name):
+        with lock:
+            processed.append(func_name)
+
+    monkeypatch.setattr(exporter, "list_methods", fake_methods(137, pages))
+    monkeypatch.setattr(exporter, "process_single_function", process)
+    exporter.save_functions(batch_size=20, max_workers=4)
+    assert sorted(processed) == [f"FUN_{index:08x}" for index in range(137)]
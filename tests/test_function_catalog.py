@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+import function_catalog
+from function_catalog import FunctionCatalog, get_catalog
+
+
+class FakeClient:
+    def __init__(self, lines):
+        self.lines = lines
+        self.requests = 0
+
+    def get(self, endpoint, params=None, timeout=None):
+        assert endpoint == "list_functions"
+        self.requests += 1
+        return list(self.lines)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(function_catalog, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(function_catalog, "_catalogs", {})
+    return tmp_path
+
+
+FUNCTIONS = ["FUN_00401000 at 00401000", "parse_header at 00402000", "FUN_00403000 at 00403000", "garbage line"]
+
+
+def test_sync_reads_list_functions_and_saves(cache_dir):
+    catalog = FunctionCatalog("prog")
+    assert not catalog.is_fresh()
+    assert catalog.sync(FakeClient(FUNCTIONS))
+    assert len(catalog) == 3
+    assert catalog.is_fresh()
+    assert not catalog.is_fresh(max_age=-1)
+    assert (cache_dir / "function_catalog_prog.json").exists()
+
+    loaded = FunctionCatalog.load("prog")
+    assert sorted(loaded.names()) == ["FUN_00401000", "FUN_00403000", "parse_header"]
+    assert loaded.synced_at == pytest.approx(catalog.synced_at)
+
+
+def test_failed_sync_keeps_previous_content():
+    catalog = FunctionCatalog("prog", {"00401000": "main"}, synced_at=time.time())
+    assert not catalog.sync(FakeClient(["Request failed: connection refused"]))
+    assert catalog.names() == ["main"]
+
+
+def test_sync_keeps_functions_named_error():
+    catalog = FunctionCatalog("prog")
+    assert catalog.sync(FakeClient(["ErrorHandler at 00401000", "main at 00402000"]))
+    assert sorted(catalog.names()) == ["ErrorHandler", "main"]
+
+
+def test_count_matching_and_search():
+    catalog = FunctionCatalog("prog", {"00401000": "FUN_00401000", "00402000": "Parse_header", "00403000": "FUN_00403000"})
+    assert catalog.count_matching("FUN_") == 2
+    assert catalog.count_matching("^Parse") == 1
+    assert catalog.count_matching("") == 3
+    assert catalog.search("parse") == ["Parse_header @ 00402000"]
+    assert catalog.search("fun_") == ["FUN_00401000 @ 00401000", "FUN_00403000 @ 00403000"]
+
+
+def test_apply_rename_updates_known_functions_only(cache_dir):
+    catalog = FunctionCatalog("prog", {"00401000": "FUN_00401000"})
+    catalog.apply_rename("00401000", "init_state")
+    catalog.apply_rename("00409999", "unknown")
+    catalog.apply_rename(None, "no_address")
+    assert catalog.names() == ["init_state"]
+    catalog.save()
+    assert FunctionCatalog.load("prog").names() == ["init_state"]
+
+
+def test_save_skips_unchanged_catalog(cache_dir):
+    FunctionCatalog("prog", {"00401000": "main"}).save()
+    assert not (cache_dir / "function_catalog_prog.json").exists()
+
+
+def test_load_ignores_corrupt_snapshot(cache_dir):
+    (cache_dir / "function_catalog_prog.json").write_text("{not json", encoding="utf-8")
+    catalog = FunctionCatalog.load("prog")
+    assert len(catalog) == 0
+    assert not catalog.is_fresh()
+
+
+def test_get_catalog_shares_one_instance_per_program():
+    catalog = get_catalog("prog")
+    assert get_catalog("prog") is catalog
+    assert get_catalog("other") is not catalog
@@ -0,0 +1,67 @@
+import json
+import threading
+
+import pytest
+
+from function_pack import PackReader, PackWriter, INDEX_SUFFIX
+
+
+def test_round_trip_by_name_and_address(tmp_path):
+    path = str(tmp_path / "functions.pack")
+    functions = [
+        ("parse_header", "00401000", "int parse_header(char *p)\n{\n  return *p;\n}\n"),
+        ("打印日志", "00402000", 'void 打印日志(void)\n{\n  puts("日志");\n}\n'),
+        ("thunk", "00403000", "void thunk(void) {}\n"),
+        ("thunk", "00404000", "void thunk(int x) {}\n"),
+    ]
+    with PackWriter(path) as writer:
+        for name, address, text in functions:
+            writer.add(name, address, text)
+
+    with PackReader(path) as reader:
+        assert len(reader) == 4
+        assert "打印日志" in reader
+        assert reader.get("打印日志") == functions[1][2]
+        assert reader.get_by_address("00401000") == functions[0][2]
+        assert reader.get("thunk") == functions[2][2]
+        assert reader.get_all("thunk") == [functions[2][2], functions[3][2]]
+        assert reader.get("missing") is None
+        assert reader.get_by_address("00409999") is None
+
+
+def test_concurrent_adds_are_all_written(tmp_path):
+    path = str(tmp_path / "functions.pack")
+    writer = PackWriter(path, queue_size=8)
+
+    def produce(worker):
+        for i in range(100):
+            writer.add(f"f_{worker}_{i}", f"{worker:02d}{i:04d}", f"body {worker} {i}\n" * (i % 5 + 1))
+
+    threads = [threading.Thread(target=produce, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    with PackReader(path) as reader:
+        assert len(reader) == 400
+        assert reader.get("f_3_42") == "body 3 42\n" * 3
+        assert reader.get_by_address("010099") == "body 1 99\n" * 5
+
+
+def test_empty_pack(tmp_path):
+    path = str(tmp_path / "functions.pack")
+    PackWriter(path).close()
+    with PackReader(path) as reader:
+        assert len(reader) == 0
+        assert reader.names() == []
+
+
+def test_unknown_version_is_rejected(tmp_path):
+    path = str(tmp_path / "functions.pack")
+    PackWriter(path).close()
+    with open(path + INDEX_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"version": 99, "entries": []}, f)
+    with pytest.raises(ValueError):
+        PackReader(path)
@@ -0,0 +1,127 @@
+import asyncio
+from collections import deque
+
+from function_stream import FunctionStream
+
+
+class ShrinkingSearch:
+    """模拟按名称排序后分页的 searchFunctions：重命名后的函数不再匹配，后面的条目整体前移"""
+
+    def __init__(self, count: int):
+        self.matching = [f"FUN_{i:05x} @ {0x401000 + i * 16:08x}" for i in range(count)]
+        self.requests = []
+
+    def fetch(self, offset: int, limit: int) -> list:
+        self.requests.append((offset, limit))
+        return self.matching[offset:offset + limit]
+
+    def rename(self, entry: str) -> None:
+        self.matching.remove(entry)
+
+
+def consume(stream: FunctionStream, search: ShrinkingSearch, in_flight: int, failing=lambda i: False) -> list:
+    """边枚举边处理：最多 in_flight 个条目已取出但未完成，失败的条目保留在匹配集合中"""
+    produced, pending = [], deque()
+
+    def settle_oldest():
+        index, entry = pending.popleft()
+        renamed = not failing(index)
+        if renamed:
+            search.rename(entry)
+        stream.settle(renamed)
+
+    for entry in stream:
+        produced.append(entry)
+        pending.append((len(produced) - 1, entry))
+        if len(pending) > in_flight:
+            settle_oldest()
+    while pending:
+        settle_oldest()
+    return produced
+
+
+def test_all_renamed_sequentially_yields_every_function_once():
+    search = ShrinkingSearch(250)
+    expected = list(search.matching)
+    stream = FunctionStream("FUN_", page_size=40, fetch=search.fetch)
+    assert consume(stream, search, in_flight=0) == expected
+    assert stream.total == 250
+    # 已处理的条目都被重命名移出了匹配集合，每页都从头读取
+    assert all(offset == 0 for offset, _ in search.requests)
+
+
+def test_window_covers_in_flight_and_failed_functions():
+    # 回归：固定步长的 offset 在匹配集合缩小时会跳过函数
+    search = ShrinkingSearch(500)
+    expected = list(search.matching)
+    stream = FunctionStream("FUN_", page_size=32, fetch=search.fetch)
+    produced = consume(stream, search, in_flight=13, failing=lambda i: i % 3 == 0)
+    assert sorted(produced) == sorted(expected)
+    assert len(produced) == len(set(produced)) == 500
+    assert search.matching == [entry for i, entry in enumerate(expected) if i % 3 == 0]
+
+
+def test_window_bounds():
+    search = ShrinkingSearch(100)
+    stream = FunctionStream("FUN_", page_size=10, fetch=search.fetch)
+    for _ in range(10):
+        next(stream)
+    stream.settle(renamed=True)
+    stream.settle(renamed=False)
+    # 已产出 10 个：1 个已移出，1 个仍在集合中，8 个在处理中（可能已移出，也可能没有）
+    assert stream._window() == (1, 10 + 8)
+
+
+def test_callbacks_and_known_total():
+    search = ShrinkingSearch(25)
+    seen, totals = [], []
+    stream = FunctionStream("FUN_", page_size=10, fetch=search.fetch, on_entry=seen.append, on_exhausted=totals.append)
+    assert not stream.is_empty()
+    assert stream.known_total() == 0
+    entries = list(stream)
+    assert seen == entries
+    assert totals == [25]
+    assert stream.known_total() == 25
+
+
+def test_request_error_ends_stream():
+    pages = [["FUN_1 @ 1000", "FUN_2 @ 2000"], ["Request failed: timeout"]]
+    stream = FunctionStream("FUN_", page_size=2, fetch=lambda offset, limit: pages.pop(0))
+    assert list(stream) == ["FUN_1 @ 1000", "FUN_2 @ 2000"]
+    assert stream.error == "Request failed: timeout"
+    assert stream.total == 2
+
+
+def test_entries_starting_with_error_are_data():
+    entries = ["ErrorReport @ 00401000", "ErrorHandler @ 00402000", "FUN_Error @ 00403000"]
+    stream = FunctionStream("Error", page_size=10, fetch=lambda offset, limit: entries[offset:offset + limit])
+    assert list(stream) == entries
+    assert stream.error is None
+
+
+def test_empty_result():
+    stream = FunctionStream("nothing", page_size=10, fetch=lambda offset, limit: [])
+    assert stream.is_empty()
+    assert list(stream) == []
+
+
+def test_async_iteration_with_blocking_callbacks():
+    search = ShrinkingSearch(60)
+    seen = []
+
+    async def afetch(offset, limit):
+        return search.fetch(offset, limit)
+
+    async def main():
+        stream = FunctionStream("FUN_", page_size=16, afetch=afetch, on_entry=seen.append)
+        produced = []
+        assert not await stream.is_empty_async()
+        async for entry in stream:
+            produced.append(entry)
+            search.rename(entry)
+            stream.settle(renamed=True)
+        return produced
+
+    produced = asyncio.run(main())
+    assert len(produced) == 60
+    assert seen == produced
@@ -0,0 +1,175 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import ghidra_client
+from ghidra_client import (GhidraClient, _write_succeeded, is_error_response, is_request_error, parse_server_list,
+                           split_function_entry)
+
+
+@pytest.fixture
+def http(monkeypatch):
+    """替换实际的 HTTP 请求，calls 记录 (实例地址, 方法, 端点)，写操作返回 results 中按 (地址, 端点) 或端点给出的文本"""
+    calls = []
+    results = {}
+    lock = threading.Lock()
+
+    def fake_get(self, endpoint, params=None, timeout=None):
+        with lock:
+            calls.append((self.base_url, "GET", endpoint))
+        return [f"{endpoint} from {self.base_url}"]
+
+    def fake_post(self, endpoint, data, timeout=None):
+        with lock:
+            calls.append((self.base_url, "POST", endpoint))
+        return results.get((self.base_url, endpoint), results.get(endpoint, "Renamed successfully"))
+
+    monkeypatch.setattr(GhidraClient, "_get", fake_get)
+    monkeypatch.setattr(GhidraClient, "_post", fake_post)
+    return SimpleNamespace(calls=calls, results=results)
+
+
+@pytest.fixture
+def client():
+    client = GhidraClient("http://127.0.0.1:8080", pool_size=4,
+                          replica_urls="http://127.0.0.1:8081/, http://127.0.0.1:8082")
+    yield client
+    client.close()
+
+
+def test_parse_server_list():
+    assert parse_server_list("http://a:1, http://b:2/；http://a:1/") == ["http://a:1/", "http://b:2/"]
+    assert parse_server_list(["http://a:1/", " ", "http://c:3"]) == ["http://a:1/", "http://c:3/"]
+    assert parse_server_list(None) == []
+
+
+def test_split_function_entry():
+    assert split_function_entry("parse_header @ 00401000") == ("parse_header", "00401000")
+    assert split_function_entry("FUN_00402000 at 00402000") == ("FUN_00402000", "00402000")
+    assert split_function_entry("operator at @ 00403000") == ("operator at", "00403000")
+    assert split_function_entry("no_address") == ("no_address", None)
+
+
+def test_is_request_error():
+    assert is_request_error("Error 500: boom")
+    assert is_request_error("Request failed: connection refused")
+    assert not is_request_error("Renamed successfully")
+
+
+def test_is_error_response_only_matches_client_failures():
+    assert is_error_response(["Error 404: Not Found"])
+    assert is_error_response(["Request failed: connection refused"])
+    # 以 Error 开头的数据行不是请求失败
+    assert not is_error_response(["ErrorHandler at 00402000", "main at 00401000"])
+    assert not is_error_response(["ErrorReport @ 00403000"])
+    assert not is_error_response(["Error @ 00404000"])
+    assert not is_error_response([])
+
+
+def test_write_succeeded_uses_exact_plugin_text():
+    assert _write_succeeded("renameFunction", "Renamed successfully")
+    assert not _write_succeeded("renameFunction", "Rename failed")
+    assert _write_succeeded("/rename_function_by_address", "Function renamed successfully\n")
+    assert not _write_succeeded("rename_function_by_address", "Failed to rename function")
+    assert not _write_succeeded("set_function_prototype", "Failed to set function prototype: bad type")
+    assert not _write_succeeded("renameVariable", "Error 500: Injected failure")
+    # 不在列表中的接口只检查是否为请求错误
+    assert _write_succeeded("something_else", "done")
+    assert not _write_succeeded("something_else", "Request failed: timeout")
+
+
+def test_configure_updates_the_shared_client(monkeypatch):
+    monkeypatch.setattr(ghidra_client, "_client", None)
+    client = ghidra_client.get_client()
+    try:
+        assert ghidra_client.configure("http://10.0.0.1:9000", pool_size=7, timeouts={"strings": 60}) is client
+        assert ghidra_client.get_client() is client
+        assert client.base_url == "http://10.0.0.1:9000/"
+        assert client.pool_size == 7
+        assert client.timeout_for("/strings") == 60
+        assert client.timeout_for("decompile") == ghidra_client.ENDPOINT_TIMEOUTS["decompile"]
+        assert client.timeout_for("unknown") == ghidra_client.DEFAULT_TIMEOUT
+        assert client.url_for("/methods") == "http://10.0.0.1:9000/methods"
+    finally:
+        client.close()
+
+
+def test_replicas_exclude_primary_and_share_timeouts():
+    client = GhidraClient("http://127.0.0.1:8080/", replica_urls=["http://127.0.0.1:8080", "http://127.0.0.1:8081"])
+    try:
+        assert [replica.base_url for replica in client.replicas] == ["http://127.0.0.1:8081/"]
+        client.timeouts["decompile"] = 99
+        assert client.replicas[0].timeout_for("decompile") == 99
+        client.resize_pool(3)
+        assert client.replicas[0].pool_size == 3
+    finally:
+        client.close()
+
+
+def test_sharded_reads_rotate_across_instances(client, http):
+    for _ in range(6):
+        client.get("decompile_function", {"address": "1000"})
+    targets = [url for url, _, _ in http.calls]
+    assert sorted(set(targets)) == [instance.base_url for instance in client.instances()]
+    assert all(targets.count(instance.base_url) == 2 for instance in client.instances())
+    assert all(instance.outstanding == 0 for instance in client.instances())
+
+
+def test_sharded_reads_prefer_least_outstanding(client, http):
+    client.outstanding = 3
+    client.replicas[0].outstanding = 1
+    client.get("decompile", {})
+    assert http.calls[-1][0] == client.replicas[1].base_url
+
+
+def test_other_requests_go_to_primary(client, http):
+    client.get("methods", {"offset": 0})
+    client.get("/list_functions")
+    client.post("set_decompiler_comment", {"address": "1000", "comment": "x"})
+    assert {url for url, _, _ in http.calls} == {client.base_url}
+
+
+def test_successful_writes_are_mirrored_in_order(client, http):
+    client.post("renameFunction", {"oldName": "FUN_1000", "newName": "parse"})
+    http.results["rename_function_by_address"] = "Function renamed successfully"
+    client.post("rename_function_by_address", {"function_address": "2000", "new_name": "emit"})
+    assert client.flush_mirrors() == 0
+    for replica in client.replicas:
+        assert [endpoint for url, _, endpoint in http.calls if url == replica.base_url] == \
+            ["renameFunction", "rename_function_by_address"]
+
+
+def test_failed_writes_are_not_mirrored(client, http):
+    http.results["renameFunction"] = "Rename failed"
+    assert client.post("renameFunction", {"oldName": "missing", "newName": "x"}) == "Rename failed"
+    http.results["set_function_prototype"] = "Failed to set function prototype: bad"
+    client.post("set_function_prototype", {"function_address": "1000", "prototype": "int f("})
+    assert client.flush_mirrors() == 0
+    assert {url for url, _, _ in http.calls} == {client.base_url}
+
+
+def test_mirror_failures_are_counted(client, http):
+    http.results[(client.replicas[1].base_url, "renameVariable")] = "Failed to rename variable"
+    http.results["renameVariable"] = "Variable renamed"
+    client.post("renameVariable", {"functionName": "main", "oldName": "a", "newName": "b"})
+    assert client.flush_mirrors() == 1
+
+
+def test_verify_replicas_keeps_matching_programs(client, monkeypatch):
+    functions = ["ErrorHandler at 00401000", "main at 00402000"]
+    listings = {
+        "http://127.0.0.1:8080/": functions,
+        "http://127.0.0.1:8081/": functions,
+        "http://127.0.0.1:8082/": ["ErrorHandler at 00401000", "FUN_00402000 at 00402000"],
+    }
+
+    def fake_get(self, endpoint, params=None, timeout=None):
+        if endpoint == "list_functions":
+            return listings[self.base_url]
+        return [".text: 00401000 - 00402000"] if endpoint == "segments" else ["printf -> EXTERNAL:00000001"]
+
+    monkeypatch.setattr(GhidraClient, "_get", fake_get)
+    # 函数名快照不一致（副本落后于主实例的重命名）的实例被移除
+    assert ghidra_client.verify_replicas(client) == ["http://127.0.0.1:8082/"]
+    assert [replica.base_url for replica in client.replicas] == ["http://127.0.0.1:8081/"]
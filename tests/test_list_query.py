@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import list_query
+from list_query import LIST_KINDS, parse_line, project, compile_filter, matches
+
+pytest.importorskip("mcp.server.fastmcp")
+import bridge_mcp_ghidra as bridge
+from response_cache import ResponseCache
+
+
+def test_parse_line_splits_fields():
+    assert parse_line(LIST_KINDS["functions"], "FUN_00401000 at 00401000") == {"name": "FUN_00401000", "address": "00401000"}
+    assert parse_line(LIST_KINDS["segments"], ".text: 00401000 - 00402000") == {"name": ".text", "start": "00401000", "end": "00402000"}
+    assert parse_line(LIST_KINDS["imports"], "not an import") == {"line": "not an import"}
+
+
+def test_project_keeps_requested_fields_and_truncates():
+    item = {"address": "1000", "value": "x" * 500}
+    assert project(item, ["address"]) == "1000"
+    value = project(item, None)["value"]
+    assert len(value) == list_query.MAX_FIELD_CHARS + 1 and value.endswith("…")
+
+
+def test_match_field_restricts_regex():
+    item = {"name": "parse_header", "address": "00401000"}
+    regex = compile_filter("^parse")
+    assert matches(item, "parse_header at 00401000", regex, "name")
+    assert not matches(item, "parse_header at 00401000", compile_filter("^0040"), "name")
+
+
+@pytest.fixture
+def methods(monkeypatch):
+    """模拟支持 offset/limit 的 methods 接口，记录请求的偏移"""
+    names = [f"{'handler' if i % 3 == 0 else 'FUN'}_{i:05d}" for i in range(2500)]
+    offsets = []
+
+    async def ghidra_get(endpoint, params=None):
+        offsets.append(params["offset"])
+        return names[params["offset"]:params["offset"] + params["limit"]]
+
+    monkeypatch.setattr(bridge, "ghidra_get", ghidra_get)
+    monkeypatch.setattr(bridge, "response_cache", ResponseCache())
+    monkeypatch.setattr(list_query, "PAGE_SIZE", 100)
+    return names, offsets
+
+
+def test_cursor_paging_returns_every_match_once(methods):
+    names, _ = methods
+    collected, cursor, calls = [], None, 0
+    while True:
+        result = asyncio.run(bridge.query_list("methods", pattern="^handler", max_results=60, cursor=cursor))
+        assert len(result["items"]) <= 60
+        collected.extend(result["items"])
+        cursor = result["next_cursor"]
+        calls += 1
+        if cursor is None:
+            break
+    assert collected == [name for name in names if name.startswith("handler")]
+    assert calls == 14
+
+
+def test_cursor_resumes_mid_page(methods):
+    names, offsets = methods
+    first = asyncio.run(bridge.query_list("methods", max_results=150))
+    assert first["next_cursor"] == "150"
+    offsets.clear()
+    second = asyncio.run(bridge.query_list("methods", max_results=10, cursor=first["next_cursor"]))
+    assert second["items"] == names[150:160]
+    assert offsets == [150]
+
+
+def test_output_size_limit_ends_page_early(methods, monkeypatch):
+    monkeypatch.setattr(list_query, "MAX_OUTPUT_CHARS", 100)
+    result = asyncio.run(bridge.query_list("methods", max_results=500))
+    assert 0 < len(result["items"]) < 10
+    assert result["next_cursor"] == str(len(result["items"]))
+
+
+def test_invalid_arguments_are_reported():
+    assert "error" in asyncio.run(bridge.query_list("bogus"))
+    assert "error" in asyncio.run(bridge.query_list("methods", fields=["address"]))
+    assert "error" in asyncio.run(bridge.query_list("methods", pattern="("))
+    assert "error" in asyncio.run(bridge.query_list("methods", cursor="abc"))
+
+
+def test_rows_starting_with_error_are_results(monkeypatch):
+    async def ghidra_get(endpoint, params=None):
+        assert endpoint == "searchFunctions" and params["query"] == "Error"
+        return ["ErrorHandler @ 00401000", "ErrorReport @ 00402000"][params["offset"]:params["offset"] + params["limit"]]
+
+    monkeypatch.setattr(bridge, "ghidra_get", ghidra_get)
+    monkeypatch.setattr(bridge, "response_cache", ResponseCache())
+    result = asyncio.run(bridge.query_list("functions", "Error"))
+    assert "error" not in result
+    assert [item["name"] for item in result["items"]] == ["ErrorHandler", "ErrorReport"]
+
+
+def test_request_failure_is_reported(monkeypatch):
+    async def ghidra_get(endpoint, params=None):
+        return ["Request failed: connection refused"]
+
+    monkeypatch.setattr(bridge, "ghidra_get", ghidra_get)
+    monkeypatch.setattr(bridge, "response_cache", ResponseCache())
+    result = asyncio.run(bridge.query_list("methods"))
+    assert result["error"] == "Request failed: connection refused"
+    assert result["next_cursor"] == "0"
@@ -0,0 +1,68 @@
+import threading
+
+from log_buffer import ERROR, INFO, WARN, LogBuffer, leveled_log
+
+
+def test_drain_returns_items_in_order_and_clears():
+    buffer = LogBuffer()
+    buffer.push("start")
+    buffer.push("slow endpoint", WARN)
+    assert buffer.drain() == ([(INFO, "start"), (WARN, "slow endpoint")], 0)
+    assert buffer.drain() == ([], 0)
+
+
+def test_oldest_entries_are_dropped_and_counted():
+    buffer = LogBuffer(max_pending=3)
+    for i in range(5):
+        buffer.push(f"line {i}")
+    items, dropped = buffer.drain()
+    assert [text for _, text in items] == ["line 2", "line 3", "line 4"]
+    assert dropped == 2
+    buffer.push("after")
+    assert buffer.drain() == ([(INFO, "after")], 0)
+
+
+def test_log_file_keeps_every_line(tmp_path):
+    path = tmp_path / "logs" / "run.log"
+    buffer = LogBuffer(max_pending=1)
+    buffer.open_file(str(path))
+    buffer.push("first")
+    buffer.push("failed", ERROR)
+    buffer.drain()
+    buffer.close_file()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [line.split(" ", 1)[1] for line in lines] == ["[info] first", "[error] failed"]
+
+
+def test_concurrent_pushes_are_not_lost():
+    buffer = LogBuffer(max_pending=10000)
+    threads = [threading.Thread(target=lambda: [buffer.push("x") for _ in range(500)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    items, dropped = buffer.drain()
+    assert (len(items), dropped) == (4000, 0)
+
+
+def test_leveled_log_adapts_text_only_callbacks():
+    received = []
+    log = leveled_log(received.append)
+    log("plain")
+    log("bad", ERROR)
+    assert received == ["plain", "bad"]
+
+    leveled = []
+    log = leveled_log(lambda text, level: leveled.append((level, text)))
+    log("plain")
+    log("bad", ERROR)
+    assert leveled == [(INFO, "plain"), (ERROR, "bad")]
+    # 已包装的回调与 None 原样返回
+    assert leveled_log(log) is log
+    assert leveled_log(None) is None
+
+
+def test_leveled_print_prints_only_the_text(capsys):
+    log = leveled_log(print)
+    log("重命名失败", ERROR)
+    assert capsys.readouterr().out == "重命名失败\n"
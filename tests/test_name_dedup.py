@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+from name_dedup import NameCache, NamingDeduplicator, body_hash, normalize_decompiled
+
+THUNK_A = """
+/* WARNING: Removing unreachable block */
+void FUN_00401000(int param_1)
+{
+  FUN_00405000(param_1, s_Hello_world_00406000, 0x00407000);  // call
+  DAT_0040a000 = 1;
+}
+"""
+THUNK_B = """
+void FUN_00402000(int param_1)
+{
+  FUN_00405abc(param_1, s_Hello_world_00416000, 0x00417000);
+  DAT_0040b000 = 1;
+}
+"""
+
+
+@pytest.fixture
+def dedup(tmp_path):
+    dedup = NamingDeduplicator(NameCache(str(tmp_path / "names.sqlite3")))
+    yield dedup
+    dedup.close()
+
+
+def test_identical_bodies_at_different_addresses_hash_the_same():
+    assert body_hash(THUNK_A) == body_hash(THUNK_B)
+    assert "SELF" in normalize_decompiled(THUNK_A)
+    # 短常量是有意义的数值，不归一化
+    assert body_hash(THUNK_A) != body_hash(THUNK_A.replace("= 1", "= 2"))
+
+
+def test_resolve_reuses_the_first_result(dedup):
+    calls = []
+
+    def analyze(code):
+        calls.append(code)
+        return "printGreeting"
+
+    assert dedup.resolve(THUNK_A, analyze) == ("printGreeting", False)
+    assert dedup.resolve(THUNK_B, analyze) == ("printGreeting", True)
+    assert len(calls) == 1 and dedup.saved == 1
+    assert dedup.lookup(THUNK_B) == "printGreeting"
+
+
+def test_failed_analysis_is_not_cached(dedup):
+    assert dedup.resolve(THUNK_A, lambda code: None) == (None, False)
+    assert dedup.resolve(THUNK_A, lambda code: "retry") == ("retry", False)
+
+
+def test_names_persist_across_runs(tmp_path):
+    path = str(tmp_path / "names.sqlite3")
+    first = NamingDeduplicator(NameCache(path))
+    first.remember(THUNK_A, "printGreeting")
+    first.close()
+    second = NamingDeduplicator(NameCache(path))
+    try:
+        assert second.lookup(THUNK_B) == "printGreeting"
+    finally:
+        second.close()
+
+
+def test_concurrent_threads_share_one_ai_call(dedup):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def analyze(code):
+        calls.append(code)
+        started.set()
+        release.wait(5)
+        return "printGreeting"
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(dedup.resolve(THUNK_A, analyze)))
+    first.start()
+    started.wait(5)
+    others = [threading.Thread(target=lambda: results.append(dedup.resolve(THUNK_B, analyze))) for _ in range(3)]
+    for thread in others:
+        thread.start()
+    release.set()
+    for thread in [first] + others:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(results) == [("printGreeting", False)] + [("printGreeting", True)] * 3
+
+
+def test_async_resolve_shares_one_ai_call(dedup):
+    calls = []
+
+    async def analyze(code):
+        calls.append(code)
+        await asyncio.sleep(0.01)
+        return "printGreeting"
+
+    async def main():
+        return await asyncio.gather(*(dedup.resolve_async(code, analyze) for code in (THUNK_A, THUNK_B, THUNK_B)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(results) == [("printGreeting", False), ("printGreeting", True), ("printGreeting", True)]
@@ -0,0 +1,73 @@
+from name_registry import NameRegistry
+
+
+def test_reserve_free_name_is_returned_unchanged():
+    registry = NameRegistry(["init", "main"])
+    assert registry.reserve("parse_header", "FUN_1") == "parse_header"
+    assert "parse_header" in registry
+
+
+def test_reserve_taken_name_gets_next_free_suffix():
+    registry = NameRegistry(["init", "init_2"])
+    assert registry.reserve("init", "FUN_1") == "init_3"
+    assert registry.reserve("init", "FUN_2") == "init_4"
+
+
+def test_exact_match_only():
+    # searchFunctions 是子串匹配，init 与 initFoo 不应冲突
+    registry = NameRegistry(["initFoo"])
+    assert registry.reserve("init", "FUN_1") == "init"
+
+
+def test_reserve_current_name_is_not_a_conflict():
+    registry = NameRegistry(["init"])
+    assert registry.reserve("init", "init") == "init"
+    assert len(registry) == 1
+
+
+def test_commit_releases_old_name():
+    registry = NameRegistry(["FUN_1"])
+    new_name = registry.reserve("parse", "FUN_1")
+    registry.commit("FUN_1", new_name)
+    assert "FUN_1" not in registry
+    assert "parse" in registry
+    assert len(registry) == 1
+
+
+def test_release_undoes_failed_reservation():
+    registry = NameRegistry(["FUN_1"])
+    new_name = registry.reserve("parse", "FUN_1")
+    registry.release(new_name, "FUN_1")
+    assert "parse" not in registry
+    assert registry.reserve("parse", "FUN_1") == "parse"
+
+
+def test_duplicate_names_are_counted():
+    registry = NameRegistry(["thunk", "thunk"])
+    registry.commit("thunk", "renamed")
+    assert "thunk" in registry
+    registry.commit("thunk", "renamed_2")
+    assert "thunk" not in registry
+
+
+def test_load_pages_until_short_page():
+    pages = {0: ["a", "b"], 2: ["c", "d"], 4: ["e"]}
+    requests = []
+
+    def fetch(offset, limit):
+        requests.append((offset, limit))
+        return pages[offset]
+
+    registry = NameRegistry.load(page_size=2, fetch=fetch)
+    assert len(registry) == 5
+    assert requests == [(0, 2), (2, 2), (4, 2)]
+
+
+def test_load_returns_none_on_request_error():
+    assert NameRegistry.load(fetch=lambda offset, limit: ["Request failed: timeout"]) is None
+
+
+def test_load_keeps_names_starting_with_error():
+    registry = NameRegistry.load(fetch=lambda offset, limit: ["ErrorHandler", "main"])
+    assert registry is not None
+    assert "ErrorHandler" in registry and "main" in registry
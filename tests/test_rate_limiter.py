@@ -0,0 +1,122 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, RateLimitedClient, is_rate_limit_error, retry_after_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # 真实的时钟在 sleep 期间至少前进一点，浮点误差留下的极小等待时间不会原地空转
+        seconds = max(seconds, 0.001)
+        self.slept += seconds
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    return clock
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_additive_increase_up_to_max(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, max_requests_per_minute=63, increase_per_success=1)
+    for _ in range(5):
+        limiter.on_success()
+    assert limiter.requests_per_minute == 63
+
+
+def test_multiplicative_decrease_down_to_min(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, min_requests_per_minute=10, decrease_factor=0.5)
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == 30
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.requests_per_minute == 10
+    assert limiter.rate_limited == 3
+
+
+def test_token_rate_follows_request_rate(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60, tokens_per_minute=60000)
+    limiter.on_rate_limited()
+    assert limiter._tokens.per_minute == 30000
+
+
+def test_bucket_paces_requests(clock):
+    # 60 请求/分钟：容量 2，之后每秒 1 个
+    limiter = AdaptiveRateLimiter(requests_per_minute=60)
+    assert limiter.try_acquire()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.acquire()
+    assert clock.slept == pytest.approx(1.0, abs=0.01)
+
+
+def test_retry_after_pauses_and_drops_burst(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=600)
+    limiter.on_rate_limited(retry_after=3)
+    assert not limiter.try_acquire()
+    assert limiter.acquire()
+    assert clock.slept >= 3
+
+
+def test_acquire_returns_false_on_stop(clock):
+    limiter = AdaptiveRateLimiter(requests_per_minute=60)
+    limiter.on_rate_limited(retry_after=60)
+    stop = SimpleNamespace(is_set=lambda: True)
+    assert limiter.acquire(stop_event=stop) is False
+
+
+def test_retry_after_header_parsing():
+    assert retry_after_seconds(RateLimitError({"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(RateLimitError({"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_seconds(RateLimitError({"retry-after": "Wed, 21 Oct 2015"})) is None
+    assert retry_after_seconds(ValueError()) is None
+    assert is_rate_limit_error(RateLimitError())
+    assert not is_rate_limit_error(ValueError())
+
+
+def test_client_retries_rate_limited_calls(clock):
+    outcomes = [RateLimitError({"retry-after": "1"}), RateLimitError(), "response"]
+
+    def create(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    limiter = AdaptiveRateLimiter(requests_per_minute=600)
+    client = RateLimitedClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))),
+                               limiter, estimate_tokens=len)
+    assert client.chat.completions.create(messages=[{"content": "x"}]) == "response"
+    assert limiter.rate_limited == 2
+    assert limiter.requests_per_minute == 150 + 1
+
+
+def test_client_gives_up_after_max_retries(clock):
+    def create(**kwargs):
+        raise RateLimitError()
+
+    limiter = AdaptiveRateLimiter(requests_per_minute=600)
+    client = RateLimitedClient(SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))),
+                               limiter, estimate_tokens=len, max_retries=2)
+    with pytest.raises(RateLimitError):
+        client.chat.completions.create(messages=[])
+    assert limiter.rate_limited == 2
@@ -0,0 +1,117 @@
+import asyncio
+import importlib
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from name_registry import NameRegistry
+from rename_journal import FAILED, RENAMED, RenameJournal, load_journal
+
+pytest.importorskip("openai")
+
+
+@pytest.fixture
+def rename_async(monkeypatch):
+    # 导入 ai_rename 时按 sys.argv[1] 配置 Ghidra 地址
+    monkeypatch.setattr(sys, "argv", ["ai_rename"])
+    return importlib.import_module("ai_rename_async")
+
+
+class FakeGhidra:
+    """模拟插件：decompile 返回固定代码，renameFunction 按 rename_results 返回，记录同时在途的最大请求数"""
+
+    def __init__(self, rename_results=None):
+        self.rename_results = rename_results or {}
+        self.renames = []
+        self.active = 0
+        self.peak = 0
+
+    async def decompile_function(self, name):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if name == "FUN_missing":
+                return "Error 404: Function not found"
+            return f"void {name}(void)\n{{\n  return;\n}}"
+        finally:
+            self.active -= 1
+
+    async def search_functions_by_name(self, query, offset=0, limit=100):
+        return []
+
+    async def rename_function(self, old_name, new_name):
+        self.renames.append((old_name, new_name))
+        return self.rename_results.get(old_name, "Renamed successfully")
+
+
+class FakeAsyncOpenAI:
+    """按函数签名中的地址生成名称"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        code = kwargs["messages"][-1]["content"]
+        suffix = code.split("FUN_", 1)[1].split("(", 1)[0]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"handle{suffix.capitalize()}"))])
+
+
+@pytest.fixture
+def config(tmp_path):
+    journal = RenameJournal(str(tmp_path / "journal.jsonl"))
+    config = {'delay': 0, 'concurrency': 3, 'journal': journal}
+    yield config
+    journal.close()
+
+
+def run(rename_async, config, functions, ghidra):
+    logs = []
+    asyncio.run(rename_async.process_functions_async(config, FakeAsyncOpenAI(), "model", functions, ghidra,
+                                                     on_log=lambda text, level="info": logs.append((level, text))))
+    config['journal'].close()
+    return logs, load_journal(config['journal'].path)
+
+
+def test_functions_in_flight_are_bounded_by_concurrency(rename_async, config):
+    functions = [f"FUN_{i:08x} @ {i:08x}" for i in range(10)]
+    ghidra = FakeGhidra()
+    _, replay = run(rename_async, config, functions, ghidra)
+    assert ghidra.peak == 3
+    assert len(ghidra.renames) == 10
+    assert set(replay.status.values()) == {RENAMED}
+    assert replay.pending() == []
+
+
+def test_plugin_rename_failed_is_journaled_as_failed(rename_async, config):
+    config['name_registry'] = NameRegistry(["FUN_a", "FUN_b"])
+    ghidra = FakeGhidra({"FUN_b": "Rename failed"})
+    logs, replay = run(rename_async, config, ["FUN_a @ 0000000a", "FUN_b @ 0000000b"], ghidra)
+    assert replay.status == {"FUN_a @ 0000000a": RENAMED, "FUN_b @ 0000000b": FAILED}
+    assert replay.reasons == {"FUN_b @ 0000000b": "Rename failed"}
+    assert replay.pending() == ["FUN_b @ 0000000b"]
+    # 失败时释放预留的名称，原名仍在登记表中
+    registry = config['name_registry']
+    assert "handleA" in registry and "handleB" not in registry and "FUN_b" in registry
+    assert ("error", "重命名失败 FUN_b @ 0000000b: Rename failed") in logs
+
+
+def test_decompile_error_skips_the_function(rename_async, config):
+    ghidra = FakeGhidra()
+    _, replay = run(rename_async, config, ["FUN_missing @ 00000001", "FUN_c @ 0000000c"], ghidra)
+    assert ghidra.renames == [("FUN_c", "handleC")]
+    assert replay.status["FUN_missing @ 00000001"] == FAILED
+    assert replay.reasons["FUN_missing @ 00000001"] == "Error 404: Function not found"
+
+
+def test_methods_count_ignores_names_starting_with_error(rename_async):
+    class Client(rename_async.AsyncGhidraClient):
+        def __init__(self, lines):
+            self.lines = lines
+
+        async def get(self, endpoint, params=None):
+            return self.lines
+
+    assert asyncio.run(Client(["ErrorHandler", "main"]).get_all_methods_count()) == 2
+    assert asyncio.run(Client(["Error 500: boom"]).get_all_methods_count()) == 0
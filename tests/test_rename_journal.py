@@ -0,0 +1,75 @@
+import json
+
+import rename_journal
+from rename_journal import FAILED, RENAMED, RenameJournal, load_journal
+
+
+def test_replay_tracks_last_event_and_pending_order(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = RenameJournal(str(path))
+    journal.record("start", pattern="FUN_")
+    journal.record_many("queued", ["FUN_1 @ 1000", "FUN_2 @ 2000", "FUN_3 @ 3000", "FUN_4 @ 4000"])
+    journal.record("enumerated")
+    journal.record(RENAMED, "FUN_1 @ 1000", name="parse")
+    journal.record("decompiled", "FUN_2 @ 2000")
+    journal.record(FAILED, "FUN_3 @ 3000", stage="rename", reason="Rename failed")
+    journal.close()
+
+    replay = load_journal(str(path))
+    assert replay.pattern == "FUN_"
+    assert replay.enumerated
+    assert replay.entries == ["FUN_1 @ 1000", "FUN_2 @ 2000", "FUN_3 @ 3000", "FUN_4 @ 4000"]
+    assert replay.count(RENAMED) == 1
+    assert replay.reasons == {"FUN_3 @ 3000": "Rename failed"}
+    # 失败的在前，其余未完成的保持入队顺序，已重命名的跳过
+    assert replay.pending() == ["FUN_3 @ 3000", "FUN_2 @ 2000", "FUN_4 @ 4000"]
+
+
+def test_resume_appends_and_later_success_clears_failure(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = RenameJournal(str(path))
+    journal.record_many("queued", ["FUN_1 @ 1000", "FUN_2 @ 2000"])
+    journal.record(FAILED, "FUN_1 @ 1000", stage="ai", reason="timeout")
+    journal.close()
+
+    journal = RenameJournal(str(path), resume=True)
+    journal.record(RENAMED, "FUN_1 @ 1000", name="init")
+    journal.close()
+    replay = load_journal(str(path))
+    assert replay.pending() == ["FUN_2 @ 2000"]
+
+    # 不续传时覆盖上一次的日志
+    RenameJournal(str(path)).close()
+    assert load_journal(str(path)).entries == []
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    lines = [json.dumps({"event": "queued", "func": "FUN_1 @ 1000"}),
+             json.dumps({"event": RENAMED, "func": "FUN_1 @ 1000"}),
+             '{"event": "renamed", "func": "FUN_2']
+    path.write_text("\n".join(lines), encoding="utf-8")
+    replay = load_journal(str(path))
+    assert replay.entries == ["FUN_1 @ 1000"]
+    assert replay.pending() == []
+
+
+def test_missing_journal_returns_none(tmp_path):
+    assert load_journal(str(tmp_path / "missing.jsonl")) is None
+
+
+def test_fsync_is_batched(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(rename_journal, "FSYNC_EVERY", 3)
+    monkeypatch.setattr(rename_journal.os, "fsync", lambda fd: synced.append(fd))
+    journal = RenameJournal(str(tmp_path / "journal.jsonl"))
+    for i in range(7):
+        journal.record("queued", f"FUN_{i}")
+    assert len(synced) == 2
+    journal.record_many("queued", ["FUN_a", "FUN_b"])
+    assert len(synced) == 3
+    journal.close()
+    assert len(synced) == 4
+    # 关闭后的记录被忽略
+    journal.record(RENAMED, "FUN_0")
+    assert load_journal(journal.path).count(RENAMED) == 0
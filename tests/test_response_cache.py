@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, NAMES, CODE
+
+
+class Loader:
+    def __init__(self, value="result"):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_hit_within_ttl_and_reload_after_expiry(clock):
+    cache = ResponseCache(ttl=10)
+    loader = Loader()
+    assert cache.fetch("k", loader) == "result"
+    clock[0] += 9
+    assert cache.fetch("k", loader) == "result"
+    assert loader.calls == 1
+    clock[0] += 2
+    cache.fetch("k", loader)
+    assert loader.calls == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(ttl=60, max_entries=2)
+    loaders = {key: Loader(key) for key in "abc"}
+    cache.fetch("a", loaders["a"])
+    cache.fetch("b", loaders["b"])
+    cache.fetch("a", loaders["a"])     # a 变为最近使用
+    cache.fetch("c", loaders["c"])     # 淘汰 b
+    assert len(cache) == 2
+    cache.fetch("a", loaders["a"])
+    cache.fetch("b", loaders["b"])
+    assert loaders["a"].calls == 1
+    assert loaders["b"].calls == 2
+
+
+def test_errors_are_not_cached():
+    cache = ResponseCache(ttl=60)
+    loader = Loader("Request failed: timeout")
+    cache.fetch("k", loader)
+    cache.fetch("k", loader)
+    assert loader.calls == 2
+
+
+def test_failed_list_requests_are_not_cached_but_error_rows_are():
+    cache = ResponseCache(ttl=60)
+    failed = Loader(["Error 500: Internal Server Error"])
+    rows = Loader(["ErrorHandler @ 00401000"])
+    for _ in range(2):
+        cache.fetch("failed", failed)
+        cache.fetch("rows", rows)
+    assert (failed.calls, rows.calls) == (2, 1)
+
+
+def test_invalidate_drops_only_that_group():
+    cache = ResponseCache(ttl=60)
+    names, code = Loader(["FUN_1"]), Loader("void f(void)")
+    cache.fetch("list", names, NAMES)
+    cache.fetch("decompile", code, CODE)
+    cache.invalidate(NAMES)
+    cache.fetch("list", names, NAMES)
+    cache.fetch("decompile", code, CODE)
+    assert (names.calls, code.calls) == (2, 1)
+
+
+def test_single_flight_threads_share_one_request():
+    cache = ResponseCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.fetch("k", slow_loader)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.fetch("k", slow_loader))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    for _ in range(500):
+        if cache.coalesced >= 5:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ["value"] * 6
+    assert len(calls) == 1
+
+
+def test_single_flight_async_shares_one_request_and_errors():
+    cache = ResponseCache(ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("down")
+
+    async def main():
+        values = await asyncio.gather(*(cache.fetch_async("k", loader) for _ in range(10)))
+        errors = await asyncio.gather(*(cache.fetch_async("e", failing) for _ in range(3)), return_exceptions=True)
+        return values, errors
+
+    values, errors = asyncio.run(main())
+    assert values == ["value"] * 10
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert len(calls) == 2
+
+
+def test_result_of_request_overlapping_a_write_is_not_cached():
+    cache = ResponseCache(ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            cache.invalidate(CODE)      # 请求进行期间发生了写操作
+        return "value"
+
+    cache.fetch("k", loader, CODE)
+    cache.fetch("k", loader, CODE)
+    assert len(calls) == 2
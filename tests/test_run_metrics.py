@@ -0,0 +1,84 @@
+import json
+import urllib.request
+
+import run_metrics
+from run_metrics import MetricsRegistry, BUCKETS
+
+
+def test_prometheus_counters_and_help():
+    registry = MetricsRegistry()
+    registry.inc("ghidra_requests_total", endpoint="decompile", status="ok")
+    registry.inc("ghidra_requests_total", 2, endpoint="decompile", status="ok")
+    text = registry.to_prometheus()
+    lines = text.splitlines()
+    assert "# HELP ghidra_requests_total Requests sent to the Ghidra plugin by endpoint and status" in lines
+    assert "# TYPE ghidra_requests_total counter" in lines
+    assert 'ghidra_requests_total{endpoint="decompile",status="ok"} 3' in lines
+    assert text.endswith("\n")
+
+
+def test_prometheus_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    for seconds in (0.003, 0.02, 0.02, 100.0):
+        registry.observe("rename_stage_seconds", seconds, stage="ai")
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE rename_stage_seconds histogram" in lines
+    assert 'rename_stage_seconds_bucket{stage="ai",le="0.005"} 1' in lines
+    assert 'rename_stage_seconds_bucket{stage="ai",le="0.01"} 1' in lines
+    assert 'rename_stage_seconds_bucket{stage="ai",le="0.025"} 3' in lines
+    assert 'rename_stage_seconds_bucket{stage="ai",le="60"} 3' in lines
+    assert 'rename_stage_seconds_bucket{stage="ai",le="+Inf"} 4' in lines
+    assert 'rename_stage_seconds_sum{stage="ai"} 100.043000' in lines
+    assert 'rename_stage_seconds_count{stage="ai"} 4' in lines
+    assert sum(line.startswith("rename_stage_seconds_bucket") for line in lines) == len(BUCKETS) + 1
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.inc("ai_requests_total", endpoint='say "hi"\\\n', result="ok")
+    assert 'ai_requests_total{endpoint="say \\"hi\\"\\\\\\n",result="ok"} 1' in registry.to_prometheus().splitlines()
+
+
+def test_collectors_are_exported_as_gauges():
+    registry = MetricsRegistry()
+    registry.add_collector(lambda: [("bridge_cache_entries", {}, 7)])
+    registry.add_collector(lambda: 1 / 0)       # 出错的收集器被忽略
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE bridge_cache_entries gauge" in lines
+    assert "bridge_cache_entries 7" in lines
+
+
+def test_stage_totals_since_and_describe():
+    registry = MetricsRegistry()
+    registry.observe("rename_stage_seconds", 0.1, stage="decompile")
+    baseline = registry.histogram_totals("rename_stage_seconds", "stage")
+    registry.observe("rename_stage_seconds", 0.2, stage="decompile")
+    registry.observe("rename_stage_seconds", 0.4, stage="decompile")
+    registry.observe("rename_stage_seconds", 1.0, stage="ai")
+    stages = run_metrics.since(registry.histogram_totals("rename_stage_seconds", "stage"), baseline)
+    assert stages["decompile"][0] == 2
+    assert run_metrics.describe_stages(stages) == "反编译 2 次 平均 300 ms，AI命名 1 次 平均 1000 ms"
+
+
+def test_dump_writes_json_and_prom(tmp_path):
+    registry = MetricsRegistry()
+    registry.inc("export_functions_total", result="written")
+    path = tmp_path / "metrics.json"
+    registry.dump(str(path))
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["counters"] == [{"name": "export_functions_total", "labels": {"result": "written"}, "value": 1}]
+    assert 'export_functions_total{result="written"} 1' in (tmp_path / "metrics.prom").read_text(encoding="utf-8")
+
+
+def test_http_server_serves_both_formats():
+    registry = MetricsRegistry()
+    registry.inc("ghidra_requests_total", endpoint="methods", status="ok")
+    server = run_metrics.MetricsServer(registry, 0)
+    try:
+        with urllib.request.urlopen(server.url, timeout=5) as response:
+            assert "text/plain" in response.headers["Content-Type"]
+            assert 'ghidra_requests_total{endpoint="methods",status="ok"} 1' in response.read().decode("utf-8")
+        with urllib.request.urlopen(server.url + ".json", timeout=5) as response:
+            assert json.load(response)["counters"][0]["value"] == 1
+    finally:
+        server.close()
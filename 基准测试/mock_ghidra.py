@@ -0,0 +1,252 @@
+"""
+模拟 GhidraMCP 插件的本地 HTTP 服务器，用于离线基准测试。
+
+实现本项目用到的接口（methods、list_functions、searchFunctions、decompile、renameFunction、
+rename_function_by_address、xrefs_to、xrefs_from、function_xrefs、segments、imports），
+返回格式与插件一致。每个接口可配置延迟（毫秒，带随机抖动）与失败率（返回 HTTP 500）。
+程序中的函数按确定的随机种子生成调用关系，反编译结果包含被调用函数的名称，
+因此重命名会像真实程序一样改变调用方的反编译结果。
+"""
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 各接口的默认延迟（毫秒）
+DEFAULT_LATENCY_MS = {
+    "decompile": 40,
+    "decompile_function": 40,
+    "renameFunction": 5,
+    "rename_function_by_address": 5,
+}
+DEFAULT_OTHER_LATENCY_MS = 2
+
+
+class BenchHTTPServer(ThreadingHTTPServer):
+    """每个连接一个线程；默认的监听队列只有5，高并发时连接会被拒绝或等待重传"""
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class MockProgram:
+    """线程安全的模拟程序：入口地址 -> 函数名，以及调用关系"""
+
+    def __init__(self, functions: int = 2000, named_ratio: float = 0.1, seed: int = 1):
+        rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.addresses = [f"{0x401000 + i * 0x40:08x}" for i in range(functions)]
+        self.names = {}
+        for i, address in enumerate(self.addresses):
+            self.names[address] = f"helper_{i}" if rng.random() < named_ratio else f"FUN_{address}"
+        self.callees = {address: rng.sample(self.addresses, k=min(len(self.addresses), rng.randint(0, 4)))
+                        for address in self.addresses}
+        self.callers = {address: [] for address in self.addresses}
+        for caller, callees in self.callees.items():
+            for callee in callees:
+                self.callers[callee].append(caller)
+        self.body_lines = {address: rng.randint(5, 120) for address in self.addresses}
+        # 段布局随种子变化，不同种子的程序得到不同的程序标识（本地缓存互不干扰）
+        self.segments = [".text: 00401000 - 00500000", f".data: 00500000 - {0x510000 + seed * 0x1000:08x}"]
+        self.renames = 0
+
+    def sorted_names(self) -> list:
+        with self._lock:
+            return sorted(self.names.values())
+
+    def entries(self, sep: str) -> list:
+        with self._lock:
+            return [f"{name}{sep}{address}" for address, name in self.names.items()]
+
+    def search(self, query: str) -> list:
+        query = query.lower()
+        with self._lock:
+            return sorted(f"{name} @ {address}" for address, name in self.names.items() if query in name.lower())
+
+    def address_of(self, name: str) -> str | None:
+        with self._lock:
+            for address, current in self.names.items():
+                if current == name:
+                    return address
+        return None
+
+    def decompile(self, address: str) -> str:
+        with self._lock:
+            name = self.names[address]
+            callees = [self.names[callee] for callee in self.callees[address]]
+        lines = [f"undefined4 {name}(int param_1, char *param_2)", "{", "  int iVar1;", ""]
+        for i in range(self.body_lines[address]):
+            if callees and i % 7 == 0:
+                lines.append(f"  iVar1 = {callees[(i // 7) % len(callees)]}(param_1 + {i}, param_2);")
+            elif i % 11 == 0:
+                lines.append(f"  printf(\"step {i} of {name}\\n\");")
+            else:
+                lines.append(f"  param_1 = param_1 * {i + 3} + iVar1;")
+        lines += ["  return param_1;", "}"]
+        return "\n".join(lines)
+
+    def rename(self, address: str, new_name: str) -> bool:
+        with self._lock:
+            if address not in self.names:
+                return False
+            self.names[address] = new_name
+            self.renames += 1
+            return True
+
+    def xrefs_to(self, address: str) -> list:
+        with self._lock:
+            return [f"From {caller} in {self.names[caller]} [UNCONDITIONAL_CALL]" for caller in self.callers.get(address, [])]
+
+    def xrefs_from(self, address: str) -> list:
+        with self._lock:
+            return [f"To {callee} to function {self.names[callee]} [UNCONDITIONAL_CALL]" for callee in self.callees.get(address, [])]
+
+
+def _page(lines: list, params: dict) -> list:
+    offset = int(params.get("offset", 0))
+    limit = int(params.get("limit", 100))
+    return lines[offset:offset + limit]
+
+
+class MockGhidraServer:
+    """在后台线程运行的模拟插件服务器"""
+
+    def __init__(self, program: MockProgram = None, latency_ms: dict = None, other_latency_ms: float = DEFAULT_OTHER_LATENCY_MS,
+                 jitter: float = 0.3, failure_rate: float = 0.0, failure_endpoints=None,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 1):
+        self.program = program or MockProgram()
+        self.latency_ms = dict(DEFAULT_LATENCY_MS)
+        if latency_ms:
+            self.latency_ms.update(latency_ms)
+        self.other_latency_ms = other_latency_ms
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        # 只对这些接口注入失败，None 表示所有接口
+        self.failure_endpoints = set(failure_endpoints) if failure_endpoints is not None else None
+        self.requests = {}
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._server = BenchHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "MockGhidraServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ghidra", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay_and_fail(self, endpoint: str) -> bool:
+        """模拟处理耗时，返回本次请求是否注入失败"""
+        base = self.latency_ms.get(endpoint, self.other_latency_ms)
+        with self._rng_lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            delay = base * (1 + self._rng.uniform(-self.jitter, self.jitter))
+            failed = self._rng.random() < self.failure_rate and \
+                (self.failure_endpoints is None or endpoint in self.failure_endpoints)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return failed
+
+    def handle(self, method: str, endpoint: str, params: dict, body: str) -> tuple[int, str]:
+        program = self.program
+        if self._delay_and_fail(endpoint):
+            return 500, "Injected failure"
+        if endpoint == "methods":
+            return 200, "\n".join(_page(program.sorted_names(), params))
+        if endpoint == "list_functions":
+            return 200, "\n".join(program.entries(" at "))
+        if endpoint == "searchFunctions":
+            query = params.get("query", "")
+            if not query:
+                return 200, "Search term is required"
+            return 200, "\n".join(_page(program.search(query), params))
+        if endpoint == "decompile" and method == "POST":
+            address = program.address_of(body.strip())
+            return 200, program.decompile(address) if address else "Function not found"
+        if endpoint == "decompile_function":
+            address = params.get("address", "")
+            return 200, program.decompile(address) if address in program.names else "No function found at or containing address"
+        if endpoint == "renameFunction" and method == "POST":
+            address = program.address_of(params.get("oldName", ""))
+            ok = address is not None and program.rename(address, params.get("newName", ""))
+            return 200, "Renamed successfully" if ok else "Rename failed"
+        if endpoint == "rename_function_by_address" and method == "POST":
+            ok = program.rename(params.get("function_address", ""), params.get("new_name", ""))
+            return 200, "Function renamed successfully" if ok else "Failed to rename function"
+        if endpoint == "xrefs_to":
+            return 200, "\n".join(_page(program.xrefs_to(params.get("address", "")), params))
+        if endpoint == "xrefs_from":
+            return 200, "\n".join(_page(program.xrefs_from(params.get("address", "")), params))
+        if endpoint == "function_xrefs":
+            address = program.address_of(params.get("name", ""))
+            return 200, "\n".join(_page(program.xrefs_to(address), params)) if address else "No references found to function"
+        if endpoint == "segments":
+            return 200, "\n".join(_page(program.segments, params))
+        if endpoint == "imports":
+            return 200, "\n".join(_page(["printf -> EXTERNAL:00000001", "malloc -> EXTERNAL:00000002"], params))
+        return 404, f"Unknown endpoint: {endpoint}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, method: str, body: str = "") -> None:
+                parsed = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                if method == "POST" and "application/x-www-form-urlencoded" in self.headers.get("Content-Type", ""):
+                    params.update({key: values[-1] for key, values in parse_qs(body).items()})
+                status, text = server.handle(method, parsed.path.strip("/"), params, body)
+                data = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._respond("POST", self.rfile.read(length).decode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="单独运行模拟 Ghidra 插件（可供GUI或导出脚本连接）")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--functions", type=int, default=2000)
+    parser.add_argument("--decompile-latency", type=float, default=DEFAULT_LATENCY_MS["decompile"], help="反编译延迟（毫秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    mock = MockGhidraServer(MockProgram(args.functions, seed=args.seed), port=args.port, failure_rate=args.failure_rate, seed=args.seed,
+                            latency_ms={"decompile": args.decompile_latency, "decompile_function": args.decompile_latency}).start()
+    print(f"模拟 Ghidra 插件已启动: {mock.url}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,176 @@
+"""
+模拟 OpenAI 兼容接口（/v1/chat/completions）的本地 HTTP 服务器，用于离线基准测试。
+
+按请求内容的哈希确定性地生成合法的驼峰函数名：单函数请求直接返回函数名，
+包含“### 函数 N”的批量请求返回 {编号: 函数名} 的JSON。可配置响应延迟（固定部分 + 按提示词长度增加的部分）、
+429 比例（带 Retry-After 响应头）以及每分钟请求上限（超过时同样返回 429）。
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler
+
+from mock_ghidra import BenchHTTPServer
+
+VERBS = ["init", "parse", "read", "write", "update", "check", "build", "load", "free", "handle", "copy", "find"]
+NOUNS = ["Buffer", "Config", "Header", "Packet", "String", "Table", "Entry", "Node", "Stream", "Context", "Token", "Record"]
+
+_BATCH_PART_RE = re.compile(r"### 函数 (\d+)\n```c\n(.*?)\n```", re.S)
+
+
+def name_for(code: str) -> str:
+    """同一段代码总是得到同一个函数名"""
+    digest = hashlib.sha1(code.encode("utf-8")).hexdigest()
+    value = int(digest[:8], 16)
+    return f"{VERBS[value % len(VERBS)]}{NOUNS[(value // len(VERBS)) % len(NOUNS)]}{digest[8:12]}"
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    return sum(len(str(message.get("content", ""))) for message in messages) // 3 + 1
+
+
+class MockOpenAIServer:
+    """在后台线程运行的模拟 chat.completions 服务器，base_url 为 url 属性"""
+
+    def __init__(self, latency_ms: float = 300, latency_per_1k_tokens_ms: float = 50, jitter: float = 0.3,
+                 rate_limit_rate: float = 0.0, max_rpm: float = None, retry_after: float = 1.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.latency_per_1k_tokens_ms = latency_per_1k_tokens_ms
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.max_rpm = max_rpm
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self._recent = deque()     # 最近一分钟内被接受的请求时间
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = BenchHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self) -> tuple[bool, float]:
+        """返回 (是否接受本次请求, 本次的延迟抖动系数)"""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            limited = self._rng.random() < self.rate_limit_rate or \
+                (self.max_rpm is not None and len(self._recent) >= self.max_rpm)
+            if limited:
+                self.rate_limited += 1
+            else:
+                self._recent.append(now)
+        return not limited, factor
+
+    def complete(self, request: dict) -> tuple[int, dict, dict]:
+        """返回 (状态码, 响应体, 额外响应头)"""
+        admitted, factor = self._admit()
+        if not admitted:
+            body = {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded", "code": "rate_limit_exceeded"}}
+            return 429, body, {"Retry-After": f"{self.retry_after:g}"}
+        messages = request.get("messages") or []
+        prompt_tokens = estimate_prompt_tokens(messages)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+        delay = (self.latency_ms + self.latency_per_1k_tokens_ms * prompt_tokens / 1000) * factor
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+        prompt = str(messages[-1].get("content", "")) if messages else ""
+        parts = _BATCH_PART_RE.findall(prompt)
+        if parts:
+            content = json.dumps({index: name_for(code) for index, code in parts})
+        else:
+            code = prompt.split("```c\n", 1)[-1].rsplit("\n```", 1)[0]
+            content = name_for(code)
+        completion_tokens = len(content) // 3 + 1
+        body = {
+            "id": f"chatcmpl-mock{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        return 200, body, {}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: dict, headers: dict = None) -> None:
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length)
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"Unknown path: {self.path}"}})
+                    return
+                try:
+                    request = json.loads(raw or b"{}")
+                except ValueError:
+                    self._send(400, {"error": {"message": "Invalid JSON"}})
+                    return
+                self._send(*server.complete(request))
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="单独运行模拟 OpenAI 接口（API地址填写输出的 URL）")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=300, help="响应延迟（毫秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-rpm", type=float, default=None)
+    args = parser.parse_args()
+    mock = MockOpenAIServer(latency_ms=args.latency, rate_limit_rate=args.rate_limit_rate, max_rpm=args.max_rpm, port=args.port).start()
+    print(f"模拟 OpenAI 接口已启动: {mock.url}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()
@@ -0,0 +1,354 @@
+"""
+离线基准测试：启动模拟 Ghidra 插件与模拟 OpenAI 接口，测量 run_rename 与 save_functions 的吞吐量。
+
+每个场景使用一套新的模拟服务器（不同的程序标识，本地缓存互不干扰），结束后输出
+函数/分钟 以及各阶段（枚举、反编译、AI命名、重命名、导出单个函数）的次数、失败数与 p50/p95/p99 延迟。
+阶段延迟在客户端测量，包含排队等待连接与限速的时间。
+
+示例:
+    python run_benchmark.py --functions 500 --scenarios serial,pipeline,async,export
+    python run_benchmark.py --ai-latency 800 --rate-limit-rate 0.05 --json result.json
+"""
+import argparse
+import contextlib
+import functools
+import importlib
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+UI_DIR = os.path.join(ROOT_DIR, "UI")
+SHARED_DIR = os.path.join(ROOT_DIR, "脚本")
+for path in (BENCH_DIR, SHARED_DIR, UI_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from mock_ghidra import MockGhidraServer, MockProgram
+from mock_openai import MockOpenAIServer
+
+SCENARIOS = ["serial", "pipeline", "async", "export"]
+STAGES = ["enumerate", "decompile", "ai", "rename", "export_function", "ghidra_other"]
+PERCENTILES = (50, 95, 99)
+
+# 各插件接口归属的阶段
+ENDPOINT_STAGES = {
+    "methods": "enumerate",
+    "searchFunctions": "enumerate",
+    "list_functions": "enumerate",
+    "decompile": "decompile",
+    "decompile_function": "decompile",
+    "renameFunction": "rename",
+    "rename_function_by_address": "rename",
+}
+# 默认只对逐个函数的请求注入失败，枚举与程序标识请求不受影响
+FAILURE_ENDPOINTS = ["decompile", "decompile_function", "renameFunction", "rename_function_by_address"]
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(p / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+class StageRecorder:
+    """线程安全地记录各阶段每次调用的耗时与是否失败"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.failures = {}
+
+    def record(self, stage: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+            if failed:
+                self.failures[stage] = self.failures.get(stage, 0) + 1
+
+    def summary(self) -> dict:
+        result = {}
+        with self._lock:
+            for stage in STAGES:
+                values = sorted(self.durations.get(stage, []))
+                if not values:
+                    continue
+                stats = {"count": len(values), "failures": self.failures.get(stage, 0),
+                         "mean_ms": sum(values) / len(values) * 1000}
+                for p in PERCENTILES:
+                    stats[f"p{p}_ms"] = percentile(values, p) * 1000
+                result[stage] = stats
+        return result
+
+
+recorder = StageRecorder()
+
+
+def _stage_for(endpoint: str) -> str:
+    return ENDPOINT_STAGES.get(endpoint.strip("/"), "ghidra_other")
+
+
+def _is_error(result) -> bool:
+    from ghidra_client import is_error_response, is_request_error
+    if isinstance(result, list):
+        return is_error_response(result)
+    return isinstance(result, str) and is_request_error(result)
+
+
+def _timed(method):
+    @functools.wraps(method)
+    def wrapper(self, endpoint, *args, **kwargs):
+        start = time.perf_counter()
+        result = method(self, endpoint, *args, **kwargs)
+        recorder.record(_stage_for(endpoint), time.perf_counter() - start, _is_error(result))
+        return result
+    return wrapper
+
+
+def _timed_async(method):
+    @functools.wraps(method)
+    async def wrapper(self, endpoint, *args, **kwargs):
+        start = time.perf_counter()
+        result = await method(self, endpoint, *args, **kwargs)
+        recorder.record(_stage_for(endpoint), time.perf_counter() - start, _is_error(result))
+        return result
+    return wrapper
+
+
+def _timed_completion(method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            recorder.record("ai", time.perf_counter() - start, True)
+            raise
+        recorder.record("ai", time.perf_counter() - start)
+        return result
+    return wrapper
+
+
+def _timed_completion_async(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await method(*args, **kwargs)
+        except Exception:
+            recorder.record("ai", time.perf_counter() - start, True)
+            raise
+        recorder.record("ai", time.perf_counter() - start)
+        return result
+    return wrapper
+
+
+def instrument() -> None:
+    """给 Ghidra 客户端与 OpenAI 客户端的请求方法加上计时"""
+    import ghidra_client
+    from openai.resources.chat.completions import Completions, AsyncCompletions
+
+    ghidra_client.GhidraClient.get = _timed(ghidra_client.GhidraClient.get)
+    ghidra_client.GhidraClient.post = _timed(ghidra_client.GhidraClient.post)
+    ghidra_client.AsyncGhidraClient.get = _timed_async(ghidra_client.AsyncGhidraClient.get)
+    ghidra_client.AsyncGhidraClient.post = _timed_async(ghidra_client.AsyncGhidraClient.post)
+    Completions.create = _timed_completion(Completions.create)
+    AsyncCompletions.create = _timed_completion_async(AsyncCompletions.create)
+
+
+def start_servers(args, seed: int) -> tuple[MockGhidraServer, MockOpenAIServer]:
+    program = MockProgram(functions=args.functions, named_ratio=args.named_ratio, seed=seed)
+    ghidra = MockGhidraServer(
+        program,
+        latency_ms={"decompile": args.decompile_latency, "decompile_function": args.decompile_latency,
+                    "renameFunction": args.rename_latency, "rename_function_by_address": args.rename_latency},
+        other_latency_ms=args.other_latency,
+        failure_rate=args.ghidra_failure_rate,
+        failure_endpoints=None if args.fail_all_endpoints else FAILURE_ENDPOINTS,
+        seed=seed,
+    ).start()
+    ai = MockOpenAIServer(
+        latency_ms=args.ai_latency,
+        rate_limit_rate=args.rate_limit_rate,
+        max_rpm=args.max_rpm,
+        retry_after=args.retry_after,
+        seed=seed,
+    ).start()
+    return ghidra, ai
+
+
+def run_rename_scenario(name: str, args, ghidra: MockGhidraServer, ai: MockOpenAIServer, logs: list) -> int:
+    """返回处理完成的函数数量"""
+    import ghidra_client
+    import ai_rename
+
+    ghidra_client.configure(base_url=ghidra.url)
+    ai_rename.ghidra_server_url = ghidra.url
+    progress = [0, 0]
+
+    def on_progress(done: int, total: int):
+        progress[0], progress[1] = done, total
+
+    def on_log(text: str, level: str = "info"):
+        logs.append(f"[{level}] {text}")
+        if args.verbose:
+            print(f"    {text}")
+
+    ai_rename.run_rename(
+        api_key="mock", api_base=ai.url, model_name="mock-model",
+        function_pattern="FUN_", batch_size=args.batch_size, delay_seconds=0,
+        on_log=on_log, on_progress=on_progress,
+        pipeline=name == "pipeline", decompile_workers=args.decompile_workers, ai_workers=args.ai_workers,
+        use_async=name == "async", concurrency=args.concurrency,
+        use_decompile_cache=args.cache, dedup_names=args.cache, ai_batch_size=args.ai_batch_size if name == "pipeline" else 1,
+        requests_per_minute=args.rpm, max_requests_per_minute=args.rpm,
+    )
+    return progress[0]
+
+
+def run_export_scenario(args, ghidra: MockGhidraServer, logs: list) -> int:
+    """在临时目录中运行导出脚本的 main()，返回处理的函数数量"""
+    output_root = tempfile.mkdtemp(prefix="bench_export_")
+    processed = [0]
+    count_lock = threading.Lock()
+    saved_argv, saved_cwd = sys.argv, os.getcwd()
+    sys.argv = ["ai_再运行文件保存.py", ghidra.url, str(args.export_workers), args.export_mode, str(args.batch_size)]
+    os.chdir(output_root)
+    try:
+        sys.modules.pop("ai_再运行文件保存", None)
+        exporter = importlib.import_module("ai_再运行文件保存")
+        process_single_function = exporter.process_single_function
+
+        def timed_process(func_name: str) -> None:
+            start = time.perf_counter()
+            process_single_function(func_name)
+            recorder.record("export_function", time.perf_counter() - start)
+            with count_lock:
+                processed[0] += 1
+
+        exporter.process_single_function = timed_process
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            exporter.main()
+        logs.extend(output.getvalue().splitlines())
+        if args.verbose:
+            print(output.getvalue())
+    finally:
+        os.chdir(saved_cwd)
+        sys.argv = saved_argv
+        shutil.rmtree(output_root, ignore_errors=True)
+    return processed[0]
+
+
+def run_scenario(name: str, args, seed: int) -> dict:
+    global recorder
+    recorder = StageRecorder()
+    ghidra, ai = start_servers(args, seed)
+    logs = []
+    start = time.perf_counter()
+    try:
+        if name == "export":
+            functions = run_export_scenario(args, ghidra, logs)
+        else:
+            functions = run_rename_scenario(name, args, ghidra, ai, logs)
+    finally:
+        elapsed = time.perf_counter() - start
+        ghidra.stop()
+        ai.stop()
+    return {
+        "scenario": name,
+        "functions": functions,
+        "seconds": elapsed,
+        "functions_per_minute": functions / elapsed * 60 if elapsed > 0 else 0.0,
+        "renamed_in_ghidra": ghidra.program.renames,
+        "ghidra_requests": dict(ghidra.requests),
+        "ai_requests": ai.requests,
+        "ai_rate_limited": ai.rate_limited,
+        "stages": recorder.summary(),
+        "warnings": sum(1 for line in logs if line.startswith("[warn]") or line.startswith("[error]")),
+    }
+
+
+def print_result(result: dict) -> None:
+    print(f"\n场景 {result['scenario']}: {result['functions']} 个函数，用时 {result['seconds']:.1f} 秒，"
+          f"{result['functions_per_minute']:.1f} 函数/分钟")
+    print(f"  Ghidra 重命名 {result['renamed_in_ghidra']} 次，AI 请求 {result['ai_requests']} 次（429 {result['ai_rate_limited']} 次），"
+          f"警告/错误日志 {result['warnings']} 条")
+    print(f"  {'阶段':<16}{'次数':>8}{'失败':>8}{'平均ms':>10}" + "".join(f"{f'p{p}ms':>10}" for p in PERCENTILES))
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<16}{stats['count']:>8}{stats['failures']:>8}{stats['mean_ms']:>10.1f}"
+              + "".join(f"{stats[f'p{p}_ms']:>10.1f}" for p in PERCENTILES))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="使用模拟 Ghidra 与模拟 OpenAI 接口离线测量重命名与导出的吞吐量")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"逗号分隔的场景: {', '.join(SCENARIOS)}")
+    parser.add_argument("--functions", type=int, default=500, help="模拟程序中的函数数量")
+    parser.add_argument("--named-ratio", type=float, default=0.1, help="已命名（不需处理）的函数比例")
+    parser.add_argument("--seed", type=int, default=1)
+    # 模拟 Ghidra
+    parser.add_argument("--decompile-latency", type=float, default=40, help="反编译延迟（毫秒）")
+    parser.add_argument("--rename-latency", type=float, default=5, help="重命名延迟（毫秒）")
+    parser.add_argument("--other-latency", type=float, default=2, help="其他插件接口的延迟（毫秒）")
+    parser.add_argument("--ghidra-failure-rate", type=float, default=0.0, help="插件请求返回500的比例")
+    parser.add_argument("--fail-all-endpoints", action="store_true", help="对所有插件接口注入失败（默认只对反编译与重命名）")
+    # 模拟 OpenAI
+    parser.add_argument("--ai-latency", type=float, default=200, help="AI 响应延迟（毫秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="AI 请求返回429的比例")
+    parser.add_argument("--max-rpm", type=float, default=None, help="模拟接口的每分钟请求上限，超过时返回429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="429 响应的 Retry-After（秒）")
+    # 被测配置
+    parser.add_argument("--rpm", type=float, default=6000, help="自适应限速器的初始/最大 请求/分钟")
+    parser.add_argument("--batch-size", type=int, default=100, help="枚举分页大小")
+    parser.add_argument("--decompile-workers", type=int, default=4)
+    parser.add_argument("--ai-workers", type=int, default=8)
+    parser.add_argument("--ai-batch-size", type=int, default=1, help="流水线场景中每次AI请求的函数数")
+    parser.add_argument("--concurrency", type=int, default=32, help="异步场景的在途函数数")
+    parser.add_argument("--export-workers", type=int, default=10)
+    parser.add_argument("--export-mode", default="files", choices=["files", "pack"])
+    parser.add_argument("--cache", action="store_true", help="启用反编译缓存与命名去重（默认关闭，测量冷启动）")
+    parser.add_argument("--json", help="把结果另存为 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="输出被测代码的日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"未知的场景: {', '.join(unknown)}")
+
+    # 本地缓存写入临时目录，不影响（也不复用）真实的缓存；必须在导入被测模块之前设置
+    cache_root = tempfile.mkdtemp(prefix="bench_cache_")
+    os.environ["LOCALAPPDATA"] = cache_root
+    # 被测模块在导入时读取 sys.argv[1] 作为服务器地址
+    saved_argv, sys.argv = sys.argv, sys.argv[:1]
+    try:
+        instrument()
+        results = []
+        for i, name in enumerate(scenarios):
+            print(f"运行场景 {name} ...", flush=True)
+            result = run_scenario(name, args, args.seed + i)
+            print_result(result)
+            results.append(result)
+    finally:
+        sys.argv = saved_argv
+        shutil.rmtree(cache_root, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,23 @@
-import random
 import sys
-import requests
 import os
 import time
 from openai import OpenAI
 from typing import Optional
 from mcp.server.fastmcp import FastMCP
 from openai.types.chat import ChatCompletionSystemMessageParam, ChatCompletionUserMessageParam
+
+import ghidra_client
+from ghidra_client import safe_get, safe_post
+from name_registry import NameRegistry
+from function_stream import FunctionStream
+
+# 流水线与重命名的共享实现位于仓库的 UI/ 目录（ai_rename.py），与GUI使用同一份代码
+UI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "UI")
+if os.path.isdir(UI_DIR) and UI_DIR not in sys.path:
+    sys.path.insert(0, UI_DIR)
+
+from ai_rename import process_functions_pipelined, _apply_rename
+from log_buffer import leveled_log
 try:
     from dotenv import load_dotenv
     has_dotenv = True
@@ -18,43 +29,14 @@ except ImportError:
 # Ghidra服务器配置
 DEFAULT_GHIDRA_SERVER = "http://127.0.0.1:8080/"
 ghidra_server_url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_GHIDRA_SERVER
+ghidra_client.configure(base_url=ghidra_server_url)
+
+# 共享实现的日志回调带级别参数（log(text, level)），print 只输出文本
+emit_log = leveled_log(print)
 
 # 获取脚本所在目录
 script_dir = os.path.dirname(os.path.abspath(__file__))
 
-def safe_get(endpoint: str, params: dict = None) -> list:
-    """
-    Perform a GET request with optional query parameters.
-    """
-    if params is None:
-        params = {}
-
-    url = f"{ghidra_server_url}/{endpoint}"
-
-    try:
-        response = requests.get(url, params=params, timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.splitlines()
-        else:
-            return [f"Error {response.status_code}: {response.text.strip()}"]
-    except Exception as e:
-        return [f"Request failed: {str(e)}"]
-
-def safe_post(endpoint: str, data: dict | str) -> str:
-    try:
-        if isinstance(data, dict):
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data, timeout=5)
-        else:
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data.encode("utf-8"), timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.strip()
-        else:
-            return f"Error {response.status_code}: {response.text.strip()}"
-    except Exception as e:
-        return f"Request failed: {str(e)}"
-
 # 初始化MCP
 mcp = FastMCP("ghidra-mcp")
 
@@ -93,17 +75,8 @@ def print_progress(current: int, total: int, bar_len: int = 40) -> None:
 
 def fetch_all_functions(pattern: str, batch_size: int) -> list:
     """分页获取所有匹配的函数名列表以便统计总量"""
-    all_funcs = []
-    offset = 0
-    while True:
-        batch = search_functions_by_name(pattern, offset=offset, limit=batch_size)
-        if not batch or not isinstance(batch, list) or len(batch) == 0:
-            break
-        all_funcs.extend(batch)
-        offset += batch_size
-        # 略微休眠避免请求过快
-        time.sleep(0.1)
-    return all_funcs
+    return list(FunctionStream(pattern, batch_size))
+
 
 def analyze_function(decompiled_code: str, client, model_name: str) -> Optional[str]:
     """使用AI模型分析反编译代码并生成合适的函数名"""
@@ -193,16 +166,8 @@ def process_functions(config: dict, client, model_name: str, functions: list):
                 else:
                     consecutive_failures = 0 # AI调用成功，重置计数器
 
-                    # 执行重命名
-                    #使用search_functions_by_name先检查此函数名字是否已经存在 如果存在则加上后缀
-                    if search_functions_by_name(new_name, limit=1):
-                        new_name += "_" + str(random.randint(1000, 9999))
-
-                    result = rename_function(clean_func_name, new_name)
-                    if "Error" not in result:
-                        print(f"重命名成功: {func_name} -> {new_name}")
-                    else:
-                        print(f"重命名失败 {func_name}: {result}")
+                    # 执行重命名（名称已存在时加上后缀）
+                    _apply_rename(config, func_name, clean_func_name, new_name, emit_log)
 
             except Exception as e:
                 print(f"处理函数 {func_name} 时出错: {str(e)}")
@@ -244,12 +209,19 @@ def main():
         'function_pattern': "FUN_",  # 要搜索的函数名模式
         'batch_size': 50,           # 每批处理的函数数量
         'delay': 1.0,              # 处理每个函数之间的延迟时间（秒）
+        'pipeline': False,          # 是否启用流水线模式（反编译/AI/重命名分阶段并发）
+        'decompile_workers': 4,     # 流水线模式：反编译线程数
+        'ai_workers': 4,            # 流水线模式：AI命名线程数
+        'rename_workers': 1,        # 流水线模式：重命名线程数
+        'queue_size': 64,           # 流水线模式：阶段间队列容量
     }
     print("开始批量处理函数重命名...")
     print(f"配置信息:")
     print(f"- 函数名模式: {config['function_pattern']}")
     print(f"- 批处理大小: {config['batch_size']}")
     print(f"- 处理延迟: {config['delay']}秒")
+    if config['pipeline']:
+        print(f"- 流水线模式: 反编译 {config['decompile_workers']} / AI {config['ai_workers']} / 重命名 {config['rename_workers']} 线程")
     print("-" * 50)
     # 预取所有函数以统计总数并显示进度
     functions = fetch_all_functions(config['function_pattern'], config['batch_size'])
@@ -259,9 +231,19 @@ def main():
         print("无可处理函数，退出。")
         return
 
+    # 一次性读取全部函数名，重命名前在本地检查名称冲突
+    config['name_registry'] = NameRegistry.load()
+    if config['name_registry'] is None:
+        print("警告: 无法读取函数名列表，将逐个搜索检查名称冲突")
+
     # 初始化进度条
     print_progress(0, total)
-    process_functions(config, client, model_name, functions)
+    if config['pipeline']:
+        # 连接池大小与访问 Ghidra 的并发线程数保持一致
+        ghidra_client.configure(pool_size=config['decompile_workers'] + config['rename_workers'] + 1)
+        process_functions_pipelined(config, client, model_name, functions)
+    else:
+        process_functions(config, client, model_name, functions)
     print("\n处理完成")
 
 if __name__ == "__main__":
@@ -1,13 +1,36 @@
 import sys
-import requests
 import os
+import time
 import datetime
-import concurrent.futures
+import queue
+import threading
 from threading import Lock
 
+import ghidra_client
+from ghidra_client import safe_get, safe_post, split_function_entry, is_error_response
+from decompile_cache import DecompileCache, decompile_with_cache, sync_function_names
+from function_pack import PackWriter
+from export_manifest import ExportManifest, find_previous_manifest, content_hash, NEW, RENAMED, SAME_NAME
+import run_metrics
+
 # Ghidra服务器配置
+# 可用逗号分隔多个地址：第一个为主实例，其余为打开同一程序副本的 Ghidra 实例，反编译请求分给各实例
 DEFAULT_GHIDRA_SERVER = "http://127.0.0.1:8080/"
-ghidra_server_url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_GHIDRA_SERVER
+# --cache: 复用本地反编译缓存（见 decompile_cache），只有通过本工具重命名、修改签名的函数会重新反编译，
+# 在 Ghidra 界面中修改的类型、变量名与注释不会反映到导出结果中，因此默认每次都重新反编译
+USE_DECOMPILE_CACHE = "--cache" in sys.argv[1:]
+ARGS = [arg for arg in sys.argv[1:] if arg != "--cache"]
+ghidra_servers = ghidra_client.parse_server_list(ARGS[0] if len(ARGS) > 0 else "") or [DEFAULT_GHIDRA_SERVER]
+ghidra_server_url = ghidra_servers[0]
+ghidra_client.configure(base_url=ghidra_server_url, replica_urls=ghidra_servers[1:])
+# 输出方式: files 为每个函数一个 .txt 文件，pack 为单个打包文件加索引（见 function_pack），
+# incremental 与 files 相同，但内容与上次导出相同的函数直接链接上次的文件
+OUTPUT_MODES = ("files", "pack", "incremental")
+OUTPUT_MODE = ARGS[2] if len(ARGS) > 2 else "files"
+if OUTPUT_MODE not in OUTPUT_MODES:
+    print(f"未知的输出方式: {OUTPUT_MODE}")
+    print(f"用法: python {os.path.basename(__file__)} [Ghidra地址] [线程数] [{'|'.join(OUTPUT_MODES)}] [每页函数数] [--cache]")
+    sys.exit(2)
 
 # 创建基于时间的输出目录
 OUTPUT_DIR = os.path.join(os.getcwd(), f"项目_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}")
@@ -18,44 +41,25 @@ file_lock = Lock()
 # 用于同步打印的锁
 print_lock = Lock()
 
+# 反编译缓存（在 main 中初始化），函数名 -> 入口地址 的映射用于构造缓存键
+decompile_cache = None
+program_id = None
+function_addresses = {}
+# 打包模式下的写入器（在 main 中创建）
+pack_writer = None
+# 本次导出的清单，以及增量模式下同一程序上次导出的清单与各函数相对上次的状态
+manifest = None
+previous_manifest = None
+export_status = {}
+# 写入/链接的函数数量
+stats_lock = Lock()
+export_stats = {"written": 0, "linked": 0}
+
 def safe_print(*args, **kwargs):
     """线程安全的打印函数"""
     with print_lock:
         print(*args, **kwargs)
 
-def safe_get(endpoint: str, params: dict = None) -> list:
-    """
-    Perform a GET request with optional query parameters.
-    """
-    if params is None:
-        params = {}
-
-    url = f"{ghidra_server_url}/{endpoint}"
-
-    try:
-        response = requests.get(url, params=params, timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.splitlines()
-        else:
-            return [f"Error {response.status_code}: {response.text.strip()}"]
-    except Exception as e:
-        return [f"Request failed: {str(e)}"]
-
-def safe_post(endpoint: str, data: dict | str) -> str:
-    try:
-        if isinstance(data, dict):
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data, timeout=5)
-        else:
-            response = requests.post(f"{ghidra_server_url}/{endpoint}", data=data.encode("utf-8"), timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.strip()
-        else:
-            return f"Error {response.status_code}: {response.text.strip()}"
-    except Exception as e:
-        return f"Request failed: {str(e)}"
-
 def decompile_function(name: str) -> str:
     """
     Decompile a specific function by name and return the decompiled C code.
@@ -68,6 +72,21 @@ def list_methods(offset: int = 0, limit: int = 100) -> list:
     """
     return safe_get("methods", {"offset": offset, "limit": limit})
 
+def load_function_addresses() -> dict:
+    """通过 list_functions 获取 函数名 -> 入口地址 映射，重名函数无法区分，不参与缓存"""
+    addresses = {}
+    duplicated = set()
+    for line in safe_get("list_functions"):
+        name, address = split_function_entry(line)
+        if not address:
+            continue
+        if name in addresses:
+            duplicated.add(name)
+        addresses[name] = address
+    for name in duplicated:
+        del addresses[name]
+    return addresses
+
 def get_unique_filename(directory: str, base_name: str, extension: str = '.txt') -> str:
     """生成唯一的文件名，如果文件已存在则添加序号"""
     with file_lock:
@@ -82,82 +101,256 @@ def get_unique_filename(directory: str, base_name: str, extension: str = '.txt')
         
         return file_name
 
+def count_export(kind: str) -> None:
+    run_metrics.inc("export_functions_total", result=kind)
+    with stats_lock:
+        export_stats[kind] += 1
+
+def link_previous(clean_func_name: str, address: str) -> bool:
+    """内容未变的函数复用上次导出的文件：优先硬链接，无法链接时在清单中引用原文件"""
+    previous_path = previous_manifest.file_path(address)
+    if not previous_path or not os.path.exists(previous_path):
+        return False
+    entry = previous_manifest.get(address)
+    unique_filename = get_unique_filename(OUTPUT_DIR, clean_func_name)
+    try:
+        os.link(previous_path, os.path.join(OUTPUT_DIR, unique_filename))
+        manifest.record(address, clean_func_name, entry["hash"], unique_filename)
+    except OSError:
+        manifest.record(address, clean_func_name, entry["hash"], os.path.abspath(previous_path))
+    count_export("linked")
+    return True
+
 def process_single_function(func_name: str) -> None:
-    """处理单个函数的反编译和保存"""
+    """处理单个函数的反编译和保存，耗时记录在 export_stage_seconds 中"""
     if not func_name or not func_name.strip():
         return
+    with run_metrics.timer("export_stage_seconds", stage="function"):
+        export_function(func_name)
 
+def export_function(func_name: str) -> None:
+    """反编译单个函数并写入文件/打包文件，或链接上次导出的相同内容"""
     # 提取纯函数名（移除@后的地址信息）
     clean_func_name = func_name.split(" @ ")[0] if " @ " in func_name else func_name
+    address = function_addresses.get(clean_func_name)
 
     try:
         # 获取反编译代码
-        decompiled = decompile_function(clean_func_name)
+        # 默认直接向 Ghidra 请求；--cache 时函数本身或其调用的函数被重命名/改签名后缓存才失效
+        with run_metrics.timer("export_stage_seconds", stage="decompile"):
+            decompiled = decompile_with_cache(decompile_cache, program_id, clean_func_name,
+                                              address, decompile_function)
         if not decompiled or "Error" in decompiled:
             safe_print(f"跳过 {func_name}: 反编译失败 - {decompiled if decompiled else '无反编译结果'}")
+            run_metrics.inc("export_functions_total", result="skipped")
+            return
+        digest = content_hash(decompiled)
+
+        # 名称与内容都和上次导出相同
+        if previous_manifest is not None and export_status.get(address) == SAME_NAME \
+                and previous_manifest.get(address)["hash"] == digest and link_previous(clean_func_name, address):
             return
 
         safe_print(f"\n正在处理函数: {func_name}")
 
+        header = (f"// 函数名: {func_name}\n"
+                  f"// 保存时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        if pack_writer is not None:
+            # 交给写入线程顺序写入，重名函数靠地址区分，无需生成唯一文件名
+            pack_writer.add(clean_func_name, address, header + decompiled)
+            if manifest is not None and address:
+                manifest.record(address, clean_func_name, digest)
+            count_export("written")
+            return
+
         # 保存反编译代码到文件，使用唯一文件名
+        start = time.perf_counter()
         unique_filename = get_unique_filename(OUTPUT_DIR, clean_func_name)
         save_path = os.path.join(OUTPUT_DIR, unique_filename)
         try:
             with open(save_path, 'w', encoding='utf-8') as f:
-                f.write(f"// 函数名: {func_name}\n")
-                f.write(f"// 保存时间: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+                f.write(header)
                 f.write(decompiled)
+            run_metrics.observe("export_stage_seconds", time.perf_counter() - start, stage="write")
+            if manifest is not None and address:
+                manifest.record(address, clean_func_name, digest, unique_filename)
+            count_export("written")
             safe_print(f"已保存源码到: {save_path}")
         except Exception as e:
             safe_print(f"保存源码失败: {str(e)}")
+            run_metrics.inc("export_functions_total", result="failed")
 
     except Exception as e:
         safe_print(f"处理函数 {func_name} 时出错: {str(e)}")
+        run_metrics.inc("export_functions_total", result="failed")
+
+def fetch_pages(batch_size: int, out_queue: queue.Queue, workers: int, stop_event: threading.Event) -> None:
+    """按 batch_size 分页读取函数名并放入有界队列，队列满时等待消费；结束时为每个工作线程放入一个结束标记"""
+    offset = 0
+    try:
+        while not stop_event.is_set():
+            functions = list_methods(offset=offset, limit=batch_size)
+            if is_error_response(functions):
+                safe_print(f"获取函数列表失败: {functions[0]}")
+                break
+            if not functions:
+                safe_print("没有更多函数可处理")
+                break
+            safe_print(f"已获取第 {offset + 1} 到 {offset + len(functions)} 个函数...")
+            for func_name in functions:
+                out_queue.put(func_name)
+            if len(functions) < batch_size:
+                safe_print("没有更多函数可处理")
+                break
+            offset += batch_size
+    except Exception as e:
+        safe_print(f"获取函数列表出错: {str(e)}")
+    finally:
+        for _ in range(workers):
+            out_queue.put(None)
+
+def export_worker(in_queue: queue.Queue) -> None:
+    while True:
+        func_name = in_queue.get()
+        if func_name is None:
+            break
+        process_single_function(func_name)
 
 def save_functions(batch_size: int = 50, max_workers: int = 10):
     """使用多线程保存所有函数的反编译代码
-    
+
+    分页读取在单独的线程中提前进行，函数名放入有界队列，
+    各工作线程处理完一个函数立即取下一个，不需要等待整页完成。
+
     Args:
-        batch_size: 每批处理的函数数量
+        batch_size: 每次分页请求的函数数量
         max_workers: 最大线程数
     """
+    func_queue = queue.Queue(maxsize=max(batch_size, max_workers) * 2)
+    stop_event = threading.Event()
+    producer = threading.Thread(target=fetch_pages, args=(batch_size, func_queue, max_workers, stop_event), daemon=True)
+    workers = [threading.Thread(target=export_worker, args=(func_queue,), daemon=True) for _ in range(max_workers)]
+    producer.start()
+    for worker in workers:
+        worker.start()
     try:
-        offset = 0
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            while True:
-                # 获取一批函数
-                functions = list_methods(offset=offset, limit=batch_size)
-                
-                if not functions or len(functions) == 0:
-                    safe_print("没有更多函数可处理")
-                    break
-
-                safe_print(f"正在处理第 {offset + 1} 到 {offset + len(functions)} 个函数...")
-
-                # 提交所有任务到线程池
-                futures = [executor.submit(process_single_function, func_name) for func_name in functions]
-                
-                # 等待所有任务完成
-                concurrent.futures.wait(futures)
-
-                offset += batch_size
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        safe_print("收到中断，停止读取新的函数…")
+        stop_event.set()
+        raise
+    finally:
+        producer.join(timeout=1)
 
+def init_program() -> None:
+    """确定程序标识并读取函数地址，用于反编译缓存与导出清单"""
+    global program_id, function_addresses
+    program_id = ghidra_client.program_fingerprint()
+    if program_id:
+        function_addresses = load_function_addresses()
+
+def init_decompile_cache() -> None:
+    """打开反编译缓存，Ghidra 不可达或缓存无法打开时不使用缓存"""
+    global decompile_cache
+    if not USE_DECOMPILE_CACHE or not program_id:
+        return
+    try:
+        decompile_cache = DecompileCache()
+        changed = sync_function_names(decompile_cache, program_id)
     except Exception as e:
-        safe_print(f"批处理过程出错: {str(e)}")
+        safe_print(f"反编译缓存不可用: {str(e)}")
+        decompile_cache = None
+        return
+    safe_print(f"反编译缓存已启用 (程序标识 {program_id})")
+    if changed:
+        safe_print(f"上次运行后有 {changed} 个函数在 Ghidra 中被重命名，调用它们的函数将重新反编译")
+
+def init_manifest() -> None:
+    """创建本次导出的清单；增量模式下找到上次的导出，并根据函数列表预先判断新增/改名的函数"""
+    global manifest, previous_manifest, export_status
+    if not program_id:
+        safe_print("无法获取程序标识，不生成导出清单")
+        return
+    manifest = ExportManifest(OUTPUT_DIR, program_id, "pack" if OUTPUT_MODE == "pack" else "files")
+    if OUTPUT_MODE != "incremental":
+        return
+    previous_manifest = find_previous_manifest(os.path.dirname(OUTPUT_DIR), program_id, exclude=OUTPUT_DIR)
+    if previous_manifest is None or previous_manifest.mode != "files":
+        previous_manifest = None
+        safe_print("未找到上次的文件导出，将完整导出")
+        return
+    export_status = previous_manifest.classify(function_addresses)
+    counts = {state: 0 for state in (NEW, RENAMED, SAME_NAME)}
+    for state in export_status.values():
+        counts[state] += 1
+    removed = len(set(previous_manifest.functions) - set(export_status))
+    safe_print(f"增量导出: 对比 {previous_manifest.directory}")
+    safe_print(f"新增 {counts[NEW]} / 改名 {counts[RENAMED]} / 名称未变 {counts[SAME_NAME]}（比较内容后决定是否重写）/ 已删除 {removed}")
+
+def open_pack_writer() -> None:
+    """打包模式：创建写入器，并读取函数地址用于按地址索引"""
+    global pack_writer, function_addresses
+    if not function_addresses:
+        function_addresses = load_function_addresses()
+    pack_writer = PackWriter(os.path.join(OUTPUT_DIR, "functions.pack"))
+    safe_print(f"打包输出: {pack_writer.path}")
 
 def main():
     # 获取命令行参数
     max_workers = 5  # 默认线程数
-    if len(sys.argv) > 2:
+    if len(ARGS) > 1:
         try:
-            max_workers = int(sys.argv[2])
+            max_workers = int(ARGS[1])
         except ValueError:
             safe_print("线程数必须是整数，使用默认值5")
+    batch_size = 50  # 默认每页函数数量
+    if len(ARGS) > 3:
+        try:
+            batch_size = max(1, int(ARGS[3]))
+        except ValueError:
+            safe_print("分页大小必须是整数，使用默认值50")
+
+    # 连接池大小与线程数保持一致，另留一个连接给分页请求
+    ghidra_client.configure(pool_size=max_workers + 1)
 
     safe_print(f"开始保存所有函数的反编译代码")
     safe_print(f"源码将保存至目录: {OUTPUT_DIR}")
-    safe_print(f"使用 {max_workers} 个线程并行处理")
-    save_functions(max_workers=max_workers)
+    safe_print(f"使用 {max_workers} 个线程并行处理，每页读取 {batch_size} 个函数")
+    if len(ghidra_servers) > 1:
+        for url in ghidra_client.verify_replicas():
+            safe_print(f"Ghidra 实例 {url} 无法访问或打开的程序与主实例不一致，已忽略")
+        client = ghidra_client.get_client()
+        safe_print(f"Ghidra 实例: {', '.join(replica.base_url for replica in client.instances())}（第一个为主实例）")
+    init_program()
+    init_decompile_cache()
+    init_manifest()
+    if OUTPUT_MODE == "pack":
+        open_pack_writer()
+    save_functions(batch_size=batch_size, max_workers=max_workers)
+    if pack_writer is not None:
+        try:
+            pack_writer.close()
+            safe_print(f"已打包 {len(pack_writer.entries)} 个函数，索引: {pack_writer.path}.idx")
+        except OSError as e:
+            safe_print(f"写入打包文件失败: {str(e)}")
+    if manifest is not None:
+        try:
+            manifest.save()
+        except OSError as e:
+            safe_print(f"保存导出清单失败: {str(e)}")
+    safe_print(f"写入 {export_stats['written']} 个函数，复用上次导出 {export_stats['linked']} 个")
+    stages = run_metrics.stage_totals("export_stage_seconds")
+    if stages:
+        safe_print(f"阶段耗时: {run_metrics.describe_stages(stages)}")
+    try:
+        run_metrics.REGISTRY.dump(os.path.join(OUTPUT_DIR, "metrics.json"))
+        safe_print(f"运行指标已保存到: {os.path.join(OUTPUT_DIR, 'metrics.json')}（Prometheus 格式见 metrics.prom）")
+    except OSError as e:
+        safe_print(f"保存运行指标失败: {str(e)}")
+    if decompile_cache is not None:
+        safe_print(f"反编译缓存: 命中 {decompile_cache.hits} / 未命中 {decompile_cache.misses}")
+        decompile_cache.close()
     safe_print("处理完成")
 
 if __name__ == "__main__":
@@ -3,18 +3,42 @@
 # dependencies = [
 #     "requests>=2,<3",
 #     "mcp>=1.2.0,<2",
+#     "httpx",
 # ]
 # ///
 
 import sys
-import requests
+import re
 import argparse
+import asyncio
 import logging
-from urllib.parse import urljoin
+import threading
 
 from mcp.server.fastmcp import FastMCP
 
+import ghidra_client
+from ghidra_client import AsyncGhidraClient, is_error_response, is_request_error
+from decompile_cache import DecompileCache
+from response_cache import ResponseCache, NAMES, CODE, DATA, STATIC, DEFAULT_TTL, DEFAULT_MAX_ENTRIES
+import list_query
+from list_query import LIST_KINDS, SEARCH_KIND
+import run_metrics
+
 DEFAULT_GHIDRA_SERVER = "http://127.0.0.1:8080/"
+# 批量工具同时访问 Ghidra 的最大请求数
+BULK_WORKERS = 8
+# 与 Ghidra 插件之间的最大连接数
+MAX_CONNECTIONS = 32
+# 各端点同时进行的最大请求数，未列出的端点不限制（仍受 MAX_CONNECTIONS 约束）。
+# 慢请求各自排队，不会占满连接而阻塞 get_current_address 等轻量请求
+ENDPOINT_CONCURRENCY = {
+    "decompile": 4,
+    "decompile_function": 4,
+    "disassemble_function": 4,
+    "methods": 2,
+    "list_functions": 2,
+    "strings": 2,
+}
 
 logger = logging.getLogger(__name__)
 
@@ -22,210 +46,276 @@ mcp = FastMCP("ghidra-mcp")
 
 # Initialize ghidra_server_url with default value
 ghidra_server_url = DEFAULT_GHIDRA_SERVER
-
-def safe_get(endpoint: str, params: dict = None) -> list:
-    """
-    执行带有可选查询参数的GET请求。
-    """
-    if params is None:
-        params = {}
-
-    url = urljoin(ghidra_server_url, endpoint)
-
+# 其余打开同一程序副本的 Ghidra 实例，反编译请求分给它们（见 --ghidra-server）
+replica_urls = []
+# 各端点超时（秒）的命令行覆盖值，默认值见 ghidra_client.ENDPOINT_TIMEOUTS
+endpoint_timeouts = {}
+
+# 只读工具的响应缓存，写操作后按分组失效（参数见 main 中的 --cache-ttl/--cache-size）
+# 当前地址/当前函数随 Ghidra 界面变化，不缓存
+response_cache = ResponseCache()
+
+# GUI 与导出脚本共用的反编译持久化缓存，在其中记录经由本桥接的重命名/改类型，
+# 使它们下次运行时重新反编译受影响的函数（首次写操作时打开）
+_decompile_cache = None
+_decompile_cache_lock = threading.Lock()
+
+# 异步客户端与各端点的信号量在事件循环中首次使用时创建
+_async_client = None
+_endpoint_slots = {}
+
+def _client() -> AsyncGhidraClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGhidraClient(ghidra_server_url, max_connections=MAX_CONNECTIONS, timeouts=endpoint_timeouts,
+                                          replica_urls=replica_urls)
+    return _async_client
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+_NO_LIMIT = _NoLimit()
+
+def _slot(endpoint: str):
+    limit = ENDPOINT_CONCURRENCY.get(endpoint)
+    if not limit:
+        return _NO_LIMIT
+    if endpoint not in _endpoint_slots:
+        _endpoint_slots[endpoint] = asyncio.Semaphore(limit)
+    return _endpoint_slots[endpoint]
+
+async def ghidra_get(endpoint: str, params: dict = None) -> list:
+    async with _slot(endpoint):
+        return await _client().get(endpoint, params)
+
+async def ghidra_post(endpoint: str, data: dict | str) -> str:
+    async with _slot(endpoint):
+        return await _client().post(endpoint, data)
+
+async def cached_get(endpoint: str, params: dict = None, group: str = STATIC) -> list:
+    key = (endpoint, tuple(sorted((params or {}).items())))
+    return list(await response_cache.fetch_async(key, lambda: ghidra_get(endpoint, params), group))
+
+async def cached_post(endpoint: str, data: str, group: str = CODE) -> str:
+    return await response_cache.fetch_async((endpoint, data), lambda: ghidra_post(endpoint, data), group)
+
+async def invalidating_post(endpoint: str, data: dict, *groups: str) -> str:
+    """执行写操作，成功与否都使相关分组失效（失败的请求也可能已部分生效）"""
     try:
-        response = requests.get(url, params=params, timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.splitlines()
-        else:
-            return [f"Error {response.status_code}: {response.text.strip()}"]
+        return await ghidra_post(endpoint, data)
+    finally:
+        response_cache.invalidate(*groups)
+
+def _record_decompile_change(address: str = None, name: str = None, new_name: str = None,
+                             affects_callers: bool = True) -> None:
+    global _decompile_cache
+    program_id = ghidra_client.program_fingerprint()
+    if not program_id:
+        return
+    with _decompile_cache_lock:
+        if _decompile_cache is None:
+            _decompile_cache = DecompileCache()
+    _decompile_cache.invalidate(program_id, address, name=name, new_name=new_name, affects_callers=affects_callers)
+
+async def record_decompile_change(**change) -> None:
+    """在线程池中更新反编译持久化缓存，失败时只记录警告"""
+    try:
+        await asyncio.to_thread(_record_decompile_change, **change)
     except Exception as e:
-        return [f"Request failed: {str(e)}"]
+        logger.warning(f"Failed to record the change in the decompile cache: {e}")
 
-def safe_post(endpoint: str, data: dict | str) -> str:
+async def recording_post(endpoint: str, data: dict, *groups: str, address: str = None, name: str = None,
+                         new_name: str = None, affects_callers: bool = True) -> str:
+    """
+    invalidating_post，并在反编译持久化缓存中记录被修改的函数（地址或修改前的名称）。
+    affects_callers=True 表示函数名或签名变了，调用它的函数的缓存也要失效；new_name 仅在重命名成功时记录。
+    """
+    result = None
     try:
-        url = urljoin(ghidra_server_url, endpoint)
-        if isinstance(data, dict):
-            response = requests.post(url, data=data, timeout=5)
-        else:
-            response = requests.post(url, data=data.encode("utf-8"), timeout=5)
-        response.encoding = 'utf-8'
-        if response.ok:
-            return response.text.strip()
-        else:
-            return f"Error {response.status_code}: {response.text.strip()}"
-    except Exception as e:
-        return f"Request failed: {str(e)}"
+        result = await invalidating_post(endpoint, data, *groups)
+        return result
+    finally:
+        renamed = result is not None and ghidra_client._write_succeeded(endpoint, result)
+        await record_decompile_change(address=address, name=name, new_name=new_name if renamed else None,
+                                      affects_callers=affects_callers)
 
 @mcp.tool()
-def list_methods(offset: int = 0, limit: int = 100) -> list:
+async def list_methods(offset: int = 0, limit: int = 100) -> list:
     """
     列出程序中的所有函数名称，支持分页。
     """
-    return safe_get("methods", {"offset": offset, "limit": limit})
+    return await cached_get("methods", {"offset": offset, "limit": limit}, NAMES)
 
 @mcp.tool()
-def list_classes(offset: int = 0, limit: int = 100) -> list:
+async def list_classes(offset: int = 0, limit: int = 100) -> list:
     """
     列出程序中的所有命名空间/类名称，支持分页。
     """
-    return safe_get("classes", {"offset": offset, "limit": limit})
+    return await cached_get("classes", {"offset": offset, "limit": limit}, STATIC)
 
 @mcp.tool()
-def decompile_function(name: str) -> str:
+async def decompile_function(name: str) -> str:
     """
     通过名称反编译特定函数并返回反编译后的C代码。
     """
-    return safe_post("decompile", name)
+    return await cached_post("decompile", name, CODE)
 
 @mcp.tool()
-def rename_function(old_name: str, new_name: str) -> str:
+async def rename_function(old_name: str, new_name: str) -> str:
     """
     通过当前名称将函数重命名为用户定义的新名称。
     """
-    return safe_post("renameFunction", {"oldName": old_name, "newName": new_name})
+    return await recording_post("renameFunction", {"oldName": old_name, "newName": new_name}, NAMES, CODE,
+                                name=old_name, new_name=new_name)
 
 @mcp.tool()
-def rename_data(address: str, new_name: str) -> str:
+async def rename_data(address: str, new_name: str) -> str:
     """
     重命名指定地址的数据标签。
     """
-    return safe_post("renameData", {"address": address, "newName": new_name})
+    return await invalidating_post("renameData", {"address": address, "newName": new_name}, DATA, NAMES, CODE)
 
 @mcp.tool()
-def list_segments(offset: int = 0, limit: int = 100) -> list:
+async def list_segments(offset: int = 0, limit: int = 100) -> list:
     """
     列出程序中的所有内存段，支持分页。
     """
-    return safe_get("segments", {"offset": offset, "limit": limit})
+    return await cached_get("segments", {"offset": offset, "limit": limit}, STATIC)
 
 @mcp.tool()
-def list_imports(offset: int = 0, limit: int = 100) -> list:
+async def list_imports(offset: int = 0, limit: int = 100) -> list:
     """
     列出程序中的导入符号，支持分页。
     """
-    return safe_get("imports", {"offset": offset, "limit": limit})
+    return await cached_get("imports", {"offset": offset, "limit": limit}, STATIC)
 
 @mcp.tool()
-def list_exports(offset: int = 0, limit: int = 100) -> list:
+async def list_exports(offset: int = 0, limit: int = 100) -> list:
     """
     列出导出的函数/符号，支持分页。
     """
-    return safe_get("exports", {"offset": offset, "limit": limit})
+    return await cached_get("exports", {"offset": offset, "limit": limit}, STATIC)
 
 @mcp.tool()
-def list_namespaces(offset: int = 0, limit: int = 100) -> list:
+async def list_namespaces(offset: int = 0, limit: int = 100) -> list:
     """
     列出程序中的所有非全局命名空间，支持分页。
     """
-    return safe_get("namespaces", {"offset": offset, "limit": limit})
+    return await cached_get("namespaces", {"offset": offset, "limit": limit}, STATIC)
 
 @mcp.tool()
-def list_data_items(offset: int = 0, limit: int = 100) -> list:
+async def list_data_items(offset: int = 0, limit: int = 100) -> list:
     """
     列出已定义的数据标签及其值，支持分页。
     """
-    return safe_get("data", {"offset": offset, "limit": limit})
+    return await cached_get("data", {"offset": offset, "limit": limit}, DATA)
 
 @mcp.tool()
-def search_functions_by_name(query: str, offset: int = 0, limit: int = 100) -> list:
+async def search_functions_by_name(query: str, offset: int = 0, limit: int = 100) -> list:
     """
     搜索名称包含给定子字符串的函数。
     """
     if not query:
         return ["Error: query string is required"]
-    return safe_get("searchFunctions", {"query": query, "offset": offset, "limit": limit})
+    return await cached_get("searchFunctions", {"query": query, "offset": offset, "limit": limit}, NAMES)
 
 @mcp.tool()
-def rename_variable(function_name: str, old_name: str, new_name: str) -> str:
+async def rename_variable(function_name: str, old_name: str, new_name: str) -> str:
     """
     重命名函数内的局部变量。
     """
-    return safe_post("renameVariable", {
+    return await recording_post("renameVariable", {
         "functionName": function_name,
         "oldName": old_name,
         "newName": new_name
-    })
+    }, CODE, name=function_name, affects_callers=False)
 
 @mcp.tool()
-def get_function_by_address(address: str) -> str:
+async def get_function_by_address(address: str) -> str:
     """
     通过地址获取函数。
     """
-    return "\n".join(safe_get("get_function_by_address", {"address": address}))
+    return "\n".join(await cached_get("get_function_by_address", {"address": address}, NAMES))
 
 @mcp.tool()
-def get_current_address() -> str:
+async def get_current_address() -> str:
     """
     获取用户当前选择的地址。
     """
-    return "\n".join(safe_get("get_current_address"))
+    return "\n".join(await ghidra_get("get_current_address"))
 
 @mcp.tool()
-def get_current_function() -> str:
+async def get_current_function() -> str:
     """
     获取用户当前选择的函数。
     """
-    return "\n".join(safe_get("get_current_function"))
+    return "\n".join(await ghidra_get("get_current_function"))
 
 @mcp.tool()
-def list_functions() -> list:
+async def list_functions() -> list:
     """
-    列出数据库中的所有函数。
+    列出数据库中的所有函数。大型程序请使用 query_list(kind="functions") 过滤并分批获取。
     """
-    return safe_get("list_functions")
+    return await cached_get("list_functions", None, NAMES)
 
 @mcp.tool()
-def decompile_function_by_address(address: str) -> str:
+async def decompile_function_by_address(address: str) -> str:
     """
     反编译给定地址的函数。
     """
-    return "\n".join(safe_get("decompile_function", {"address": address}))
+    return "\n".join(await cached_get("decompile_function", {"address": address}, CODE))
 
 @mcp.tool()
-def disassemble_function(address: str) -> list:
+async def disassemble_function(address: str) -> list:
     """
     获取函数的汇编代码（地址：指令；注释）。
     """
-    return safe_get("disassemble_function", {"address": address})
+    return await cached_get("disassemble_function", {"address": address}, CODE)
 
 @mcp.tool()
-def set_decompiler_comment(address: str, comment: str) -> str:
+async def set_decompiler_comment(address: str, comment: str) -> str:
     """
     在函数伪代码中为给定地址设置注释。
     """
-    return safe_post("set_decompiler_comment", {"address": address, "comment": comment})
+    return await invalidating_post("set_decompiler_comment", {"address": address, "comment": comment}, CODE)
 
 @mcp.tool()
-def set_disassembly_comment(address: str, comment: str) -> str:
+async def set_disassembly_comment(address: str, comment: str) -> str:
     """
     在函数反汇编中为给定地址设置注释。
     """
-    return safe_post("set_disassembly_comment", {"address": address, "comment": comment})
+    return await invalidating_post("set_disassembly_comment", {"address": address, "comment": comment}, CODE)
 
 @mcp.tool()
-def rename_function_by_address(function_address: str, new_name: str) -> str:
+async def rename_function_by_address(function_address: str, new_name: str) -> str:
     """
     通过地址重命名函数。
     """
-    return safe_post("rename_function_by_address", {"function_address": function_address, "new_name": new_name})
+    return await recording_post("rename_function_by_address", {"function_address": function_address, "new_name": new_name}, NAMES, CODE,
+                                address=function_address, new_name=new_name)
 
 @mcp.tool()
-def set_function_prototype(function_address: str, prototype: str) -> str:
+async def set_function_prototype(function_address: str, prototype: str) -> str:
     """
     设置函数的原型。
     """
-    return safe_post("set_function_prototype", {"function_address": function_address, "prototype": prototype})
+    return await recording_post("set_function_prototype", {"function_address": function_address, "prototype": prototype}, NAMES, CODE,
+                                address=function_address)
 
 @mcp.tool()
-def set_local_variable_type(function_address: str, variable_name: str, new_type: str) -> str:
+async def set_local_variable_type(function_address: str, variable_name: str, new_type: str) -> str:
     """
     设置局部变量的类型。
     """
-    return safe_post("set_local_variable_type", {"function_address": function_address, "variable_name": variable_name, "new_type": new_type})
+    return await recording_post("set_local_variable_type", {"function_address": function_address, "variable_name": variable_name, "new_type": new_type}, NAMES, CODE,
+                                address=function_address, affects_callers=False)
 
 @mcp.tool()
-def get_xrefs_to(address: str, offset: int = 0, limit: int = 100) -> list:
+async def get_xrefs_to(address: str, offset: int = 0, limit: int = 100) -> list:
     """
     获取指定地址的所有引用（被引用）。
     
@@ -237,10 +327,10 @@ def get_xrefs_to(address: str, offset: int = 0, limit: int = 100) -> list:
     返回：
         指定地址的引用列表
     """
-    return safe_get("xrefs_to", {"address": address, "offset": offset, "limit": limit})
+    return await cached_get("xrefs_to", {"address": address, "offset": offset, "limit": limit}, NAMES)
 
 @mcp.tool()
-def get_xrefs_from(address: str, offset: int = 0, limit: int = 100) -> list:
+async def get_xrefs_from(address: str, offset: int = 0, limit: int = 100) -> list:
     """
     获取从指定地址出发的所有引用（引用）。
     
@@ -252,10 +342,10 @@ def get_xrefs_from(address: str, offset: int = 0, limit: int = 100) -> list:
     返回：
         从指定地址出发的引用列表
     """
-    return safe_get("xrefs_from", {"address": address, "offset": offset, "limit": limit})
+    return await cached_get("xrefs_from", {"address": address, "offset": offset, "limit": limit}, NAMES)
 
 @mcp.tool()
-def get_function_xrefs(name: str, offset: int = 0, limit: int = 100) -> list:
+async def get_function_xrefs(name: str, offset: int = 0, limit: int = 100) -> list:
     """
     获取指定函数名称的所有引用。
     
@@ -267,10 +357,10 @@ def get_function_xrefs(name: str, offset: int = 0, limit: int = 100) -> list:
     返回：
         指定函数的引用列表
     """
-    return safe_get("function_xrefs", {"name": name, "offset": offset, "limit": limit})
+    return await cached_get("function_xrefs", {"name": name, "offset": offset, "limit": limit}, NAMES)
 
 @mcp.tool()
-def list_strings(offset: int = 0, limit: int = 2000, filter: str = None) -> list:
+async def list_strings(offset: int = 0, limit: int = 2000, filter: str = None) -> list:
     """
     列出程序中所有已定义的字符串及其地址。
     
@@ -285,24 +375,243 @@ def list_strings(offset: int = 0, limit: int = 2000, filter: str = None) -> list
     params = {"offset": offset, "limit": limit}
     if filter:
         params["filter"] = filter
-    return safe_get("strings", params)
+    return await cached_get("strings", params, STATIC)
+
+async def _fan_out(items: list, handler, workers: int = BULK_WORKERS) -> dict:
+    """
+    并发执行 handler(item)（最多 workers 个同时进行），返回 {"results": {item: 结果}, "errors": {item: 错误信息}}。
+    workers=1 时按 items 的顺序逐个执行。
+    """
+    results, errors = {}, {}
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                ok, value = await handler(item)
+            except Exception as e:
+                ok, value = False, str(e)
+        (results if ok else errors)[item] = value
+
+    await asyncio.gather(*(run(item) for item in dict.fromkeys(items)))
+    return {"results": results, "errors": errors}
+
+@mcp.tool()
+async def decompile_many(targets: list[str], by_address: bool = False) -> dict:
+    """
+    一次反编译多个函数，并发请求 Ghidra。
+
+    参数：
+        targets: 函数名列表；by_address=True 时为函数入口地址列表
+        by_address: 是否按地址反编译（默认：False）
+
+    返回：
+        {"results": {目标: C代码}, "errors": {目标: 错误信息}}
+    """
+    async def handle(target: str):
+        if by_address:
+            code = "\n".join(await cached_get("decompile_function", {"address": target}, CODE))
+        else:
+            code = await cached_post("decompile", target, CODE)
+        return not is_request_error(code), code
+    return await _fan_out(targets, handle)
+
+def _rename_order(renames: dict) -> tuple[list, list]:
+    """
+    新名称恰好是另一个待重命名函数的当前名称时（如 {a: b, b: c}），必须先把那个函数改走。
+    返回 (可按此顺序依次执行的当前名称, 构成互换/循环而无法直接执行的当前名称)。
+    """
+    pending = dict(renames)
+    order = []
+    while pending:
+        ready = [old for old, new in pending.items() if new == old or new not in pending]
+        if not ready:
+            break
+        for old in ready:
+            order.append(old)
+            del pending[old]
+    return order, list(pending)
+
+@mcp.tool()
+async def apply_renames(renames: dict[str, str], by_address: bool = False) -> dict:
+    """
+    一次重命名多个函数，并发请求 Ghidra。
+    按名称重命名时若某个新名称是另一个待重命名函数的当前名称（如 {a: b, b: c}），
+    则按依赖顺序逐个执行（先 b -> c 再 a -> b）；互换或循环的重命名（如 {a: b, b: a}）不执行并报告错误。
+
+    参数：
+        renames: {当前函数名: 新名称}；by_address=True 时为 {函数入口地址: 新名称}
+        by_address: 是否按地址重命名（默认：False）
+
+    返回：
+        {"results": {目标: 新名称}, "errors": {目标: 错误信息}}
+    """
+    async def handle(target: str):
+        new_name = renames[target]
+        if by_address:
+            endpoint, data = "rename_function_by_address", {"function_address": target, "new_name": new_name}
+        else:
+            endpoint, data = "renameFunction", {"oldName": target, "newName": new_name}
+        result = await ghidra_post(endpoint, data)
+        renamed = ghidra_client._write_succeeded(endpoint, result)
+        location = {"address": target} if by_address else {"name": target}
+        await record_decompile_change(new_name=new_name if renamed else None, **location)
+        if renamed:
+            return True, new_name
+        return False, result
+    try:
+        if by_address or not any(new != old and new in renames for old, new in renames.items()):
+            return await _fan_out(list(renames), handle)
+        order, cyclic = _rename_order(renames)
+        outcome = await _fan_out(order, handle, workers=1)
+        for target in cyclic:
+            outcome["errors"][target] = (f"cannot rename {target} -> {renames[target]}: the renames form a swap or cycle, "
+                                         "rename through a temporary name in two calls")
+        return outcome
+    finally:
+        response_cache.invalidate(NAMES, CODE)
+
+# query_list 各类列表结果所属的缓存分组
+LIST_GROUPS = {"functions": NAMES, "methods": NAMES, "data": DATA}
+
+@mcp.tool()
+async def query_list(kind: str, pattern: str = "", fields: list[str] = None, match_field: str = None,
+                     ignore_case: bool = True, max_results: int = 100, cursor: str = None) -> dict:
+    """
+    查询程序中的列表，在桥接端自动翻页、按正则过滤并只返回需要的字段，单次输出大小有上限。
+
+    参数：
+        kind: 列表类型及其字段：
+            functions(name, address)、methods(name)、classes(name)、namespaces(name)、
+            segments(name, start, end)、imports(name, address)、exports(name, address)、
+            data(address, label, value)、strings(address, value)
+        pattern: 正则表达式，为空时不过滤
+        fields: 只返回这些字段（默认全部字段；只有一个字段时每项直接是该字段的值）
+        match_field: 用正则匹配的字段（默认匹配整行）
+        ignore_case: 匹配时是否忽略大小写（默认：True）
+        max_results: 最多返回的条数（默认：100，上限 500）
+        cursor: 上一次查询返回的 next_cursor，用于继续查询
+
+    返回：
+        {"items": [...], "next_cursor": 继续查询用的游标（已到末尾时为 null）, "scanned": 本次扫描的行数}
+    """
+    spec = LIST_KINDS.get(kind)
+    if spec is None:
+        return {"error": f"unknown kind: {kind}, expected one of: {', '.join(LIST_KINDS)}"}
+    unknown = [field for field in (fields or []) + ([match_field] if match_field else []) if field not in spec.fields]
+    if unknown:
+        return {"error": f"unknown field for {kind}: {', '.join(unknown)}, available: {', '.join(spec.fields)}"}
+    try:
+        regex = list_query.compile_filter(pattern, ignore_case)
+    except re.error as e:
+        return {"error": f"invalid pattern: {e}"}
+    try:
+        offset = max(0, int(cursor or 0))
+    except ValueError:
+        return {"error": f"invalid cursor: {cursor}"}
+    max_results = max(1, min(int(max_results), list_query.MAX_RESULTS))
+    group = LIST_GROUPS.get(kind, STATIC)
+
+    params = {}
+    if kind == "functions" and ignore_case and match_field in (None, "name") and list_query.is_literal(pattern):
+        # 函数名子串查询由插件的 searchFunctions 完成（忽略大小写），可以分页
+        spec, params, regex = SEARCH_KIND, {"query": pattern}, None
+
+    async def fetch_page(start: int) -> list:
+        if spec.paginated:
+            return await cached_get(spec.endpoint, {**params, "offset": start, "limit": list_query.PAGE_SIZE}, group)
+        lines = await cached_get(spec.endpoint, None, group)
+        if is_error_response(lines):
+            return lines
+        return lines[start:start + list_query.PAGE_SIZE]
+
+    items, size, scanned = [], 0, 0
+    while True:
+        page = await fetch_page(offset)
+        if is_error_response(page):
+            return {"error": page[0], "items": items, "next_cursor": str(offset)}
+        for i, line in enumerate(page):
+            scanned += 1
+            line = line.strip()
+            item = list_query.parse_line(spec, line)
+            if not line or not list_query.matches(item, line, regex, match_field):
+                continue
+            item = list_query.project(item, fields)
+            size += list_query.output_size(item)
+            if len(items) >= max_results or (items and size > list_query.MAX_OUTPUT_CHARS):
+                return {"items": items, "next_cursor": str(offset + i), "scanned": scanned}
+            items.append(item)
+        offset += len(page)
+        if len(page) < list_query.PAGE_SIZE:
+            return {"items": items, "next_cursor": None, "scanned": scanned}
+        if scanned >= list_query.MAX_SCAN_LINES:
+            return {"items": items, "next_cursor": str(offset), "scanned": scanned}
+
+def _cache_metrics() -> list:
+    """响应缓存的统计，随 --metrics-port 提供的指标一并输出"""
+    return [
+        ("bridge_cache_requests", {"result": "hit"}, response_cache.hits),
+        ("bridge_cache_requests", {"result": "miss"}, response_cache.misses),
+        ("bridge_cache_requests", {"result": "coalesced"}, response_cache.coalesced),
+        ("bridge_cache_entries", {}, len(response_cache)),
+    ]
+
+def _parse_overrides(parser: argparse.ArgumentParser, values: list, convert) -> dict:
+    """解析命令行中的 endpoint=value 列表"""
+    overrides = {}
+    for item in values or []:
+        endpoint, sep, value = item.partition("=")
+        try:
+            if not sep:
+                raise ValueError
+            overrides[endpoint.strip()] = convert(value)
+        except ValueError:
+            parser.error(f"expected ENDPOINT=VALUE, got: {item}")
+    return overrides
 
 def main():
     parser = argparse.ArgumentParser(description="MCP server for Ghidra")
     parser.add_argument("--ghidra-server", type=str, default=DEFAULT_GHIDRA_SERVER,
-                        help=f"Ghidra server URL, default: {DEFAULT_GHIDRA_SERVER}")
+                        help=f"Ghidra server URL, default: {DEFAULT_GHIDRA_SERVER}. A comma-separated list adds replicas "
+                             "(Ghidra instances with a copy of the same program): decompile requests go to the least "
+                             "busy instance, writes go to the first one and are replayed on the others")
     parser.add_argument("--mcp-host", type=str, default="127.0.0.1",
                         help="Host to run MCP server on (only used for sse), default: 127.0.0.1")
     parser.add_argument("--mcp-port", type=int,
                         help="Port to run MCP server on (only used for sse), default: 8081")
     parser.add_argument("--transport", type=str, default="stdio", choices=["stdio", "sse"],
                         help="Transport protocol for MCP, default: stdio")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help=f"Seconds to cache read-only tool results, 0 disables caching, default: {DEFAULT_TTL}")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f"Maximum number of cached results, default: {DEFAULT_MAX_ENTRIES}")
+    parser.add_argument("--endpoint-concurrency", action="append", metavar="ENDPOINT=N",
+                        help="Maximum concurrent requests for a Ghidra endpoint, e.g. decompile=2 (repeatable, 0 = unlimited)")
+    parser.add_argument("--endpoint-timeout", action="append", metavar="ENDPOINT=SECONDS",
+                        help="Request timeout for a Ghidra endpoint, e.g. decompile=60 (repeatable)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve request counters and latency histograms on http://127.0.0.1:PORT/metrics "
+                             "(Prometheus text) and /metrics.json, default: disabled")
     args = parser.parse_args()
     
     # Use the global variable to ensure it's properly updated
-    global ghidra_server_url
+    global ghidra_server_url, replica_urls
     if args.ghidra_server:
-        ghidra_server_url = args.ghidra_server
+        servers = ghidra_client.parse_server_list(args.ghidra_server) or [DEFAULT_GHIDRA_SERVER]
+        ghidra_server_url, replica_urls = servers[0], servers[1:]
+    ghidra_client.configure(base_url=ghidra_server_url, replica_urls=replica_urls)
+    if replica_urls:
+        for url in ghidra_client.verify_replicas():
+            logger.warning(f"Ignoring Ghidra replica {url}: unreachable or the program/function names differ from {ghidra_server_url}")
+        replica_urls = [replica.base_url for replica in ghidra_client.get_client().replicas]
+    ENDPOINT_CONCURRENCY.update(_parse_overrides(parser, args.endpoint_concurrency, int))
+    endpoint_timeouts.update(_parse_overrides(parser, args.endpoint_timeout, float))
+    response_cache.ttl = args.cache_ttl
+    response_cache.max_entries = max(1, args.cache_size)
+    if args.metrics_port:
+        run_metrics.REGISTRY.add_collector(_cache_metrics)
+        metrics_server = run_metrics.serve(args.metrics_port)
+        logger.info(f"Serving metrics on {metrics_server.url}")
     
     if args.transport == "sse":
         try:
@@ -0,0 +1,278 @@
+"""
+反编译结果的本地持久化缓存（SQLite）。
+
+以 (程序标识, 函数入口地址) 为键保存 POST /decompile 的结果，重复运行重命名或导出时
+直接读取本地结果。函数被重命名或修改类型时需调用 invalidate，缓存总大小超过上限时
+按最近访问时间淘汰最旧的条目。
+
+被调用函数的名称或签名变化后，调用方的反编译结果也随之变化，而调用方的名称与地址都没变。
+因此 invalidate 还会记录被修改函数（修改前）的名称与时间，读取时若缓存的代码调用了
+缓存之后被修改过的函数即视为失效。在 Ghidra 界面中手动重命名的函数无法直接得知，
+打开缓存时用 sync_names 与上次记录的函数名快照比较找出。
+
+局限：插件没有变更通知，也没有能反映函数内容的接口。只有通过本工具（重命名任务、MCP bridge）
+进行的重命名与签名/类型修改，以及 sync_names 能发现的函数改名会使缓存失效；
+在 Ghidra 界面中修改的类型、变量名与注释，以及修补后内存段与导入表不变的二进制
+（程序标识相同，见 ghidra_client.program_fingerprint）都无法发现。
+因此缓存只用于可以容忍旧代码的场合（为函数生成名称）；导出默认不使用缓存，需要时显式开启。
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import ghidra_client
+from ghidra_client import is_error_response, is_request_error, split_function_entry
+
+# 与 GUI 配置文件相同的用户数据目录
+CACHE_DIR = os.path.join(os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"), "GhidraAiRename")
+DEFAULT_CACHE_PATH = os.path.join(CACHE_DIR, "decompile_cache.sqlite3")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 反编译代码中的函数调用：名称后紧跟左括号
+_CALL_PATTERN = re.compile(r"\b([A-Za-z_][\w:]*)\s*\(")
+
+
+class DecompileCache:
+    """线程安全的反编译缓存，所有线程共用一个连接并由锁串行化"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                program_id TEXT NOT NULL,
+                address TEXT NOT NULL,
+                name TEXT NOT NULL,
+                code TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                cached_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (program_id, address)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at);
+            CREATE TABLE IF NOT EXISTS programs (
+                program_id TEXT PRIMARY KEY,
+                changed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                program_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                changed_at REAL NOT NULL,
+                PRIMARY KEY (program_id, name)
+            );
+            CREATE TABLE IF NOT EXISTS names (
+                program_id TEXT NOT NULL,
+                address TEXT NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (program_id, address)
+            );
+            """
+        )
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        # program_id -> {被修改的函数名: 修改时间}，首次读取该程序时从 changes 表载入
+        self._changes = {}
+
+    def _changes_for(self, program_id: str) -> dict:
+        """（调用方持有锁）"""
+        if program_id not in self._changes:
+            self._changes[program_id] = dict(self._conn.execute(
+                "SELECT name, changed_at FROM changes WHERE program_id = ?", (program_id,)
+            ).fetchall())
+        return self._changes[program_id]
+
+    def _record_change(self, program_id: str, name: str, now: float) -> None:
+        """（调用方持有锁，由调用方提交）"""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO changes (program_id, name, changed_at) VALUES (?, ?, ?)", (program_id, name, now)
+        )
+        self._changes_for(program_id)[name] = now
+
+    def _calls_changed(self, program_id: str, code: str, cached_at: float) -> bool:
+        """缓存的代码是否调用了缓存之后被重命名/改类型的函数（调用方持有锁）"""
+        changes = self._changes_for(program_id)
+        if not changes:
+            return False
+        return any(changes.get(callee, 0.0) > cached_at for callee in set(_CALL_PATTERN.findall(code)))
+
+    def get(self, program_id: str, address: str, name: str = None, fresh_only: bool = False) -> str | None:
+        """
+        读取缓存。name 与缓存时的函数名不一致、或代码中调用的函数在缓存之后被修改过时视为已失效；
+        fresh_only=True 时还要求缓存晚于该程序最近一次重命名/改类型。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT e.name, e.code, e.cached_at, p.changed_at FROM entries e "
+                "LEFT JOIN programs p ON p.program_id = e.program_id "
+                "WHERE e.program_id = ? AND e.address = ?",
+                (program_id, address),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            cached_name, code, cached_at, changed_at = row
+            if (name is not None and cached_name != name) or (fresh_only and changed_at is not None and cached_at < changed_at) \
+                    or self._calls_changed(program_id, code, cached_at):
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE program_id = ? AND address = ?",
+                (time.time(), program_id, address),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return code
+
+    def put(self, program_id: str, address: str, name: str, code: str) -> None:
+        size = len(code.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM entries WHERE program_id = ? AND address = ?", (program_id, address)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (program_id, address, name, code, size, cached_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (program_id, address, name, code, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def invalidate(self, program_id: str, address: str = None, name: str = None, new_name: str = None,
+                   affects_callers: bool = True) -> None:
+        """
+        函数被重命名或修改类型后删除其缓存，并记录该程序发生了变更。
+        name 为修改前的函数名（未知时从缓存或函数名快照中查找），address 未知时按 name 删除；
+        affects_callers=True 时记录该名称已变更，调用它的函数的缓存随之失效（仅修改注释等时传 False）。
+        new_name 为重命名后的名称，用于更新函数名快照。
+        """
+        now = time.time()
+        with self._lock:
+            if address is None:
+                row = self._conn.execute(
+                    "SELECT address FROM entries WHERE program_id = ? AND name = ?", (program_id, name)
+                ).fetchone() or self._conn.execute(
+                    "SELECT address FROM names WHERE program_id = ? AND name = ?", (program_id, name)
+                ).fetchone()
+                address = row[0] if row else None
+            if name is None and address is not None:
+                row = self._conn.execute(
+                    "SELECT name FROM entries WHERE program_id = ? AND address = ?", (program_id, address)
+                ).fetchone() or self._conn.execute(
+                    "SELECT name FROM names WHERE program_id = ? AND address = ?", (program_id, address)
+                ).fetchone()
+                name = row[0] if row else None
+            if address is not None:
+                old = self._conn.execute(
+                    "SELECT size FROM entries WHERE program_id = ? AND address = ?", (program_id, address)
+                ).fetchone()
+                if old:
+                    self._conn.execute("DELETE FROM entries WHERE program_id = ? AND address = ?", (program_id, address))
+                    self._total_bytes -= old[0]
+                if new_name:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO names (program_id, address, name) VALUES (?, ?, ?)",
+                        (program_id, address, new_name),
+                    )
+            if affects_callers and name:
+                self._record_change(program_id, name, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO programs (program_id, changed_at) VALUES (?, ?)", (program_id, now)
+            )
+            self._conn.commit()
+
+    def sync_names(self, program_id: str, functions: dict) -> int:
+        """
+        与上次记录的函数名快照（入口地址 -> 名称）比较，名称变化或已删除的函数记为已变更
+        （例如在 Ghidra 界面中手动重命名），然后保存新的快照。返回变更的函数数量。
+        """
+        now = time.time()
+        with self._lock:
+            previous = dict(self._conn.execute(
+                "SELECT address, name FROM names WHERE program_id = ?", (program_id,)
+            ).fetchall())
+            changed = [name for address, name in previous.items() if functions.get(address) != name]
+            for name in changed:
+                self._record_change(program_id, name, now)
+            if changed:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO programs (program_id, changed_at) VALUES (?, ?)", (program_id, now)
+                )
+            self._conn.execute("DELETE FROM names WHERE program_id = ?", (program_id,))
+            self._conn.executemany(
+                "INSERT INTO names (program_id, address, name) VALUES (?, ?, ?)",
+                [(program_id, address, name) for address, name in functions.items()],
+            )
+            self._conn.commit()
+            return len(changed)
+
+    def _evict(self) -> None:
+        """按最近访问时间淘汰，直到总大小降到上限的 90% 以下（调用方持有锁）"""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT program_id, address, size FROM entries ORDER BY accessed_at ASC").fetchall()
+        for program_id, address, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM entries WHERE program_id = ? AND address = ?", (program_id, address))
+            self._total_bytes -= size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def sync_function_names(cache: DecompileCache, program_id: str, client=None) -> int:
+    """用 list_functions 的结果更新函数名快照，返回上次之后在 Ghidra 中被重命名的函数数量（获取失败时为0）"""
+    lines = (client or ghidra_client.get_client()).get("list_functions")
+    if is_error_response(lines):
+        return 0
+    functions = {}
+    for line in lines:
+        name, address = split_function_entry(line.strip())
+        if address:
+            functions[address] = name
+    return cache.sync_names(program_id, functions) if functions else 0
+
+
+def decompile_with_cache(cache: DecompileCache | None, program_id: str | None, name: str, address: str | None,
+                         decompile, fresh_only: bool = False) -> str:
+    """
+    先查缓存，未命中时调用 decompile(name) 并写回缓存。
+    缓存不可用（无程序标识或地址）时直接调用 decompile。
+    """
+    if cache is None or not program_id or not address:
+        return decompile(name)
+    code = cache.get(program_id, address, name, fresh_only=fresh_only)
+    if code is not None:
+        return code
+    code = decompile(name)
+    if code and not is_request_error(code):
+        cache.put(program_id, address, name, code)
+    return code
+
+
+
+async def decompile_with_cache_async(cache: DecompileCache | None, program_id: str | None, name: str, address: str | None,
+                                     decompile, fresh_only: bool = False) -> str:
+    """decompile_with_cache 的异步版本：decompile 为协程函数，SQLite 读写在线程池中进行，不阻塞事件循环"""
+    if cache is None or not program_id or not address:
+        return await decompile(name)
+    code = await asyncio.to_thread(cache.get, program_id, address, name, fresh_only)
+    if code is not None:
+        return code
+    code = await decompile(name)
+    if code and not is_request_error(code):
+        await asyncio.to_thread(cache.put, program_id, address, name, code)
+    return code
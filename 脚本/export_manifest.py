@@ -0,0 +1,102 @@
+"""
+导出清单：记录一次导出中每个函数的 名称、入口地址、内容哈希 以及保存位置。
+
+每次导出都在输出目录写入 manifest.json。增量导出时读取同一程序最近一次导出的清单：
+- 与上次相比新增或改名的函数（由函数列表即可判断）必定重新写入；
+- 名称未变的函数比较反编译内容的哈希（被调用函数改名也会改变调用方的反编译结果），
+  内容相同时直接硬链接/引用上次导出的文件，不再重新写入。
+"""
+import datetime
+import glob
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# 与上次导出相比的状态
+NEW = "new"
+RENAMED = "renamed"
+SAME_NAME = "same_name"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ExportManifest:
+    """线程安全的导出清单，functions 为 入口地址 -> {"name", "hash", "file"}"""
+
+    def __init__(self, directory: str, program_id: str = None, mode: str = "files", functions: dict = None, created: str = None):
+        self.directory = directory
+        self.program_id = program_id
+        self.mode = mode
+        self.created = created or datetime.datetime.now().isoformat(timespec="seconds")
+        self.functions = dict(functions or {})
+        self._lock = threading.Lock()
+
+    def record(self, address: str, name: str, digest: str, file: str = None) -> None:
+        """file 为相对于 directory 的文件名，或其他快照中文件的绝对路径（引用）；打包模式为 None"""
+        with self._lock:
+            self.functions[address] = {"name": name, "hash": digest, "file": file}
+
+    def get(self, address: str) -> dict | None:
+        return self.functions.get(address)
+
+    def file_path(self, address: str) -> str | None:
+        entry = self.functions.get(address)
+        if not entry or not entry.get("file"):
+            return None
+        return os.path.join(self.directory, entry["file"])
+
+    def classify(self, addresses: dict) -> dict:
+        """按当前的 函数名 -> 入口地址 映射，得到每个入口地址相对于本清单的状态"""
+        status = {}
+        for name, address in addresses.items():
+            entry = self.functions.get(address)
+            if entry is None:
+                status[address] = NEW
+            elif entry["name"] != name:
+                status[address] = RENAMED
+            else:
+                status[address] = SAME_NAME
+        return status
+
+    def save(self) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "program_id": self.program_id,
+            "mode": self.mode,
+            "created": self.created,
+            "functions": self.functions,
+        }
+        path = os.path.join(self.directory, MANIFEST_NAME)
+        with self._lock:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, directory: str) -> "ExportManifest | None":
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(directory, data.get("program_id"), data.get("mode", "files"), data.get("functions"), data.get("created"))
+
+
+def find_previous_manifest(root: str, program_id: str, exclude: str = None) -> ExportManifest | None:
+    """在 root 下的 项目_* 目录中找到同一程序最近一次导出的清单"""
+    candidates = []
+    for directory in glob.glob(os.path.join(root, "项目_*")):
+        if exclude and os.path.abspath(directory) == os.path.abspath(exclude):
+            continue
+        manifest = ExportManifest.load(directory)
+        if manifest is not None and manifest.program_id == program_id:
+            candidates.append(manifest)
+    return max(candidates, key=lambda m: m.created, default=None)
@@ -0,0 +1,119 @@
+"""
+本地函数目录：入口地址 -> 函数名 的快照。
+
+通过一次 list_functions 请求同步，按程序标识保存在用户数据目录中，之后：
+- GUI 输入函数名模式时直接在本地统计匹配数量，不再每次下载完整的 methods 列表；
+- run_rename 直接从目录得到待处理函数与全部函数名，不再分页枚举；
+- 重命名成功后就地更新目录（插件没有变更通知接口，Ghidra 中的手动修改需重新同步）。
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from decompile_cache import CACHE_DIR
+from ghidra_client import get_client, is_error_response, split_function_entry
+
+# 超过该时间（秒）的快照在开始重命名前重新同步
+CATALOG_MAX_AGE = 600
+
+
+def catalog_path(program_id: str) -> str:
+    return os.path.join(CACHE_DIR, f"function_catalog_{program_id}.json")
+
+
+class FunctionCatalog:
+    """线程安全的函数目录"""
+
+    def __init__(self, program_id: str, functions: dict = None, synced_at: float = 0.0):
+        self.program_id = program_id
+        self.synced_at = synced_at
+        self._functions = dict(functions or {})
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._functions)
+
+    def is_fresh(self, max_age: float = CATALOG_MAX_AGE) -> bool:
+        return bool(self._functions) and time.time() - self.synced_at <= max_age
+
+    def sync(self, client=None) -> bool:
+        """从 list_functions 重新读取全部函数，失败时保留原有内容并返回 False"""
+        lines = (client or get_client()).get("list_functions")
+        if is_error_response(lines):
+            return False
+        functions = {}
+        for line in lines:
+            name, address = split_function_entry(line.strip())
+            if address:
+                functions[address] = name
+        with self._lock:
+            self._functions = functions
+            self.synced_at = time.time()
+            self._dirty = True
+        self.save()
+        return True
+
+    def names(self) -> list:
+        with self._lock:
+            return list(self._functions.values())
+
+    def count_matching(self, pattern: str) -> int:
+        """按正则统计函数名匹配的数量（与 GUI 原来对 methods 列表的统计方式一致）"""
+        regex = re.compile(pattern or "")
+        with self._lock:
+            return sum(1 for name in self._functions.values() if regex.search(name))
+
+    def search(self, query: str) -> list:
+        """与插件 searchFunctions 相同的结果：忽略大小写的子串匹配，按 "name @ address" 排序"""
+        query = query.lower()
+        with self._lock:
+            matches = [f"{name} @ {address}" for address, name in self._functions.items() if query in name.lower()]
+        return sorted(matches)
+
+    def apply_rename(self, address: str, new_name: str) -> None:
+        if not address:
+            return
+        with self._lock:
+            if address in self._functions:
+                self._functions[address] = new_name
+                self._dirty = True
+
+    def save(self) -> None:
+        """有改动时写回快照（先写临时文件再替换，避免中途退出留下损坏的文件）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"program_id": self.program_id, "synced_at": self.synced_at, "functions": self._functions}
+            path = catalog_path(self.program_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+            self._dirty = False
+
+    @classmethod
+    def load(cls, program_id: str) -> "FunctionCatalog":
+        """读取本地快照，不存在或损坏时返回空目录"""
+        try:
+            with open(catalog_path(program_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(program_id, data.get("functions"), data.get("synced_at", 0.0))
+        except (OSError, ValueError):
+            return cls(program_id)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(program_id: str) -> FunctionCatalog:
+    """获取进程内共享的目录实例（GUI 与重命名任务共用），首次访问时从磁盘加载"""
+    with _catalogs_lock:
+        catalog = _catalogs.get(program_id)
+        if catalog is None:
+            catalog = _catalogs[program_id] = FunctionCatalog.load(program_id)
+        return catalog
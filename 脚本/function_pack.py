@@ -0,0 +1,126 @@
+"""
+打包导出格式：所有函数的反编译代码写入同一个数据文件，另存一份偏移索引。
+
+- functions.pack: 依次拼接的 UTF-8 文本，每个函数一段；
+- functions.pack.idx: JSON 索引，记录每段的 函数名、入口地址、偏移、长度。
+
+PackWriter 由单独的写入线程顺序写入，反编译线程只需把结果放入队列，不再为每个函数创建文件。
+PackReader 以只读内存映射打开数据文件，按函数名或地址随机读取任意函数。
+"""
+import json
+import mmap
+import os
+import queue
+import threading
+
+INDEX_SUFFIX = ".idx"
+PACK_VERSION = 1
+
+
+class PackWriter:
+    """单线程顺序写入的打包文件，add 可在任意线程调用"""
+
+    def __init__(self, path: str, queue_size: int = 256):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.entries = []           # [name, address, offset, length]
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, "wb")
+        self._thread = threading.Thread(target=self._run, name="pack-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, name: str, address: str | None, text: str) -> None:
+        self._queue.put((name, address, text))
+
+    def _run(self) -> None:
+        offset = 0
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            name, address, text = item
+            data = text.encode("utf-8")
+            try:
+                self._file.write(data)
+            except OSError as e:
+                self.error = e
+                continue
+            self.entries.append([name, address, offset, len(data)])
+            offset += len(data)
+
+    def close(self) -> None:
+        """等待队列写完并写出索引；写入过程中出错时抛出该错误"""
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self.error is not None:
+            raise self.error
+        index = {"version": PACK_VERSION, "entries": self.entries}
+        with open(self.path + INDEX_SUFFIX + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(self.path + INDEX_SUFFIX + ".tmp", self.path + INDEX_SUFFIX)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackReader:
+    """按函数名或入口地址读取打包文件中的函数"""
+
+    def __init__(self, path: str):
+        with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != PACK_VERSION:
+            raise ValueError(f"不支持的打包文件版本: {index.get('version')}")
+        self.path = path
+        self._by_name = {}
+        self._by_address = {}
+        for name, address, offset, length in index["entries"]:
+            self._by_name.setdefault(name, []).append((offset, length))
+            if address:
+                self._by_address[address] = (offset, length)
+        self._file = open(path, "rb")
+        # 空文件无法映射
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def __len__(self) -> int:
+        return sum(len(spans) for spans in self._by_name.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def names(self) -> list:
+        return list(self._by_name)
+
+    def _read(self, span: tuple[int, int]) -> str:
+        offset, length = span
+        return self._data[offset:offset + length].decode("utf-8")
+
+    def get(self, name: str) -> str | None:
+        """按函数名读取，重名时返回第一个"""
+        spans = self._by_name.get(name)
+        return self._read(spans[0]) if spans else None
+
+    def get_all(self, name: str) -> list:
+        return [self._read(span) for span in self._by_name.get(name, [])]
+
+    def get_by_address(self, address: str) -> str | None:
+        span = self._by_address.get(address)
+        return self._read(span) if span else None
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
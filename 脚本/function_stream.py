@@ -0,0 +1,134 @@
+"""
+流式分页枚举 searchFunctions 的结果，第一页返回后即可开始处理。
+
+插件按名称排序后再分页，而边枚举边重命名会把已处理的函数移出匹配集合，
+固定步长的 offset 会跳过函数。这里根据已处理/已重命名的数量计算下一页可能的起点范围，
+一次请求覆盖整个范围，并按入口地址去掉重复返回的条目。
+"""
+import asyncio
+import threading
+from collections import deque
+
+from ghidra_client import safe_get, is_error_response, split_function_entry
+
+
+class FunctionStream:
+    """
+    可迭代的函数条目流（"name @ address"）。消费方处理完每个条目后调用 settle，
+    重命名成功时传入 renamed=True，以便计算后续分页的偏移。
+    每读到一个新条目调用 on_entry(entry)；total 在枚举结束前为 None，确定后调用 on_exhausted(total)。
+    """
+
+    def __init__(self, pattern: str, page_size: int = 100, fetch=None, afetch=None, on_entry=None, on_exhausted=None):
+        self.pattern = pattern
+        self.page_size = max(1, int(page_size))
+        self._fetch = fetch or (lambda offset, limit: safe_get("searchFunctions", {"query": pattern, "offset": offset, "limit": limit}))
+        self._afetch = afetch
+        self._on_entry = on_entry
+        self._on_exhausted = on_exhausted
+        self.count = 0          # 已产出的条目数
+        self.total = None       # 枚举结束后的总数
+        self.error = None       # 枚举中断时的错误信息
+        self._settled = 0
+        self._renamed = 0
+        self._extra = 0         # 整页都是重复条目时逐步扩大请求范围
+        self._seen = set()
+        self._buffer = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.total is not None
+
+    def known_total(self) -> int:
+        """用于进度显示的总数：枚举结束前为目前已知的条目数"""
+        return self.total if self.total is not None else self.count
+
+    def settle(self, renamed: bool = False) -> None:
+        with self._lock:
+            self._settled += 1
+            if renamed:
+                self._renamed += 1
+
+    def _window(self) -> tuple[int, int]:
+        """下一页的 (offset, limit)：已产出且仍在匹配集合中的条目数介于 lower 与 upper 之间"""
+        with self._lock:
+            lower = max(0, self._settled - self._renamed)
+            upper = max(lower, self.count - self._renamed)
+        return lower, self.page_size + (upper - lower) + self._extra
+
+    def _accept(self, lines: list, limit: int) -> None:
+        if is_error_response(lines):
+            self.error = lines[0]
+            self._finish(self.count)
+            return
+        added = 0
+        for line in lines:
+            entry = line.strip()
+            if not entry:
+                continue
+            key = split_function_entry(entry)[1] or entry
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self._buffer.append(entry)
+            if self._on_entry:
+                self._on_entry(entry)
+            added += 1
+        if len(lines) < limit:
+            self._finish(self.count + len(self._buffer))
+        elif added == 0:
+            self._extra = self._extra * 2 or self.page_size
+        else:
+            self._extra = 0
+
+    def _finish(self, total: int) -> None:
+        self.total = total
+        if self._on_exhausted:
+            self._on_exhausted(total)
+
+    def is_empty(self) -> bool:
+        """必要时读取第一页，判断是否没有任何匹配的函数"""
+        if not self._buffer and not self.exhausted:
+            offset, limit = self._window()
+            self._accept(self._fetch(offset, limit), limit)
+        return not self._buffer and self.exhausted
+
+    async def _accept_async(self, lines: list, limit: int) -> None:
+        """回调可能阻塞（如写入断点日志），有回调时在线程池中处理本页，不占用事件循环"""
+        if self._on_entry or self._on_exhausted:
+            await asyncio.to_thread(self._accept, lines, limit)
+        else:
+            self._accept(lines, limit)
+
+    async def is_empty_async(self) -> bool:
+        if not self._buffer and not self.exhausted:
+            offset, limit = self._window()
+            await self._accept_async(await self._afetch(offset, limit), limit)
+        return not self._buffer and self.exhausted
+
+    def _pop(self) -> str:
+        self.count += 1
+        return self._buffer.popleft()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        while not self._buffer:
+            if self.exhausted:
+                raise StopIteration
+            offset, limit = self._window()
+            self._accept(self._fetch(offset, limit), limit)
+        return self._pop()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        while not self._buffer:
+            if self.exhausted:
+                raise StopAsyncIteration
+            offset, limit = self._window()
+            await self._accept_async(await self._afetch(offset, limit), limit)
+        return self._pop()
@@ -0,0 +1,508 @@
+"""
+共享的 Ghidra 插件 HTTP 客户端。
+
+bridge_mcp_ghidra.py、ai_再运行文件保存.py 以及 UI/ai_rename.py 都通过这里访问 Ghidra，
+底层使用带连接池的 requests.Session，保持 keep-alive，避免每次请求都新建 TCP 连接。
+
+可以同时连接多个打开同一程序副本的 Ghidra 实例（replica_urls）：反编译等只读请求分给
+当前未完成请求最少的实例，其余请求（包括所有写操作）只发给主实例；会改变反编译结果的写操作
+在主实例成功后于后台同步到各副本，使副本之后的反编译结果也使用新的名称。
+"""
+import asyncio
+import hashlib
+import queue
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import run_metrics
+
+DEFAULT_GHIDRA_SERVER = "http://127.0.0.1:8080/"
+DEFAULT_TIMEOUT = 5
+DEFAULT_POOL_SIZE = 10
+
+# 各端点的超时时间（秒），未列出的端点使用 DEFAULT_TIMEOUT
+ENDPOINT_TIMEOUTS = {
+    "decompile": 30,
+    "decompile_function": 30,
+    "disassemble_function": 30,
+    "methods": 30,
+    "list_functions": 30,
+    "strings": 15,
+}
+
+# 可分给各实例执行的只读请求
+SHARDED_ENDPOINTS = {"decompile", "decompile_function", "disassemble_function"}
+# 会改变反编译结果的写操作：只发给主实例，成功后同步到各副本。
+# 插件的写接口失败时也返回200，值为该接口成功时返回文本的开头（GhidraMCP 1.3）
+MIRRORED_ENDPOINTS = {
+    "renameFunction": "Renamed successfully",
+    "rename_function_by_address": "Function renamed successfully",
+    "renameData": "Rename data attempted",
+    "renameVariable": "Variable renamed",
+    "set_function_prototype": "Function prototype set successfully",
+    "set_local_variable_type": "Variable type set successfully",
+    "set_decompiler_comment": "Comment set successfully",
+    "set_disassembly_comment": "Comment set successfully",
+}
+
+# 保护各实例的未完成请求计数
+_outstanding_lock = threading.Lock()
+
+
+def parse_server_list(value) -> list:
+    """把 "url1, url2" 形式的字符串（或列表）拆成去重后的地址列表，第一个为主实例"""
+    if isinstance(value, str):
+        value = re.split(r"[\s,，;；]+", value)
+    servers = []
+    for url in value or []:
+        url = url.strip()
+        if url and url.rstrip("/") + "/" not in servers:
+            servers.append(url.rstrip("/") + "/")
+    return servers
+
+
+def _record_request(endpoint: str, start: float, failed: bool, instance: str) -> None:
+    """记录一次插件请求的耗时与结果（见 run_metrics）"""
+    endpoint = endpoint.strip("/")
+    run_metrics.observe("ghidra_request_seconds", time.perf_counter() - start, endpoint=endpoint, instance=instance)
+    run_metrics.inc("ghidra_requests_total", endpoint=endpoint, status="error" if failed else "ok", instance=instance)
+
+
+def _write_succeeded(endpoint: str, result: str) -> bool:
+    """按插件写接口成功时的返回文本判断，失败时插件返回 "Rename failed"、"Failed to ..." 等文本而不是错误状态码"""
+    expected = MIRRORED_ENDPOINTS.get(endpoint.strip("/"))
+    if expected is None:
+        return not is_request_error(result)
+    return result.strip().startswith(expected)
+
+
+def _least_outstanding(candidates: list, start: int):
+    """从 start 开始轮流比较，未完成请求数相同时依次分给不同实例；选中的实例计数加一"""
+    with _outstanding_lock:
+        rotated = candidates[start:] + candidates[:start]
+        target = min(rotated, key=lambda client: client.outstanding)
+        target.outstanding += 1
+    return target
+
+
+def _finish_request(client) -> None:
+    with _outstanding_lock:
+        client.outstanding -= 1
+
+
+class GhidraClient:
+    """带连接池的 Ghidra 客户端，返回值约定与原 safe_get/safe_post 一致"""
+
+    def __init__(self, base_url: str = DEFAULT_GHIDRA_SERVER, pool_size: int = DEFAULT_POOL_SIZE, timeouts: dict = None,
+                 replica_urls: list = None):
+        self.base_url = base_url
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.pool_size = 0
+        self.session = requests.Session()
+        self.replicas = []
+        self.outstanding = 0            # 正在进行的请求数，用于在各实例之间分配只读请求
+        self.mirror_failures = 0        # 作为副本时，同步写操作失败的次数
+        self._next = 0
+        self._mirror_queue = None
+        self._mirror_lock = threading.Lock()
+        self.resize_pool(pool_size)
+        self.set_replicas(replica_urls or [])
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, value: str) -> None:
+        self._base_url = value.rstrip("/") + "/"
+
+    def resize_pool(self, pool_size: int) -> None:
+        """调整连接池大小，通常与并发线程数保持一致"""
+        pool_size = max(1, int(pool_size))
+        if pool_size == self.pool_size:
+            return
+        self.pool_size = pool_size
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        for replica in self.replicas:
+            replica.resize_pool(pool_size)
+
+    def set_replicas(self, urls: list) -> None:
+        """设置只读副本实例（与主实例打开同一程序的副本），空列表表示只使用主实例"""
+        for replica in self.replicas:
+            replica.close()
+        self.replicas = []
+        for url in parse_server_list(urls):
+            if url != self.base_url:
+                replica = GhidraClient(url, self.pool_size)
+                replica.timeouts = self.timeouts
+                self.replicas.append(replica)
+
+    def instances(self) -> list:
+        return [self] + self.replicas
+
+    def _route(self, endpoint: str) -> "GhidraClient":
+        if not self.replicas or endpoint.strip("/") not in SHARDED_ENDPOINTS:
+            with _outstanding_lock:
+                self.outstanding += 1
+            return self
+        candidates = self.instances()
+        with self._mirror_lock:
+            start = self._next
+            self._next = (self._next + 1) % len(candidates)
+        return _least_outstanding(candidates, start)
+
+    def timeout_for(self, endpoint: str) -> float:
+        return self.timeouts.get(endpoint.strip("/"), DEFAULT_TIMEOUT)
+
+    def url_for(self, endpoint: str) -> str:
+        return self.base_url + endpoint.lstrip("/")
+
+    def get(self, endpoint: str, params: dict = None, timeout: float = None) -> list:
+        """
+        执行带有可选查询参数的GET请求，返回按行拆分的响应文本。只读请求可能由副本实例执行。
+        """
+        target = self._route(endpoint)
+        try:
+            return target._get(endpoint, params, timeout)
+        finally:
+            _finish_request(target)
+
+    def post(self, endpoint: str, data: dict | str, timeout: float = None) -> str:
+        """
+        执行POST请求，dict 作为表单提交，str 作为 UTF-8 原始请求体提交。
+        写操作只发给主实例，成功后在后台同步到各副本。
+        """
+        target = self._route(endpoint)
+        try:
+            result = target._post(endpoint, data, timeout)
+        finally:
+            _finish_request(target)
+        if self.replicas and endpoint.strip("/") in MIRRORED_ENDPOINTS and _write_succeeded(endpoint, result):
+            for replica in self.replicas:
+                replica._enqueue_mirror(endpoint, data)
+        return result
+
+    def _get(self, endpoint: str, params: dict = None, timeout: float = None) -> list:
+        if params is None:
+            params = {}
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.get(self.url_for(endpoint), params=params,
+                                        timeout=timeout if timeout is not None else self.timeout_for(endpoint))
+            response.encoding = 'utf-8'
+            if response.ok:
+                failed = False
+                return response.text.splitlines()
+            else:
+                return [f"Error {response.status_code}: {response.text.strip()}"]
+        except Exception as e:
+            return [f"Request failed: {str(e)}"]
+        finally:
+            _record_request(endpoint, start, failed, self.base_url)
+
+    def _post(self, endpoint: str, data: dict | str, timeout: float = None) -> str:
+        start = time.perf_counter()
+        failed = True
+        try:
+            if timeout is None:
+                timeout = self.timeout_for(endpoint)
+            if isinstance(data, dict):
+                response = self.session.post(self.url_for(endpoint), data=data, timeout=timeout)
+            else:
+                response = self.session.post(self.url_for(endpoint), data=data.encode("utf-8"), timeout=timeout)
+            response.encoding = 'utf-8'
+            if response.ok:
+                failed = False
+                return response.text.strip()
+            else:
+                return f"Error {response.status_code}: {response.text.strip()}"
+        except Exception as e:
+            return f"Request failed: {str(e)}"
+        finally:
+            _record_request(endpoint, start, failed, self.base_url)
+
+    def _enqueue_mirror(self, endpoint: str, data: dict | str) -> None:
+        """作为副本时，按主实例上的顺序依次重放写操作"""
+        with self._mirror_lock:
+            if self._mirror_queue is None:
+                self._mirror_queue = queue.Queue()
+                threading.Thread(target=self._run_mirror, name=f"ghidra-mirror-{self.base_url}", daemon=True).start()
+        self._mirror_queue.put((endpoint, data))
+
+    def _run_mirror(self) -> None:
+        while True:
+            endpoint, data = self._mirror_queue.get()
+            try:
+                with _outstanding_lock:
+                    self.outstanding += 1
+                result = self._post(endpoint, data)
+                if not _write_succeeded(endpoint, result):
+                    self.mirror_failures += 1
+            finally:
+                _finish_request(self)
+                self._mirror_queue.task_done()
+
+    def flush_mirrors(self) -> int:
+        """等待各副本重放完所有写操作，返回重放失败的总次数"""
+        for replica in self.replicas:
+            if replica._mirror_queue is not None:
+                replica._mirror_queue.join()
+        return sum(replica.mirror_failures for replica in self.replicas)
+
+    def close(self) -> None:
+        for replica in self.replicas:
+            replica.close()
+        self.session.close()
+
+
+class AsyncGhidraClient:
+    """基于 httpx.AsyncClient 的异步客户端（连接池），返回值约定与 GhidraClient 一致"""
+
+    def __init__(self, base_url: str = DEFAULT_GHIDRA_SERVER, max_connections: int = DEFAULT_POOL_SIZE, timeouts: dict = None,
+                 replica_urls: list = None):
+        import httpx  # 只有异步调用方需要 httpx
+
+        self.base_url = base_url.rstrip("/") + "/"
+        self.timeouts = dict(ENDPOINT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self._client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self.outstanding = 0
+        self.mirror_failures = 0
+        self._next = 0
+        self._mirror_tasks = set()
+        self.replicas = [AsyncGhidraClient(url, max_connections, self.timeouts)
+                         for url in parse_server_list(replica_urls or []) if url != self.base_url]
+
+    def timeout_for(self, endpoint: str) -> float:
+        return self.timeouts.get(endpoint.strip("/"), DEFAULT_TIMEOUT)
+
+    def _route(self, endpoint: str) -> "AsyncGhidraClient":
+        # 只在事件循环线程中调用，无需加锁
+        target = self
+        if self.replicas and endpoint.strip("/") in SHARDED_ENDPOINTS:
+            candidates = [self] + self.replicas
+            rotated = candidates[self._next:] + candidates[:self._next]
+            self._next = (self._next + 1) % len(candidates)
+            target = min(rotated, key=lambda client: client.outstanding)
+        target.outstanding += 1
+        return target
+
+    async def _mirror(self, endpoint: str, data: dict | str) -> None:
+        self.outstanding += 1
+        try:
+            result = await self._post(endpoint, data)
+        finally:
+            self.outstanding -= 1
+        if not _write_succeeded(endpoint, result):
+            self.mirror_failures += 1
+
+    async def flush_mirrors(self) -> int:
+        """等待各副本重放完所有写操作，返回重放失败的总次数"""
+        if self._mirror_tasks:
+            await asyncio.gather(*self._mirror_tasks, return_exceptions=True)
+        return sum(replica.mirror_failures for replica in self.replicas)
+
+    async def aclose(self) -> None:
+        await self.flush_mirrors()
+        for replica in self.replicas:
+            await replica.aclose()
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def get(self, endpoint: str, params: dict = None, timeout: float = None) -> list:
+        target = self._route(endpoint)
+        try:
+            return await target._get(endpoint, params, timeout)
+        finally:
+            target.outstanding -= 1
+
+    async def post(self, endpoint: str, data: dict | str, timeout: float = None) -> str:
+        target = self._route(endpoint)
+        try:
+            result = await target._post(endpoint, data, timeout)
+        finally:
+            target.outstanding -= 1
+        if self.replicas and endpoint.strip("/") in MIRRORED_ENDPOINTS and _write_succeeded(endpoint, result):
+            for replica in self.replicas:
+                task = asyncio.ensure_future(replica._mirror(endpoint, data))
+                self._mirror_tasks.add(task)
+                task.add_done_callback(self._mirror_tasks.discard)
+        return result
+
+    async def _get(self, endpoint: str, params: dict = None, timeout: float = None) -> list:
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await self._client.get(self.base_url + endpoint.lstrip("/"), params=params or {},
+                                              timeout=timeout if timeout is not None else self.timeout_for(endpoint))
+            response.encoding = 'utf-8'
+            if response.is_success:
+                failed = False
+                return response.text.splitlines()
+            else:
+                return [f"Error {response.status_code}: {response.text.strip()}"]
+        except Exception as e:
+            return [f"Request failed: {str(e)}"]
+        finally:
+            _record_request(endpoint, start, failed, self.base_url)
+
+    async def _post(self, endpoint: str, data: dict | str, timeout: float = None) -> str:
+        start = time.perf_counter()
+        failed = True
+        try:
+            if timeout is None:
+                timeout = self.timeout_for(endpoint)
+            url = self.base_url + endpoint.lstrip("/")
+            if isinstance(data, dict):
+                response = await self._client.post(url, data=data, timeout=timeout)
+            else:
+                response = await self._client.post(url, content=data.encode("utf-8"), timeout=timeout)
+            response.encoding = 'utf-8'
+            if response.is_success:
+                failed = False
+                return response.text.strip()
+            else:
+                return f"Error {response.status_code}: {response.text.strip()}"
+        except Exception as e:
+            return f"Request failed: {str(e)}"
+        finally:
+            _record_request(endpoint, start, failed, self.base_url)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GhidraClient:
+    """获取进程内共享的客户端实例"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GhidraClient()
+    return _client
+
+
+def configure(base_url: str = None, pool_size: int = None, timeouts: dict = None, replica_urls: list = None) -> GhidraClient:
+    """更新共享客户端的服务器地址、连接池大小、端点超时或副本实例（replica_urls 为 None 时保持不变）"""
+    client = get_client()
+    if base_url:
+        client.base_url = base_url
+    if pool_size:
+        client.resize_pool(pool_size)
+    if timeouts:
+        client.timeouts.update(timeouts)
+    if replica_urls is not None:
+        client.set_replicas(replica_urls)
+    return client
+
+
+def safe_get(endpoint: str, params: dict = None, timeout: float = None) -> list:
+    """
+    Perform a GET request with optional query parameters.
+    """
+    return get_client().get(endpoint, params, timeout=timeout)
+
+
+def safe_post(endpoint: str, data: dict | str, timeout: float = None) -> str:
+    return get_client().post(endpoint, data, timeout=timeout)
+
+
+def is_request_error(text: str) -> bool:
+    """判断 safe_get/safe_post 返回的是否为错误信息而不是正常结果"""
+    return text.startswith("Error") or text.startswith("Request failed")
+
+
+# get() 请求失败时返回的唯一一行："Error <状态码>: ..." 或 "Request failed: ..."
+_ERROR_LINE = re.compile(r"(?:Error \d{3}|Request failed): ")
+
+
+def is_error_response(lines: list) -> bool:
+    """
+    判断 safe_get/get 返回的行列表是否为请求失败。
+    不能只看第一行是否以 Error 开头：函数名、字符串等数据本身可能以 Error 开头（如 "ErrorHandler at 00402000"）。
+    """
+    return len(lines) == 1 and bool(_ERROR_LINE.match(lines[0]))
+
+
+_fingerprints = {}
+
+
+def program_fingerprint(client: GhidraClient = None, refresh: bool = False) -> str | None:
+    """
+    根据内存段布局与导入表计算当前程序的标识，用于区分本地缓存中不同程序的数据。
+    插件未提供程序名称接口，段与导入表不会因重命名而改变，足以区分不同的二进制；
+    但修补了代码而段与导入表不变的同一二进制会得到相同的标识。
+    refresh=True 时重新向 Ghidra 查询（例如用户可能已切换了打开的程序）。
+    """
+    client = client or get_client()
+    if not refresh and client.base_url in _fingerprints:
+        return _fingerprints[client.base_url]
+    segments = client.get("segments", {"offset": 0, "limit": 10000})
+    if not segments or is_error_response(segments):
+        return None
+    imports = client.get("imports", {"offset": 0, "limit": 500})
+    if is_error_response(imports):
+        imports = []
+    digest = hashlib.sha1("\n".join(segments + ["--"] + imports).encode("utf-8")).hexdigest()[:16]
+    _fingerprints[client.base_url] = digest
+    return digest
+
+
+def _function_list_digest(client: GhidraClient) -> str | None:
+    functions = client.get("list_functions")
+    if not functions or is_error_response(functions):
+        return None
+    return hashlib.sha1("\n".join(sorted(functions)).encode("utf-8")).hexdigest()
+
+
+def verify_replicas(client: GhidraClient = None, check_names: bool = True) -> list:
+    """
+    确认各副本打开的是与主实例相同的程序（程序标识一致），check_names=True 时还要求函数名列表一致
+    （副本落后于主实例的重命名会让反编译结果里的被调用函数名不同）。
+    不一致或无法访问的副本会被移除，返回被移除的地址列表。
+    """
+    client = client or get_client()
+    if not client.replicas:
+        return []
+    expected = program_fingerprint(client, refresh=True)
+    expected_names = _function_list_digest(client) if check_names else None
+    kept, dropped = [], []
+    for replica in client.replicas:
+        same = expected is not None and program_fingerprint(replica, refresh=True) == expected
+        if same and expected_names is not None:
+            same = _function_list_digest(replica) == expected_names
+        if same:
+            kept.append(replica)
+        else:
+            replica.close()
+            dropped.append(replica.base_url)
+    client.replicas = kept
+    return dropped
+
+
+def split_function_entry(func_entry: str) -> tuple[str, str | None]:
+    """把 searchFunctions 的 "name @ address" 或 list_functions 的 "name at address" 拆成 (名称, 地址)"""
+    for sep in (" @ ", " at "):
+        if sep in func_entry:
+            name, address = func_entry.rsplit(sep, 1)
+            return name, address.strip()
+    return func_entry, None
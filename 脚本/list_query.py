@@ -0,0 +1,84 @@
+"""
+bridge_mcp_ghidra 的列表查询：在桥接端合并分页、按正则过滤、投影字段并限制结果大小。
+
+插件的列表接口只支持 offset/limit（list_functions 甚至不分页），AI 代理要么一次拿到巨大的文本，
+要么自己反复翻页。这里把插件返回的每一行解析为字段，过滤后只返回少量结果和一个游标，
+代理用游标继续查询即可，单次输出的大小与程序规模无关。
+"""
+import re
+
+# 单次查询的结果条数上限与输出总字符数上限
+MAX_RESULTS = 500
+MAX_OUTPUT_CHARS = 20000
+# 单个字段的最大长度（超长字符串截断）
+MAX_FIELD_CHARS = 200
+# 每次向插件请求的行数，以及单次查询最多扫描的行数（超过后返回游标，由下一次查询继续）
+PAGE_SIZE = 1000
+MAX_SCAN_LINES = 100000
+
+
+class ListKind:
+    """一种列表：插件端点、每行的字段格式、端点是否支持 offset/limit 分页"""
+
+    def __init__(self, endpoint: str, pattern: re.Pattern, paginated: bool = True):
+        self.endpoint = endpoint
+        self.pattern = pattern
+        self.paginated = paginated
+
+    @property
+    def fields(self) -> list:
+        return list(self.pattern.groupindex)
+
+
+LIST_KINDS = {
+    "functions": ListKind("list_functions", re.compile(r"(?P<name>.+) at (?P<address>\S+)$"), paginated=False),
+    "methods": ListKind("methods", re.compile(r"(?P<name>.+)$")),
+    "classes": ListKind("classes", re.compile(r"(?P<name>.+)$")),
+    "namespaces": ListKind("namespaces", re.compile(r"(?P<name>.+)$")),
+    "segments": ListKind("segments", re.compile(r"(?P<name>.+): (?P<start>\S+) - (?P<end>\S+)$")),
+    "imports": ListKind("imports", re.compile(r"(?P<name>.+) -> (?P<address>\S+)$")),
+    "exports": ListKind("exports", re.compile(r"(?P<name>.+) -> (?P<address>\S+)$")),
+    "data": ListKind("data", re.compile(r"(?P<address>[^:]+): (?P<label>.*?) = (?P<value>.*)$")),
+    "strings": ListKind("strings", re.compile(r'(?P<address>[^:]+): "(?P<value>.*)"$')),
+}
+# 函数名的简单子串查询改用插件的 searchFunctions（分页，且忽略大小写）
+SEARCH_KIND = ListKind("searchFunctions", re.compile(r"(?P<name>.+) @ (?P<address>\S+)$"))
+
+
+def parse_line(kind: ListKind, line: str) -> dict:
+    """按列表类型拆分字段，格式不符的行只保留原文"""
+    match = kind.pattern.match(line)
+    return match.groupdict() if match else {"line": line}
+
+
+def compile_filter(pattern: str, ignore_case: bool = True) -> re.Pattern | None:
+    if not pattern:
+        return None
+    return re.compile(pattern, re.IGNORECASE if ignore_case else 0)
+
+
+def is_literal(pattern: str) -> bool:
+    return bool(pattern) and re.escape(pattern) == pattern
+
+
+def matches(item: dict, line: str, regex: re.Pattern | None, match_field: str = None) -> bool:
+    if regex is None:
+        return True
+    text = item.get(match_field, "") if match_field else line
+    return regex.search(text) is not None
+
+
+def project(item: dict, fields: list | None):
+    """只保留指定字段并截断过长的值；只有一个字段时直接返回该值"""
+    if fields:
+        item = {field: item.get(field, "") for field in fields}
+    item = {key: value if len(value) <= MAX_FIELD_CHARS else value[:MAX_FIELD_CHARS] + "…" for key, value in item.items()}
+    if len(item) == 1:
+        return next(iter(item.values()))
+    return item
+
+
+def output_size(item) -> int:
+    if isinstance(item, str):
+        return len(item) + 4
+    return sum(len(key) + len(value) + 8 for key, value in item.items())
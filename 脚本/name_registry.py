@@ -0,0 +1,85 @@
+"""
+进程内的函数名登记表，用于重命名前的冲突检查。
+
+启动时从插件的 methods 接口一次性读取全部函数名，之后随重命名结果同步更新，
+冲突检查在本地以精确匹配完成，不再为每个函数额外调用 searchFunctions
+（子字符串匹配会让 init 与 initFoo 误判为冲突）。
+名称已被占用时依次尝试 name_2、name_3……，由锁保证多个重命名线程不会分到同一个名称。
+"""
+import threading
+from collections import Counter
+
+from ghidra_client import safe_get, is_error_response
+
+
+class NameRegistry:
+    """线程安全的函数名集合（同名函数可能有多个，按出现次数计数）"""
+
+    def __init__(self, names=()):
+        self._lock = threading.Lock()
+        self._counts = Counter(names)
+        # 每个基础名称下一次尝试的后缀，避免重复从 _2 开始探测
+        self._next_suffix = {}
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return self._counts[name] > 0
+
+    def __len__(self) -> int:
+        """登记的函数总数（与 methods 接口返回的行数一致）"""
+        with self._lock:
+            return sum(self._counts.values())
+
+    @classmethod
+    def load(cls, page_size: int = 10000, fetch=None) -> "NameRegistry | None":
+        """分页读取 methods 接口返回的全部函数名；请求失败时返回 None"""
+        fetch = fetch or (lambda offset, limit: safe_get("methods", {"offset": offset, "limit": limit}))
+        names = []
+        offset = 0
+        while True:
+            lines = fetch(offset, page_size)
+            if is_error_response(lines):
+                return None
+            names.extend(line.strip() for line in lines if line.strip())
+            if len(lines) < page_size:
+                break
+            offset += page_size
+        return cls(names)
+
+    def reserve(self, desired: str, current: str = None) -> str:
+        """
+        为即将执行的重命名占用一个不冲突的名称并返回。
+        current 为函数当前名称，与 desired 相同时原样返回。
+        """
+        with self._lock:
+            if desired == current or self._counts[desired] <= 0:
+                name = desired
+            else:
+                suffix = self._next_suffix.get(desired, 2)
+                while self._counts[f"{desired}_{suffix}"] > 0:
+                    suffix += 1
+                self._next_suffix[desired] = suffix + 1
+                name = f"{desired}_{suffix}"
+            if name != current:
+                self._counts[name] += 1
+            return name
+
+    def commit(self, old_name: str, new_name: str) -> None:
+        """重命名成功后释放旧名称（新名称已在 reserve 时登记）"""
+        if old_name == new_name:
+            return
+        with self._lock:
+            self._discard(old_name)
+
+    def release(self, name: str, current: str = None) -> None:
+        """重命名失败时撤销 reserve 占用的名称"""
+        if name == current:
+            return
+        with self._lock:
+            self._discard(name)
+
+    def _discard(self, name: str) -> None:
+        if self._counts[name] > 1:
+            self._counts[name] -= 1
+        else:
+            self._counts.pop(name, None)
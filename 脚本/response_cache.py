@@ -0,0 +1,154 @@
+"""
+bridge_mcp_ghidra 的进程内响应缓存（TTL + LRU）。
+
+AI 代理在一次会话中会反复读取同一个函数的反编译结果、函数列表与交叉引用，
+只读请求的结果按 (端点, 参数) 缓存，超过 ttl 秒或总数超过 max_entries 时淘汰。
+多个相同的请求同时到达时只有第一个真正访问 Ghidra，其余等待并共用其结果（single-flight）。
+每个缓存项属于一个分组，写操作按分组失效，例如重命名函数后函数列表与反编译结果都需重新读取。
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from ghidra_client import is_error_response, is_request_error
+
+# 缓存分组
+NAMES = "names"     # 含函数名或签名的结果：函数列表、搜索、交叉引用、按地址查询函数等
+CODE = "code"       # 反编译与反汇编结果
+DATA = "data"       # 数据标签
+STATIC = "static"   # 段、导入导出、字符串等不受写操作影响的结果
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def _is_error(value) -> bool:
+    if isinstance(value, str):
+        return is_request_error(value)
+    return isinstance(value, list) and is_error_response(value)
+
+
+class _Flight:
+    """一次正在进行的请求，后到的相同请求等待其结果"""
+
+    def __init__(self, group: str, generation: int):
+        self.group = group
+        self.generation = generation
+        self.event = threading.Event()
+        self.waiters = []       # 异步等待者的 (事件循环, Future)
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """线程安全的 TTL/LRU 缓存，ttl<=0 时不缓存但仍合并并发的相同请求"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()     # key -> (过期时间, 分组, 结果)
+        self._inflight = {}               # key -> _Flight
+        self._generations = {}            # 分组 -> 失效次数
+
+    def _begin(self, key, group: str):
+        """返回 (是否命中, 结果, 请求, 是否由本次调用发起请求)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, _, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, None, False
+                del self._entries[key]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight(group, self._generations.get(group, 0))
+                self.misses += 1
+            else:
+                self.coalesced += 1
+            return False, None, flight, leader
+
+    def _finish(self, key, flight: _Flight) -> None:
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            # 请求期间分组已失效的结果可能是旧的，不写入缓存
+            if (flight.error is None and self.ttl > 0 and not _is_error(flight.value)
+                    and self._generations.get(flight.group, 0) == flight.generation):
+                self._entries[key] = (time.monotonic() + self.ttl, flight.group, flight.value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            flight.event.set()
+            waiters, flight.waiters = flight.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+    def fetch(self, key, loader, group: str = STATIC):
+        """返回 key 对应的结果，未缓存时调用 loader()；错误结果不缓存"""
+        hit, value, flight, leader = self._begin(key, group)
+        if hit:
+            return value
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = loader()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(key, flight)
+
+    async def fetch_async(self, key, loader, group: str = STATIC):
+        """fetch 的异步版本，loader 为返回协程的函数；等待其他请求时不阻塞事件循环"""
+        hit, value, flight, leader = self._begin(key, group)
+        if hit:
+            return value
+        if not leader:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                if flight.event.is_set():
+                    future.set_result(None)
+                else:
+                    flight.waiters.append((loop, future))
+            await future
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = await loader()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._finish(key, flight)
+
+    def invalidate(self, *groups: str) -> None:
+        """使指定分组的缓存项失效，正在进行的同组请求也不再被后续请求复用"""
+        with self._lock:
+            for group in groups:
+                self._generations[group] = self._generations.get(group, 0) + 1
+            for key in [key for key, entry in self._entries.items() if entry[1] in groups]:
+                del self._entries[key]
+            for key in [key for key, flight in self._inflight.items() if flight.group in groups]:
+                del self._inflight[key]
+
+    def clear(self) -> None:
+        self.invalidate(NAMES, CODE, DATA, STATIC)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,307 @@
+"""
+进程内的运行指标：计数器与延迟直方图，按指标名 + 标签（端点、阶段、结果）区分。
+
+ghidra_client 记录每个插件接口的请求次数与耗时，重命名与导出流程记录各阶段
+（反编译、AI命名、重命名、固定延迟、写文件）的耗时与每个函数的处理结果，
+据此可以判断一次慢的运行究竟在等 Ghidra、等 AI、等重命名还是在等固定延迟。
+指标可导出为 JSON 或 Prometheus 文本格式，写入文件或通过本地 HTTP 端点提供
+（/metrics 为 Prometheus 格式，/metrics.json 为 JSON）。
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 直方图的桶上界（秒），覆盖从本地缓存命中到慢速AI响应的范围
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 已知指标的说明，用于 Prometheus 的 HELP 行
+METRIC_HELP = {
+    "ghidra_requests_total": "Requests sent to the Ghidra plugin by endpoint and status",
+    "ghidra_request_seconds": "Latency of requests to the Ghidra plugin by endpoint",
+    "rename_functions_total": "Functions finished by the rename run by result",
+    "rename_stage_seconds": "Time spent per function in each rename stage",
+    "export_functions_total": "Functions finished by the exporter by result",
+    "export_stage_seconds": "Time spent per function in each export stage",
+    "ai_requests_total": "Requests sent to each AI endpoint of the pool by result",
+    "ai_request_seconds": "Latency of successful requests per AI endpoint, including rate limiter waits",
+}
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items) + "}"
+
+
+class Histogram:
+    """固定桶的直方图，counts[i] 为落在第 i 个桶（不累计）的次数，最后一个为 +Inf"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class MetricsRegistry:
+    """线程安全的指标集合；collector 为额外的回调，返回 [(指标名, 标签dict, 数值)] 作为瞬时值（gauge）输出"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}      # (name, labels) -> 数值
+        self._histograms = {}    # (name, labels) -> Histogram
+        self._collectors = []
+        self.started = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _gauges(self) -> list:
+        with self._lock:
+            collectors = list(self._collectors)
+        gauges = []
+        for collector in collectors:
+            try:
+                gauges += [(name, _label_key(labels), value) for name, labels, value in collector()]
+            except Exception:
+                continue
+        return gauges
+
+    def counter_totals(self, name: str, label: str) -> dict:
+        """按某个标签汇总计数器，返回 {标签值: 数值}"""
+        totals = {}
+        with self._lock:
+            for (metric, labels), value in self._counters.items():
+                if metric == name:
+                    key = dict(labels).get(label, "")
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def histogram_totals(self, name: str, label: str) -> dict:
+        """按某个标签汇总直方图，返回 {标签值: (次数, 总耗时秒)}"""
+        totals = {}
+        with self._lock:
+            for (metric, labels), histogram in self._histograms.items():
+                if metric == name:
+                    key = dict(labels).get(label, "")
+                    count, total = totals.get(key, (0, 0.0))
+                    totals[key] = (count + histogram.count, total + histogram.sum)
+        return totals
+
+    def snapshot(self) -> dict:
+        """JSON 格式的全部指标；直方图的 buckets 为累计次数，键为桶上界"""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                cumulative = histogram.cumulative()
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                    "buckets": {**{f"{bound:g}": cumulative[i] for i, bound in enumerate(BUCKETS)}, "+Inf": cumulative[-1]},
+                })
+        gauges = [{"name": name, "labels": dict(labels), "value": value} for name, labels, value in self._gauges()]
+        return {"started": self.started, "uptime": time.time() - self.started,
+                "counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def to_prometheus(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        described = set()
+
+        def describe(name: str, kind: str):
+            if name in described:
+                return
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(((key, histogram.cumulative(), histogram.count, histogram.sum)
+                                 for key, histogram in self._histograms.items()), key=lambda item: item[0])
+        for (name, labels), value in counters:
+            describe(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for (name, labels), cumulative, count, total in histograms:
+            describe(name, "histogram")
+            for i, bound in enumerate(BUCKETS):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {cumulative[i]}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        for name, labels, value in self._gauges():
+            describe(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """把 JSON 写入 path，同时把 Prometheus 文本写入同名的 .prom 文件"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+        prom_path = os.path.splitext(path)[0] + ".prom"
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(prom_path + ".tmp", prom_path)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+
+class MetricsServer:
+    """在后台线程提供 /metrics（Prometheus）与 /metrics.json 的本地 HTTP 服务"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+        self.registry = registry
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path == "/metrics.json":
+                    body, content_type = json.dumps(registry.snapshot(), ensure_ascii=False).encode("utf-8"), "application/json"
+                elif path in ("", "/metrics"):
+                    body, content_type = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# 进程内共享的指标集合
+REGISTRY = MetricsRegistry()
+
+# 各阶段在日志与界面中的名称
+STAGE_NAMES = {
+    "decompile": "反编译",
+    "ai": "AI命名",
+    "rename": "重命名",
+    "delay": "固定延迟",
+    "write": "写入",
+    "function": "单个函数",
+}
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    REGISTRY.observe(name, seconds, **labels)
+
+
+def timer(name: str, **labels):
+    return REGISTRY.timer(name, **labels)
+
+
+def serve(port: int, host: str = "127.0.0.1") -> MetricsServer:
+    return MetricsServer(REGISTRY, port, host)
+
+
+def stage_totals(name: str = "rename_stage_seconds") -> dict:
+    """各阶段累计的 {阶段: (次数, 总耗时秒)}"""
+    return REGISTRY.histogram_totals(name, "stage")
+
+
+def since(current: dict, baseline: dict) -> dict:
+    """两次 stage_totals/counter_totals 结果之差，用于只统计本次运行"""
+    result = {}
+    for key, value in current.items():
+        before = baseline.get(key)
+        if isinstance(value, tuple):
+            before = before or (0, 0.0)
+            value = (value[0] - before[0], value[1] - before[1])
+            if value[0] > 0:
+                result[key] = value
+        elif value - (before or 0) > 0:
+            result[key] = value - (before or 0)
+    return result
+
+
+def describe_stages(totals: dict) -> str:
+    """例如 "反编译 120 次 平均 55 ms，AI命名 120 次 平均 810 ms" """
+    order = list(STAGE_NAMES)
+    stages = sorted(totals, key=lambda stage: order.index(stage) if stage in order else len(order))
+    parts = [f"{STAGE_NAMES.get(stage, stage)} {totals[stage][0]} 次 平均 {totals[stage][1] / totals[stage][0] * 1000:.0f} ms"
+             for stage in stages if totals[stage][0]]
+    return "，".join(parts)